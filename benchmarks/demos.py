@@ -0,0 +1,40 @@
+"""
+Expert demonstrations and steps per second of `oracle.generate_demos` by process count
+
+    python benchmarks/demos.py --episodes 256 --max-steps 1000 --processes 1 2 4
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mazeexp.engine.oracle import generate_demos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--episodes', type=int, default=256)
+    parser.add_argument('--max-steps', type=int, default=1000)
+    parser.add_argument('--batch', type=int, default=64)
+    parser.add_argument('--mode', type=int, default=0)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    handle, path = tempfile.mkstemp(suffix='.mxtr')
+    os.close(handle)
+    try:
+        for processes in args.processes:
+            start = time.time()
+            steps = generate_demos(path, args.episodes, args.mode, processes, seed=0,
+                                   batch=args.batch, max_steps=args.max_steps)
+            elapsed = time.time() - start
+            print('{:>3} processes {:>8.1f} demos/s {:>10.0f} steps/s {:>8.1f} MB'.format(
+                processes, args.episodes / elapsed, steps / elapsed, os.path.getsize(path) / 1e6))
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Mazes per second and memory of each `Generator` algorithm by maze size
+
+    python benchmarks/generators.py --sizes 10 20 49 --mazes 200
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+import random
+import argparse
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.layouts import ALGORITHMS
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 20, 49])
+    parser.add_argument('--mazes', type=int, default=200)
+    parser.add_argument('--min-size', type=int, default=3)
+    parser.add_argument('--algorithms', nargs='+', default=list(ALGORITHMS))
+    args = parser.parse_args()
+
+    generator = Generator()
+    print('{:>9} {:>5} {:>10} {:>10} {:>12} {:>8} {:>6}'.format(
+        'algorithm', 'size', 'mazes/s', 'maze KB', 'peak KB', 'floor', 'doors'))
+    for algorithm in args.algorithms:
+        for size in args.sizes:
+            start = time.time()
+            floor = doors = 0
+            for i in range(args.mazes):
+                walls = generator.grid(size, size, args.min_size, random.Random(i), algorithm)
+                floor += generator.stats.get('floor', 0)
+                doors += generator.stats.get('doors', 0)
+            elapsed = time.time() - start
+
+            # Working memory of one layout, apart from timing
+            peak = float('nan')
+            if tracemalloc is not None:
+                tracemalloc.start()
+                generator.grid(size, size, args.min_size, random.Random(0), algorithm)
+                peak = tracemalloc.get_traced_memory()[1] / 1e3
+                tracemalloc.stop()
+
+            print('{:>9} {:>5} {:>10.0f} {:>10.2f} {:>12.1f} {:>7.0f}% {:>6.2f}'.format(
+                algorithm, size, args.mazes / elapsed, walls.nbytes / 1e3, peak,
+                100.0 * floor / (args.mazes * (size - 1) ** 2), float(doors) / args.mazes))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Sensing cost per ray of `Simulation.sense` by ray count, over a full circle
+
+    python benchmarks/lidar.py --envs 64 --rays 9 64 180 360
+"""
+from __future__ import print_function
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mazeexp.engine import config
+from mazeexp.engine.curriculum import Level
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.maze import build_maze
+from mazeexp.engine.simulation import Simulation
+from mazeexp.engine.world_rewards import compile_mode
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--envs', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=50)
+    parser.add_argument('--mode', type=int, default=0)
+    parser.add_argument('--rays', type=int, nargs='+', default=[9, 64, 180, 360])
+    args = parser.parse_args()
+
+    mode = config.get_mode(args.mode)
+    for rays in args.rays:
+        # Cost of casting, a cached `sense` after a step casts nothing
+        sensors = {'num': rays, 'fov': math.pi * 2 / rays, 'cache': False}
+        cfg = config.Config(settings={'player': {'sensors': sensors}})
+        level = Level.default(cfg, mode)
+        mazes = [build_maze(Generator(cfg), cfg, mode, level, random.Random(i)) for i in range(args.envs)]
+        sim = Simulation(mazes, cfg, compile_mode(mode))
+
+        rng = np.random.RandomState(0)
+        elapsed = 0
+        for step in range(args.steps):
+            sim.step_actions(rng.randint(sim.action_turn.shape[0], size=args.envs))
+            start = time.time()
+            sim.sense()
+            elapsed += time.time() - start
+
+        per_ray = elapsed / (args.steps * args.envs * rays)
+        print('{:>4} rays {:>10.1f} us/env {:>8.3f} us/ray'.format(
+            rays, elapsed / (args.steps * args.envs) * 1e6, per_ray * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Step time with items standing still and drifting, by items per maze
+
+    python benchmarks/moving_items.py --envs 16 --items 40 200 400
+"""
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mazeexp.engine import config, game_modes
+from mazeexp.engine.curriculum import Level
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.maze import build_maze
+from mazeexp.engine.simulation import Simulation
+from mazeexp.engine.world_rewards import compile_mode
+
+MODE = os.path.join(os.path.dirname(__file__), '..', 'mazeexp', 'engine', 'modes', 'mode_0.json')
+
+def run(args, items, speed):
+    with open(MODE) as f:
+        definition = json.load(f, object_pairs_hook=OrderedDict)
+    for rule in definition['items'].values():
+        rule['num'] = items // len(definition['items'])
+        rule['speed'] = speed
+    mode = game_modes.load_mode(definition)
+    cfg = config.Config(tiles={'width': args.size, 'height': args.size})
+    level = Level.default(cfg, mode)
+    mazes = [build_maze(Generator(cfg), cfg, mode, level, random.Random(i)) for i in range(args.envs)]
+    sim = Simulation(mazes, cfg, compile_mode(mode))
+
+    rng = np.random.RandomState(0)
+    actions = rng.randint(sim.action_turn.shape[0], size=(args.steps, args.envs))
+    start = time.time()
+    for chosen in actions:
+        sim.step_actions(chosen)
+    return (time.time() - start) / args.steps, np.mean([m.items_num for m in mazes])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--envs', type=int, default=16)
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--size', type=int, default=40, help='Tiles across and up')
+    parser.add_argument('--speed', type=float, default=40.0, help='Pixels per second')
+    parser.add_argument('--items', type=int, nargs='+', default=[40, 200, 400])
+    args = parser.parse_args()
+
+    for items in args.items:
+        still, placed = run(args, items, 0.0)
+        drifting, _ = run(args, items, args.speed)
+        print('{:>6.0f} items {:>8.2f} ms still {:>8.2f} ms drifting per step of {} mazes'.format(
+            placed, still * 1e3, drifting * 1e3, args.envs))
+
+if __name__ == '__main__':
+    main()
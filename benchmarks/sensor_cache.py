@@ -0,0 +1,64 @@
+"""
+Step time with and without the sensor cache of `Simulation.sense`, by how
+often players idle or only turn
+
+    python benchmarks/sensor_cache.py --envs 64 --rays 9 360
+"""
+from __future__ import print_function
+
+import os
+import sys
+import math
+import time
+import random
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mazeexp.engine import config
+from mazeexp.engine.curriculum import Level
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.maze import build_maze
+from mazeexp.engine.simulation import Simulation
+from mazeexp.engine.world_rewards import compile_mode
+
+def run(args, rays, cache, turning):
+    mode = config.get_mode(args.mode)
+    sensors = {'num': rays, 'fov': math.pi * 2 / rays, 'cache': cache}
+    cfg = config.Config(settings={'player': {'sensors': sensors}})
+    level = Level.default(cfg, mode)
+    mazes = [build_maze(Generator(cfg), cfg, mode, level, random.Random(i)) for i in range(args.envs)]
+    sim = Simulation(mazes, cfg, compile_mode(mode))
+
+    # Turning actions hold no 'up', players brake then turn in place
+    actions = sim.action_turn.shape[0]
+    turns = np.flatnonzero((sim.action_turn != 0) & (sim.action_up == 0))
+    rng = np.random.RandomState(0)
+    start = time.time()
+    for step in range(args.steps):
+        chosen = rng.randint(actions, size=args.envs)
+        spin = rng.rand(args.envs) < turning
+        chosen[spin] = rng.choice(turns, size=spin.sum())
+        sim.step_actions(chosen)
+    return time.time() - start, sim.sense_hit_rate
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--envs', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--mode', type=int, default=0)
+    parser.add_argument('--rays', type=int, nargs='+', default=[9, 360])
+    parser.add_argument('--turning', type=float, nargs='+', default=[0.0, 0.5, 0.9],
+                        help='Share of actions only turning')
+    args = parser.parse_args()
+
+    for rays in args.rays:
+        for turning in args.turning:
+            off, _ = run(args, rays, False, turning)
+            on, rate = run(args, rays, True, turning)
+            print('{:>4} rays {:>4.0%} turning {:>8.1f} ms uncached {:>8.1f} ms cached {:>6.1%} reused'.format(
+                rays, turning, off * 1e3, on * 1e3, rate))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Environment steps per second of `EnvironmentServer` with local clients
+
+    python benchmarks/server.py --clients 64 --steps 200
+    python benchmarks/server.py --clients 1 --capacity 256
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mazeexp.engine.server import EnvironmentServer, EnvironmentClient
+
+async def play(port, steps, seed):
+    client = await EnvironmentClient.connect(port=port)
+    rng = np.random.RandomState(seed)
+    await client.reset(seed)
+    for action in rng.randint(client.actions_num, size=steps):
+        observation, reward, terminal = await client.step(int(action))
+        if terminal:
+            await client.reset()
+    client.close()
+
+async def run(args):
+    server = EnvironmentServer(args.mode, capacity=args.capacity or args.clients, window=args.window, seed=0)
+    await server.start(port=args.port)
+
+    start = time.time()
+    await asyncio.gather(*[play(args.port, args.steps, i) for i in range(args.clients)])
+    elapsed = time.time() - start
+    await server.close()
+
+    print('{:>4} clients {:>4} rows {:>10.0f} steps/s {:>7.1f} mean batch'.format(
+        args.clients, server.sim.n, args.clients * args.steps / elapsed, server.stepped / max(1, server.batches)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--capacity', type=int, default=None,
+                        help='Rows of the server, by default one per client')
+    parser.add_argument('--mode', type=int, default=0)
+    parser.add_argument('--window', type=float, default=0.002)
+    parser.add_argument('--port', type=int, default=7450)
+    args = parser.parse_args()
+
+    asyncio.get_event_loop().run_until_complete(run(args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Environment steps per second of `ThreadPoolMazeRunner` by thread count,
+threads step shards of `envs / threads` environments each
+
+    python benchmarks/threads.py --envs 256 1024 --steps 200
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+import multiprocessing
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mazeexp.engine.runner import ThreadPoolMazeRunner
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--envs', type=int, nargs='+', default=[256, 1024])
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--mode', type=int, default=0)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print('{} cores'.format(multiprocessing.cpu_count()))
+    rng = np.random.RandomState(0)
+    for envs in args.envs:
+        base = None
+        for threads in args.threads:
+            runner = ThreadPoolMazeRunner(envs, threads, args.mode, seed=0)
+            runner.reset()
+            actions = rng.randint(runner.actions_num, size=(args.steps, envs))
+
+            start = time.time()
+            for step in actions:
+                runner.step(step)
+            rate = envs * args.steps / (time.time() - start)
+            runner.close()
+
+            base = base or rate
+            print('{:>5} envs {:>2} threads {:>10.0f} steps/s {:>5.2f}x'.format(envs, threads, rate, rate / base))
+
+if __name__ == '__main__':
+    main()
@@ -1 +1,15 @@
-from mazeexp.engine.mazeexp import MazeExplorer
+import sys
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        # Imported on first use, so the headless engine loads without cocos and pyglet
+        if name == 'MazeExplorer':
+            from mazeexp.engine.mazeexp import MazeExplorer
+            return MazeExplorer
+        raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
+else:
+    try:
+        from mazeexp.engine.mazeexp import MazeExplorer
+    except ImportError:
+        # Headless, modules of `mazeexp.engine` other than `mazeexp` still import
+        pass
@@ -3,11 +3,11 @@ import cocos.collision_model as cm
 import cocos.euclid as eu
 from cocos.rect import Rect
 
-import config
+from . import config
 
-def world_to_view(v):
+def world_to_view(v, cfg):
     """world coords to view coords; v an eu.Vector2, returns (float, float)"""
-    return v.x * config.scale_x, v.y * config.scale_y
+    return v.x * cfg.scale_x, v.y * cfg.scale_y
 
 #def reflection_y(a):
 #    assert isinstance(a, eu.Vector2)
@@ -22,29 +22,39 @@ class Collidable(cocos.sprite.Sprite):
         Generate a collision manager sprite
     """
 
-    def __init__(self, cx, cy, radius, btype, img, removable=False):
+    def __init__(self, cx, cy, radius, btype, img, removable=False, cfg=None):
         super(Collidable, self).__init__(img)
 
-        # TODO: Inheritable moving items `velocity=None`
+        # Moving items drift in `Simulation.move_items`, sprites follow
 
-        self.palette = config.settings['view']['palette']
+        self.cfg = cfg or config.default()
+        self.palette = self.cfg.settings['view']['palette']
 
+        self.cshape = cm.CircleShape(eu.Vector2(cx, cy), radius)
+        self.place(cx, cy, radius, btype)
+
+        self.removable = removable
+
+    def place(self, cx, cy, radius, btype, img=None):
+        """
+        Show another body with this sprite, in place
+        """
+        if img is not None and img is not self.image:
+            self.image = img
         self.radius = radius
         # the 1.05 so that visual radius a bit greater than collision radius
         # FIXME: Both `scale_x` and `scale_y`
-        self.scale = (self.radius * 1.05) * config.scale_x / (self.image.width / 2.0)
+        self.scale = (self.radius * 1.05) * self.cfg.scale_x / (self.image.width / 2.0)
         self.btype = btype
         self.color = self.palette[btype]
-        self.cshape = cm.CircleShape(eu.Vector2(cx, cy), self.radius)
-        self.update_center(self.cshape.center)
-
-        self.removable = removable
+        self.cshape.r = radius
+        self.update_center(eu.Vector2(cx, cy))
 
     def update_center(self, cshape_center):
         """cshape_center must be eu.Vector2"""
         assert isinstance(cshape_center, eu.Vector2)
 
-        self.position = world_to_view(cshape_center)
+        self.position = world_to_view(cshape_center, self.cfg)
         self.cshape.center = cshape_center
 
     def get_rect(self):
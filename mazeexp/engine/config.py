@@ -1,8 +1,17 @@
+import copy
 import math
 import logging
 
-import pyglet
-from pyglet.window import key
+try:
+    from pyglet.window import key
+except ImportError:
+    # Headless, codes as in `pyglet.window.key`
+    class key(object):
+        LEFT = 0xff51
+        UP = 0xff52
+        RIGHT = 0xff53
+
+from . import game_modes
 
 import os
 script_dir = os.path.dirname(__file__)
@@ -38,9 +47,18 @@ settings = {
         },
         "sensors": {
             "num": 9,
+            # Between rays
             "fov": 15*math.pi/180,
-            "max_range": 200 / 4
+            # One range, or a list with one per ray
+            "max_range": 200 / 4,
+            # Bearings of each ray from heading, instead of `num` rays `fov` apart
+            "angles": None,
+            # Reuse readings of players standing still at bearings sensed before,
+            # None for sensors of at least `simulation.CACHE_MIN_RAYS` rays
+            "cache": None
         },
+        # Observations as `float64`, `float32`, or quantised to `float16` or `uint8` steps of 1/255
+        "observation_dtype": "float64",
         "actions": [
             #['noop'],
             ['left'],
@@ -52,6 +70,9 @@ settings = {
     },
     "world": {
         "force_fps": 5.0, # Used by agents to step velocity updates
+        # Events kept per episode for `info`, and whether to log them as text
+        "event_log": 0,
+        "log_events": False,
         "width": tiles['tw'] * tiles['width'],
         "height": tiles['th'] * tiles['height'],
         "bindings": {
@@ -61,10 +82,19 @@ settings = {
             key.UP: 'up',
         }
     },
+    "generator": {
+        # One of `layouts.ALGORITHMS`, unless the game mode names one
+        "algorithm": "division",
+        "min_size": 3, # Smallest room `recursive_division` will split
+        # Sealed regions: "repair" opens doors, "reject" draws a new layout, None allows them
+        "connectivity": "repair"
+    },
     "view": {
         # as the font file is not provided it will decay to the default font;
         # the setting is retained anyway to not downgrade the code
         "font_name": 'Axaxax',
+        # Rendered steps per drawn frame, the simulation still steps every tick
+        "render_interval": 1,
         "palette": {
             'bg': (0, 65, 133),
             'wall': (50, 50, 100), # Wall sensor colour
@@ -77,84 +107,129 @@ settings = {
     }
 }
 
-# Callbacks to test reward conditions
-def __cond_action_up(world):
-    # Detect other keys
-    held_buttons = {k:v for k,v in world.buttons.iteritems() if v == 1}
-    return len(held_buttons) == 1 and world.buttons['up'] == 1
-
-def __cond_battery_out(world):
-    return world.player.stats['battery'] <= 0
-
-def __cond_explore_battery(world):
-    return world.player.stats['battery'] > 50
-
-def __cond_goal_battery(world):
-    return world.player.stats['battery'] <= 50
-
-modes = [
-    # Mode 0
-    {
-        #"proximity": {
-        #    "cond": __cond_action_up,
-        #    "reward": 1.1 # 10% Bonus on proximity reward
-        #},
-        "wall": {
-            "reward": -10.0,
-            "terminal": False
-        },
-        "items": {
-            "food": {
-                "num": 20,
-                "scale": 2.0,
-                "reward": 5.0,
-                "terminal": False
-            },
-            "poison": {
-                "num": 20,
-                "scale": 2.0,
-                "reward": -6.0,
-                "terminal": False
-            },
-        }
-    },
-    # Mode 1
-    {
-        "battery": {
-            "cond": __cond_battery_out,
-            "reward": -100.0,
-            "terminal": True
-        },
-        "explore": {
-            "cond": __cond_explore_battery,
-            "reward": 1.0,
-            "terminal": False
-        },
-        "goal": {
-            "cond": __cond_goal_battery,
-            "reward": 200.0,
-            "terminal": True
-        },
-        "wall": {
-            "reward": -100.0,
-            "terminal": True
-        },
-        "items": {}
-    }
-]
+# Built-in game modes, see `modes/mode_*.json`
+modes = game_modes.builtin_modes()
 
-# Ensure all modes have items for convenience
-for mode in modes:
-    if mode['items'] is None:
-        mode['items'] = {}
+def get_mode(mode_id):
+    """
+    Game mode by number, or loaded from a JSON/YAML definition file
+    """
+    if isinstance(mode_id, dict):
+        return game_modes.load_mode(mode_id)
+    try:
+        return modes[int(mode_id)]
+    except ValueError:
+        return game_modes.load_mode(mode_id)
 
 # world to view scales
 scale_x = settings["window"]["width"] / settings["world"]["width"]
 scale_y = settings["window"]["height"] / settings["world"]["height"]
 
-# load resources:
-pics = {
-    "player": pyglet.image.load(os.path.join(script_dir, 'assets', 'player7.png')),
-    "food": pyglet.image.load(os.path.join(script_dir, 'assets', 'circle6.png')),
-    "poison": pyglet.image.load(os.path.join(script_dir, 'assets', 'circle6.png'))
-}
+class FrozenDict(dict):
+    """
+    FrozenDict
+
+    Read-only dict, so settings shared by an environment can't be mutated
+    """
+    def __readonly(self, *args, **kwargs):
+        raise TypeError('Config is immutable, create a new `Config` instead')
+
+    __setitem__ = __delitem__ = __readonly
+    clear = pop = popitem = setdefault = update = __readonly
+
+    def __reduce__(self):
+        # Built from a plain dict, the default would set items one by one
+        return (FrozenDict, (dict(self),))
+
+    def __deepcopy__(self, memo):
+        return FrozenDict((k, copy.deepcopy(v, memo)) for k, v in self.items())
+
+def merge(base, overrides):
+    """
+    Deep merge `overrides` into `base`
+    """
+    for k, v in overrides.items():
+        if isinstance(v, dict) and isinstance(base.get(k), dict):
+            merge(base[k], v)
+        else:
+            base[k] = v
+    return base
+
+def freeze(value):
+    if isinstance(value, dict):
+        return FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def defaults():
+    """
+    Copies of module `tiles` and `settings`, the base for each `Config`
+    """
+    return copy.deepcopy(tiles), copy.deepcopy(settings)
+
+class Config(object):
+    """
+    Config
+
+    Immutable per-environment configuration
+
+    Responsabilities:
+        Merge overrides onto module defaults
+        Derive world geometry and view scales from tiles
+        Pickle without sprite images, to hand to worker processes
+    """
+
+    def __init__(self, tiles=None, settings=None):
+        geometry, base = defaults()
+        if tiles:
+            geometry.update(tiles)
+            merge(base, {
+                "player": {"radius": geometry['tw'] / 4},
+                "world": {
+                    "width": geometry['tw'] * geometry['width'],
+                    "height": geometry['th'] * geometry['height']
+                }
+            })
+        merge(base, settings or {})
+
+        self.tiles = freeze(geometry)
+        self.settings = freeze(base)
+
+        self.scale_x = self.settings["window"]["width"] / self.settings["world"]["width"]
+        self.scale_y = self.settings["window"]["height"] / self.settings["world"]["height"]
+
+    @property
+    def pics(self):
+        """
+        Sprite images, see `load_pics`
+        """
+        return load_pics()
+
+_default = None
+
+def default():
+    """
+    Shared `Config` of module defaults, created on first use
+    """
+    global _default
+    if _default is None:
+        _default = Config()
+    return _default
+
+_pics = None
+
+def load_pics():
+    """
+    Sprite images by body type, loaded with pyglet on first use so the
+    headless engine imports without it
+    """
+    global _pics
+    if _pics is None:
+        import pyglet
+        _pics = {
+            "player": pyglet.image.load(os.path.join(script_dir, 'assets', 'player7.png')),
+            "food": pyglet.image.load(os.path.join(script_dir, 'assets', 'circle6.png')),
+            "poison": pyglet.image.load(os.path.join(script_dir, 'assets', 'circle6.png'))
+        }
+    return _pics
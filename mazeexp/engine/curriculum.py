@@ -0,0 +1,124 @@
+from __future__ import division
+
+import random
+from collections import deque
+
+class Level(object):
+    """
+    Level
+
+    Parameters for a single episode
+    """
+    __slots__ = ('width', 'height', 'min_size', 'items')
+
+    def __init__(self, width, height, min_size, items):
+        self.width = width
+        self.height = height
+        self.min_size = min_size
+        self.items = items
+
+    @classmethod
+    def default(cls, cfg, mode):
+        """
+        Level from `Config` tiles and the game mode's item counts
+        """
+        return cls(cfg.tiles['width'], cfg.tiles['height'], cfg.settings['generator']['min_size'],
+                   dict((k, v['num']) for k, v in mode['items'].items()))
+
+    def __repr__(self):
+        return 'Level({}x{}, min_size={}, items={})'.format(self.width, self.height, self.min_size, self.items)
+
+class Curriculum(object):
+    """
+    Curriculum
+
+    Schedules level parameters above `generate_random_level` and `create_items`.
+    One instance can be shared by every environment in a batch.
+
+    Each stage maps `width`, `height`, `min_size` and `items.<type>` to a
+    value or an inclusive `(low, high)` range sampled uniformly per episode.
+    Missing entries fall back to `Config` and the game mode.
+
+    Responsabilities:
+        Sample per-episode maze size, division size and item counts
+        Advance or retreat stages from recent episode success rates
+    """
+
+    def __init__(self, stages, cfg, window=100, promote=0.8, demote=None, seed=None):
+        assert len(stages) > 0
+
+        self.cfg = cfg
+        self.stages = list(stages)
+        self.stage = 0
+        self.window = window
+        self.promote = promote
+        self.demote = demote
+        self.rng = random.Random(seed)
+        self.results = deque(maxlen=window)
+
+        for stage in self.stages:
+            self.validate(stage)
+
+    def validate(self, stage):
+        """
+        Stages are bounded by `Config` tiles, so buffers sized for it are reused
+        """
+        tiles = self.cfg.tiles
+        for key in ('width', 'height'):
+            if key in stage and self.bounds(stage[key])[1] > tiles[key]:
+                raise ValueError('Curriculum {} {} exceeds Config tiles {}'.format(key, stage[key], tiles[key]))
+        if 'min_size' in stage and self.bounds(stage['min_size'])[0] < 1:
+            raise ValueError('Curriculum min_size must be at least 1')
+
+    def bounds(self, value):
+        if isinstance(value, (tuple, list)):
+            return value[0], value[1]
+        return value, value
+
+    def pick(self, value):
+        low, high = self.bounds(value)
+        if isinstance(low, int) and isinstance(high, int):
+            return self.rng.randint(low, high)
+        return self.rng.uniform(low, high)
+
+    def sample(self, mode):
+        """
+        Parameters for the next episode of `mode`
+        """
+        stage = self.stages[self.stage]
+        tiles = self.cfg.tiles
+        items = stage.get('items', {})
+
+        return Level(
+            self.pick(stage.get('width', tiles['width'])),
+            self.pick(stage.get('height', tiles['height'])),
+            self.pick(stage.get('min_size', self.cfg.settings['generator']['min_size'])),
+            dict((k, int(self.pick(items.get(k, v['num'])))) for k, v in mode['items'].items())
+        )
+
+    def set_stage(self, stage):
+        """
+        Jump to a stage, clearing recent results
+        """
+        assert 0 <= stage < len(self.stages)
+        self.stage = stage
+        self.results.clear()
+
+    def success_rate(self):
+        if not self.results:
+            return 0.0
+        return sum(self.results) / len(self.results)
+
+    def record(self, success):
+        """
+        Record an episode outcome, moves between stages once `window` episodes are in
+        """
+        self.results.append(bool(success))
+        if len(self.results) < self.window:
+            return
+
+        rate = self.success_rate()
+        if rate >= self.promote and self.stage + 1 < len(self.stages):
+            self.set_stage(self.stage + 1)
+        elif self.demote is not None and rate < self.demote and self.stage > 0:
+            self.set_stage(self.stage - 1)
@@ -0,0 +1,266 @@
+import os
+import ast
+import json
+import hashlib
+import operator
+from collections import OrderedDict
+
+import numpy as np
+
+from .layouts import ALGORITHMS
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+script_dir = os.path.dirname(__file__)
+
+try:
+    basestring
+except NameError:
+    basestring = str
+
+# Names conditions may refer to, supplied by `WorldRewards` each tick
+VARIABLES = ('battery',)
+
+RULES = ('battery', 'wall', 'explore', 'goal', 'approach', 'proximity')
+RULE_KEYS = ('reward', 'terminal', 'cond')
+ITEM_KEYS = RULE_KEYS + ('num', 'scale', 'respawn', 'speed')
+INFO_KEYS = ('name', 'description')
+# Settings of the level rather than rules
+LEVEL_KEYS = ('generator',)
+
+COMPARE_OPS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne
+}
+
+ARITH_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv
+}
+
+# Parsed definitions by content hash, for the process. Modes are only read
+# once cached, so environments and threads share them safely.
+_modes = {}
+
+class ModeError(ValueError):
+    """
+    Invalid game mode definition
+    """
+
+def compile_expression(source):
+    """
+    Compile a condition such as `battery > 50 and battery <= 75` into a
+    callable over a state of scalars or batched arrays
+    """
+    try:
+        tree = ast.parse(source.strip(), mode='eval')
+    except SyntaxError as e:
+        raise ModeError('cond {!r}: {}'.format(source, e.msg))
+
+    def constant(value):
+        return lambda state: value
+
+    def build(node):
+        if isinstance(node, ast.BoolOp):
+            args = [build(v) for v in node.values]
+            op = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            def bool_op(state):
+                result = args[0](state)
+                for arg in args[1:]:
+                    result = op(result, arg(state))
+                return result
+            return bool_op
+
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub)):
+            arg = build(node.operand)
+            if isinstance(node.op, ast.Not):
+                return lambda state: np.logical_not(arg(state))
+            return lambda state: -arg(state)
+
+        if isinstance(node, ast.BinOp) and type(node.op) in ARITH_OPS:
+            op = ARITH_OPS[type(node.op)]
+            left, right = build(node.left), build(node.right)
+            return lambda state: op(left(state), right(state))
+
+        if isinstance(node, ast.Compare):
+            operands = [build(node.left)] + [build(c) for c in node.comparators]
+            ops = []
+            for op in node.ops:
+                if type(op) not in COMPARE_OPS:
+                    raise ModeError('cond {!r}: unsupported comparison'.format(source))
+                ops.append(COMPARE_OPS[type(op)])
+            def compare(state):
+                values = [o(state) for o in operands]
+                result = ops[0](values[0], values[1])
+                for i in range(1, len(ops)):
+                    result = np.logical_and(result, ops[i](values[i], values[i+1]))
+                return result
+            return compare
+
+        if isinstance(node, ast.Name):
+            if node.id in ('True', 'False'):
+                return constant(node.id == 'True')
+            if node.id not in VARIABLES:
+                raise ModeError('cond {!r}: unknown name {!r}, expected one of {}'.format(source, node.id, VARIABLES))
+            name = node.id
+            return lambda state: state[name]
+
+        # `Num` prior to Python 3.8, `Constant` after
+        value = getattr(node, 'value', getattr(node, 'n', None))
+        if type(node).__name__ in ('Num', 'Constant', 'NameConstant') and isinstance(value, (int, float)):
+            return constant(value)
+
+        raise ModeError('cond {!r}: unsupported expression {}'.format(source, type(node).__name__))
+
+    return build(tree.body)
+
+def validate_rule(path, rule, keys):
+    if not isinstance(rule, dict):
+        raise ModeError('{}: expected a mapping'.format(path))
+    unknown = [k for k in rule if k not in keys]
+    if unknown:
+        raise ModeError('{}: unknown keys {}'.format(path, sorted(unknown)))
+    if not isinstance(rule.get('reward'), (int, float)) or isinstance(rule.get('reward'), bool):
+        raise ModeError('{}.reward: expected a number'.format(path))
+    if not isinstance(rule.get('terminal', False), bool):
+        raise ModeError('{}.terminal: expected a boolean'.format(path))
+    if 'cond' in rule and not isinstance(rule['cond'], basestring):
+        raise ModeError('{}.cond: expected an expression string'.format(path))
+
+    normal = {
+        'reward': float(rule['reward']),
+        'terminal': rule.get('terminal', False)
+    }
+    if 'cond' in rule:
+        normal['source'] = rule['cond']
+    return normal
+
+def validate_mode(definition):
+    """
+    Validate a parsed definition, returns a normalised mode
+    """
+    if not isinstance(definition, dict):
+        raise ModeError('mode: expected a mapping')
+    unknown = [k for k in definition if k not in RULES + INFO_KEYS + LEVEL_KEYS + ('items',)]
+    if unknown:
+        raise ModeError('mode: unknown keys {}'.format(sorted(unknown)))
+
+    mode = OrderedDict()
+    for key in INFO_KEYS:
+        if key in definition:
+            mode[key] = definition[key]
+    for key in RULES:
+        if definition.get(key) is not None:
+            mode[key] = validate_rule(key, definition[key], RULE_KEYS)
+    if definition.get('generator') is not None:
+        if definition['generator'] not in ALGORITHMS:
+            raise ModeError('generator: expected one of {}'.format(ALGORITHMS))
+        mode['generator'] = str(definition['generator'])
+
+    items = definition.get('items') or {}
+    if not isinstance(items, dict):
+        raise ModeError('items: expected a mapping')
+    mode['items'] = OrderedDict()
+    for item_type, rule in items.items():
+        path = 'items.' + item_type
+        item = validate_rule(path, rule, ITEM_KEYS)
+        num = rule.get('num', 0)
+        if not isinstance(num, int) or isinstance(num, bool) or num < 0:
+            raise ModeError('{}.num: expected a non-negative integer'.format(path))
+        scale = rule.get('scale', 1.0)
+        if not isinstance(scale, (int, float)) or scale <= 0:
+            raise ModeError('{}.scale: expected a positive number'.format(path))
+        if not isinstance(rule.get('respawn', False), bool):
+            raise ModeError('{}.respawn: expected a boolean'.format(path))
+        speed = rule.get('speed', 0.0)
+        if not isinstance(speed, (int, float)) or isinstance(speed, bool) or speed < 0:
+            raise ModeError('{}.speed: expected a non-negative number'.format(path))
+        item['num'] = num
+        item['scale'] = float(scale)
+        item['respawn'] = rule.get('respawn', False)
+        item['speed'] = float(speed)
+        mode['items'][str(item_type)] = item
+
+    return mode
+
+def compile_conditions(mode):
+    """
+    Attach callables for each `cond` expression
+    """
+    rules = [mode[k] for k in RULES if k in mode] + list(mode['items'].values())
+    for rule in rules:
+        if 'source' in rule:
+            rule['cond'] = compile_expression(rule['source'])
+    return mode
+
+def parse(content, fmt):
+    if fmt == 'json':
+        return json.loads(content, object_pairs_hook=OrderedDict)
+    if fmt in ('yaml', 'yml'):
+        if yaml is None:
+            raise ImportError('PyYAML is required to load YAML game modes')
+        return yaml.safe_load(content)
+    raise ModeError('unknown game mode format {!r}'.format(fmt))
+
+def load_mode(source, cache_dir=None):
+    """
+    Load a game mode from a JSON/YAML file or an already parsed mapping.
+
+    Definitions are cached by content hash, repeated loads skip parsing,
+    validation and compilation. Mappings are hashed once normalised, in
+    their own order, as item order sets observation channels. Modes already
+    loaded are returned as they are. With `cache_dir` the validated
+    definition is also shared with other processes as JSON.
+    """
+    if isinstance(source, dict):
+        if 'digest' in source:
+            return source
+        definition = validate_mode(source)
+        content = json.dumps(definition)
+        fmt = None
+    else:
+        with open(source, 'rb') as f:
+            content = f.read()
+        fmt = os.path.splitext(source)[1].lstrip('.').lower()
+
+    if not isinstance(content, bytes):
+        content = content.encode('utf-8')
+    digest = hashlib.sha1(content).hexdigest()
+    if digest in _modes:
+        return _modes[digest]
+
+    cached = cache_dir and os.path.join(cache_dir, digest + '.json')
+    if cached and os.path.exists(cached):
+        with open(cached) as f:
+            mode = json.load(f, object_pairs_hook=OrderedDict)
+        mode['items'] = OrderedDict((str(k), v) for k, v in mode['items'].items())
+    else:
+        mode = definition if fmt is None else validate_mode(parse(content.decode('utf-8'), fmt))
+        if cached:
+            # Write then rename so concurrent workers never read partial files
+            tmp = '{}.{}'.format(cached, os.getpid())
+            with open(tmp, 'w') as f:
+                json.dump(mode, f)
+            os.rename(tmp, cached)
+
+    mode['digest'] = digest
+    _modes[digest] = compile_conditions(mode)
+    return mode
+
+def builtin_modes():
+    """
+    Built-in game modes, ordered by mode number
+    """
+    path = os.path.join(script_dir, 'modes')
+    files = [f for f in os.listdir(path) if f.startswith('mode_') and f.endswith('.json')]
+    files.sort(key=lambda f: int(f[len('mode_'):-len('.json')]))
+    return [load_mode(os.path.join(path, f)) for f in files]
@@ -1,47 +1,141 @@
 #import time
-from random import randint
+import random
 
-import cocos
-import cocos.tiles as ti
+import numpy as np
+
+from . import config
+from .layouts import ALGORITHMS, LAYOUTS, label_regions, region_sizes, wall_doors
 
 import os
 script_dir = os.path.dirname(__file__)
 
+# Tiles across `assets/template.tmx`
+TEMPLATE_SIZE = 50
+
 HORIZONTAL = 0
 VERTICAL = 1
 
+# Layouts drawn before giving up on one without sealed regions
+MAX_LAYOUTS = 10
+
 class Generator():
     """
     Generator
 
     Maze map generation
+
+    Responsabilities:
+        Lay out walls by recursive division or an algorithm of `layouts`
+        Keep every open tile reachable, reporting `stats` of the last layout
     """
 
-    def map(self, width, height):
+    def __init__(self, cfg=None):
+        self.cfg = cfg or config.default()
+        self.stats = {}
+
+    def map(self, width, height, min_size=None, rng=None, algorithm=None):
         """
-        Creates and returns a new randomly generated map
+        Creates and returns a new randomly generated tile map, `rng` seeds the layout.
+        Needs cocos, unlike `grid`.
         """
-        template = ti.load(os.path.join(script_dir, 'assets', 'template.tmx'))['map0']
-        #template.set_view(0, 0, template.px_width, template.px_height)
-        template.set_view(0, 0, width*template.tw, height*template.th)
+        from .world_tiles import wall_layer
+        return wall_layer(self.grid(width, height, min_size, rng, algorithm))
 
-        # TODO: Save the generated map.
-        #epoch = int(time.time())
-        #filename = 'map_' + str(epoch) + '.tmx'
+    def grid(self, width, height, min_size=None, rng=None, algorithm=None):
+        """
+        Randomly generated walls as a boolean array indexed `[x][y]`, without cocos.
+        `algorithm` is one of `layouts.ALGORITHMS`, `caves` ignore `min_size`.
+        """
+        self.rng = rng or random
+        settings = self.cfg.settings['generator']
+        if min_size is None:
+            min_size = settings['min_size']
+        algorithm = algorithm or settings.get('algorithm', 'division')
+        if algorithm not in ALGORITHMS:
+            raise ValueError('Unknown maze algorithm {!r}, expected one of {}'.format(algorithm, ALGORITHMS))
+        connectivity = settings.get('connectivity', 'repair')
+
+        for rejected in range(MAX_LAYOUTS):
+            if algorithm == 'division':
+                walls = self.divide(width, height, min_size)
+            else:
+                walls = LAYOUTS[algorithm](width, height, min_size, self.rng)
+            if not connectivity:
+                self.stats = {}
+                return walls
+            self.stats = self.connect(walls, connectivity == 'repair')
+            self.stats['rejected'] = rejected
+            if self.stats['regions'] == 1:
+                return walls
+
+        raise ValueError('No connected layout of %dx%d tiles with min_size %s in %d tries' %
+                         (width, height, min_size, MAX_LAYOUTS))
+
+    def divide(self, width, height, min_size):
+        """
+        Walls from `recursive_division` of one layout
+        """
+        # Borders of `assets/template.tmx`, divisions may reach past the level
+        cells = np.zeros((TEMPLATE_SIZE, TEMPLATE_SIZE), dtype=bool)
+        cells[[0, -1], :] = True
+        cells[:, [0, -1]] = True
 
         # Draw borders
-        border_x = template.cells[width]
-        for y in xrange(0,height+1):
-            border_x[y].tile = template.cells[0][0].tile
-
-        for x in xrange(0,width):
-            template.cells[x][height].tile = template.cells[0][0].tile
+        cells[width, :height+1] = True
+        cells[:width, height] = True
 
         # Start within borders
-        #self.recursive_division(template.cells, 3, (template.px_width/template.tw)-1, (template.px_height/template.th)-1, 0, 0)
-        self.recursive_division(template.cells, 3, width, height, 0, 0)
+        self.recursive_division(cells, min_size, width, height, 0, 0)
 
-        return template
+        return cells[:width+1, :height+1].copy()
+
+    def connect(self, walls, repair=True):
+        """
+        Label regions of open tiles in `walls`, opening doors between them
+        in place when `repair`. Returns reachable area statistics.
+        """
+        # Spawn tiles of `maze.corner_poses`
+        width, height = walls.shape[0]-1, walls.shape[1]-1
+        corners = ([1, width-1, 1, width-1], [1, 1, height-1, height-1])
+        spawns = int(walls[corners].sum())
+        if repair:
+            walls[corners] = False
+
+        labels = label_regions(walls)
+        sizes = region_sizes(labels)
+        floor = int(sizes.sum())
+        stats = {
+            'floor': floor,
+            # Before repair, the share of floor in the largest region
+            'reachable': float(sizes.max()) / floor if floor else 0.0,
+            'regions': len(sizes) + (0 if repair else spawns),
+            'doors': spawns if repair else 0
+        }
+
+        while repair and stats['regions'] > 1:
+            i, j, a, b = wall_doors(walls, labels)
+            if not len(i):
+                break
+
+            # Random doors spanning regions, one tile as a doorway of `recursive_division`
+            parent = dict((r, r) for r in np.unique(labels[labels >= 0]).tolist())
+            def find(r):
+                while parent[r] != r:
+                    r = parent[r]
+                return r
+            order = list(range(len(i)))
+            self.rng.shuffle(order)
+            for k in order:
+                ra, rb = find(int(a[k])), find(int(b[k]))
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+                    walls[i[k], j[k]] = False
+                    stats['doors'] += 1
+
+            labels = label_regions(walls)
+            stats['regions'] = len(region_sizes(labels))
+
+        return stats
 
     def recursive_division(self, cells, min_size, width, height, x=0, y=0, depth=0):
         """
@@ -51,7 +145,7 @@ class Generator():
             2. Place doorway randomly
             3. Repeat for each half
         """
-        assert isinstance(cells, list)
+        assert isinstance(cells, np.ndarray)
         assert isinstance(min_size, int) or isinstance(min_size, float)
         assert isinstance(width, int) or isinstance(width, float)
         assert isinstance(height, int) or isinstance(height, float)
@@ -68,7 +162,7 @@ class Generator():
         elif height < width:
             axis = HORIZONTAL
         else:
-            axis = randint(0,1)
+            axis = self.rng.randint(0,1)
 
         cut_size = height
         gap_size = width
@@ -84,8 +178,8 @@ class Generator():
             return
 
         # Random division and doorway
-        cut = randint(min_size, cut_size-min_size)
-        gap = randint(min_size, gap_size-min_size)
+        cut = self.rng.randint(min_size, cut_size-min_size)
+        gap = self.rng.randint(min_size, gap_size-min_size)
 
         if not (cut > 0 and gap > 0):
             #print('Reached zero sized cell')
@@ -99,26 +193,18 @@ class Generator():
             if axis == HORIZONTAL:
                 idx = x+gap_size
                 #print(idx,y+cut)
-                door = cells[idx][y+cut]
-                empty = empty or not door or not door.tile
-                #door.tile = cells[49][1].tile
+                empty = empty or not cells[idx][y+cut]
 
                 idx = x
                 #print(idx,y+cut)
-                door = cells[idx][y+cut]
-                empty = empty or not door or not door.tile
-                #door.tile = cells[49][0].tile
+                empty = empty or not cells[idx][y+cut]
             else:
                 idx = y+gap_size
                 #print(x+cut, idx)
-                door = cells[x+cut][idx]
-                empty = empty or not door or not door.tile
-                #door.tile = cells[49][0].tile
+                empty = empty or not cells[x+cut][idx]
                 idx = y
                 #print(x+cut,idx)
-                door = cells[x+cut][idx]
-                empty = empty or not door or not door.tile
-                #door.tile = cells[49][1].tile
+                empty = empty or not cells[x+cut][idx]
 
             # Try again on longest side
             if empty:
@@ -145,13 +231,12 @@ class Generator():
         depth += 1
 
         # Create new wall tiles
-        for i in xrange(0, gap_size):
+        for i in range(0, gap_size):
             if abs(gap - i) > 0:
-                # Copy wall tile from (0,0)
                 if axis == HORIZONTAL:
-                    cells[x+i][y+cut].tile = cells[0][0].tile
+                    cells[x+i][y+cut] = True
                 else:
-                    cells[x+cut][y+i].tile = cells[0][0].tile
+                    cells[x+cut][y+i] = True
 
         # Recurse into each half
         #print(x, y, [cut, gap], [cut_size, gap_size], 'H' if (axis == HORIZONTAL) else 'V')
@@ -0,0 +1,255 @@
+import itertools
+
+import numpy as np
+
+# Wall layouts by name, `division` is `Generator.recursive_division`
+ALGORITHMS = ('division', 'kruskal', 'prim', 'wilson', 'caves')
+
+# Share of tiles `prim` joins from its frontier each round
+PRIM_JOIN = 0.3
+# Share of walls `caves` starts from, and smoothing rounds
+CAVE_FILL = 0.45
+CAVE_ROUNDS = 4
+
+def join_roots(parent, u, v):
+    """
+    Union-find over edges `u`-`v` of flat indices, hooking the root of every
+    edge between two trees onto the lower root until none is left.
+    `parent` must point every index at its root, it does again on return.
+    """
+    while True:
+        pu, pv = parent[u], parent[v]
+        joined = pu != pv
+        if not joined.any():
+            return parent
+        np.minimum.at(parent, np.maximum(pu, pv)[joined], np.minimum(pu, pv)[joined])
+        # Point every index at its root
+        while True:
+            root = parent[parent]
+            if (root == parent).all():
+                break
+            parent = root
+
+def label_regions(walls):
+    """
+    Regions of open tiles joined side by side, -1 for walls. Each region is
+    labelled by its lowest flat index.
+    """
+    floor = ~walls
+    index = np.arange(walls.size).reshape(walls.shape)
+    # Runs up each column start joined, leaving edges across columns
+    start = floor.copy()
+    start[:, 1:] &= ~floor[:, :-1]
+    parent = np.maximum.accumulate(np.where(start, index, 0).ravel())
+    across = floor[:-1, :] & floor[1:, :]
+    parent = join_roots(parent, index[:-1, :][across], index[1:, :][across])
+    return np.where(floor, parent.reshape(walls.shape), -1)
+
+def region_sizes(labels):
+    """
+    Tiles in each region of `label_regions`
+    """
+    sizes = np.bincount(labels[labels >= 0])
+    return sizes[sizes > 0]
+
+def wall_doors(walls, labels):
+    """
+    Inner wall tiles beside open tiles of two different regions. Returns
+    tile indices and the region on either side, once per pair of sides.
+    """
+    inner = walls[1:-1, 1:-1]
+    sides = [labels[:-2, 1:-1], labels[2:, 1:-1], labels[1:-1, :-2], labels[1:-1, 2:]]
+    doors = []
+    for a, b in itertools.combinations(sides, 2):
+        found = inner & (a >= 0) & (b >= 0) & (a != b)
+        i, j = np.nonzero(found)
+        doors.append((i + 1, j + 1, a[found], b[found]))
+    return [np.concatenate(c) for c in zip(*doors)]
+
+def random_state(rng):
+    """
+    Numpy generator drawn from a `random.Random`, so layouts follow its seed
+    """
+    return np.random.RandomState(rng.getrandbits(32))
+
+def cell_edges(cols, rows):
+    """
+    Edges between cells of a `cols` by `rows` lattice, as flat indices of
+    each end. Cell `(a, b)` is `a * rows + b`.
+    """
+    index = np.arange(cols * rows).reshape(cols, rows)
+    u = np.concatenate([index[:-1, :].ravel(), index[:, :-1].ravel()])
+    v = np.concatenate([index[1:, :].ravel(), index[:, 1:].ravel()])
+    return u, v
+
+def lattice(width, height, min_size):
+    """
+    Passage width and cells across and up for tree layouts, passages are
+    `min_size - 1` tiles wide so rooms span `min_size` tiles as in `division`
+    """
+    span = int(max(1, min(min_size - 1, width - 1, height - 1)))
+    return span, width // (span + 1), height // (span + 1)
+
+def carve_tree(width, height, span, cols, rows, u, v):
+    """
+    Walls of a `width` by `height` level with square cells `span` tiles
+    across, open between the cells of edges `u`-`v`. Tiles left over past
+    the last cells repeat them, so spawn corners stay open.
+    """
+    pitch = span + 1
+    walls = np.ones((width + 1, height + 1), dtype=bool)
+    across = np.zeros(width + 1, dtype=bool)
+    up = np.zeros(height + 1, dtype=bool)
+    across[1:cols * pitch] = np.arange(cols * pitch - 1) % pitch < span
+    up[1:rows * pitch] = np.arange(rows * pitch - 1) % pitch < span
+    walls[across[:, None] & up[None, :]] = False
+
+    # Passage through the wall between two cells
+    ua, ub = np.divmod(u, rows)
+    va, vb = np.divmod(v, rows)
+    tiles = np.arange(span)
+    x = np.where(ua != va, np.minimum(ua, va) * pitch + pitch, ua * pitch + 1)
+    y = np.where(ub != vb, np.minimum(ub, vb) * pitch + pitch, ub * pitch + 1)
+    along = (ua == va)[:, None]
+    walls[x[:, None] + np.where(along, tiles, 0), y[:, None] + np.where(along, 0, tiles)] = False
+
+    walls[cols * pitch:width, :] = walls[cols * pitch - 1, :]
+    walls[:, rows * pitch:height] = walls[:, rows * pitch - 1][:, None]
+    return walls
+
+def kruskal(width, height, min_size, rng):
+    """
+    Randomised Kruskal: the spanning tree of cells over random edge weights,
+    built by Boruvka rounds, each tree taking its lightest edge out at once
+    """
+    span, cols, rows = lattice(width, height, min_size)
+    u, v = cell_edges(cols, rows)
+    weight = random_state(rng).permutation(len(u))
+    by_weight = np.argsort(weight)
+
+    parent = np.arange(cols * rows)
+    tree = np.zeros(len(u), dtype=bool)
+    while True:
+        pu, pv = parent[u], parent[v]
+        out = pu != pv
+        if not out.any():
+            break
+        lightest = np.full(cols * rows, len(u))
+        np.minimum.at(lightest, pu[out], weight[out])
+        np.minimum.at(lightest, pv[out], weight[out])
+        picked = by_weight[lightest[lightest < len(u)]]
+        tree[picked] = True
+        parent = join_roots(parent, u[picked], v[picked])
+
+    return carve_tree(width, height, span, cols, rows, u[tree], v[tree])
+
+def prim(width, height, min_size, rng):
+    """
+    Randomised Prim: one tree grown from a random cell, each round joining
+    a random share of the cells beside it by one of their edges into it
+    """
+    span, cols, rows = lattice(width, height, min_size)
+    u, v = cell_edges(cols, rows)
+    state = random_state(rng)
+
+    inside = np.zeros(cols * rows, dtype=bool)
+    inside[state.randint(cols * rows)] = True
+    tree = np.zeros(len(u), dtype=bool)
+    while not inside.all():
+        frontier = np.flatnonzero(inside[u] != inside[v])
+        outer = np.where(inside[u[frontier]], v[frontier], u[frontier])
+        # One random edge for each cell outside
+        key = state.random_sample(len(frontier))
+        best = np.full(cols * rows, 2.0)
+        np.minimum.at(best, outer, key)
+        edge = key == best[outer]
+        join = state.random_sample(len(frontier)) < PRIM_JOIN
+        join[np.argmin(np.where(edge, key, 2.0))] = True
+        joined = frontier[edge & join]
+        tree[joined] = True
+        inside[u[joined]] = True
+        inside[v[joined]] = True
+
+    return carve_tree(width, height, span, cols, rows, u[tree], v[tree])
+
+def wilson(width, height, min_size, rng):
+    """
+    Wilson: a uniform spanning tree of cells, by popping cycles. Every cell
+    points at a random neighbour, cells on cycles draw again, all cycles
+    at once, until every cell leads to a random root.
+    """
+    span, cols, rows = lattice(width, height, min_size)
+    n = cols * rows
+    u, v = cell_edges(cols, rows)
+    state = random_state(rng)
+    if n == 1:
+        # One cell, the tree has no edges
+        return carve_tree(width, height, span, cols, rows, u, v)
+
+    # Neighbours of each cell, grouped by cell from `first`
+    ends = np.concatenate([u, v])
+    others = np.concatenate([v, u])
+    order = np.argsort(ends, kind='mergesort')
+    degree = np.bincount(ends, minlength=n)
+    first = np.concatenate([[0], np.cumsum(degree)[:-1]])
+    neighbours = others[order]
+
+    root = state.randint(n)
+    cells = np.arange(n)
+    successor = neighbours[first + (state.random_sample(n) * degree).astype(np.intp)]
+    successor[root] = root
+    steps = max(1, int(np.ceil(np.log2(n))))
+    while True:
+        # After `n` steps every cell is on a cycle, or at the root
+        ahead = successor
+        for i in range(steps):
+            ahead = ahead[ahead]
+        cycle = np.zeros(n, dtype=bool)
+        cycle[ahead] = True
+        cycle[root] = False
+        if not cycle.any():
+            break
+        drawn = np.flatnonzero(cycle)
+        successor[drawn] = neighbours[first[drawn] + (state.random_sample(len(drawn)) * degree[drawn]).astype(np.intp)]
+
+    tail = cells != root
+    return carve_tree(width, height, span, cols, rows, cells[tail], successor[tail])
+
+def caves(width, height, min_size, rng):
+    """
+    Cellular automata caves: random walls smoothed to those with most of
+    their 3x3 block walled, spawn corners opened and every region joined
+    to the largest by a corridor
+    """
+    state = random_state(rng)
+    walls = state.random_sample((width + 1, height + 1)) < CAVE_FILL
+    corners = ([1, width - 1, 1, width - 1], [1, 1, height - 1, height - 1])
+    for k in range(CAVE_ROUNDS):
+        walls[[0, -1], :] = True
+        walls[:, [0, -1]] = True
+        padded = np.pad(walls, 1, mode='constant', constant_values=True)
+        block = sum(padded[i:i + width + 1, j:j + height + 1].astype(np.int8)
+                    for i in range(3) for j in range(3))
+        walls = block >= 5
+    walls[[0, -1], :] = True
+    walls[:, [0, -1]] = True
+    walls[corners] = False
+
+    labels = label_regions(walls)
+    regions = np.unique(labels[labels >= 0])
+    if len(regions) > 1:
+        sizes = np.bincount(labels[labels >= 0])[regions]
+        main = np.argwhere(labels == regions[np.argmax(sizes)])
+        for region in regions[regions != regions[np.argmax(sizes)]]:
+            tiles = np.argwhere(labels == region)
+            (x0, y0), (x1, y1) = tiles[state.randint(len(tiles))], main[state.randint(len(main))]
+            walls[min(x0, x1):max(x0, x1) + 1, y0] = False
+            walls[x1, min(y0, y1):max(y0, y1) + 1] = False
+    return walls
+
+LAYOUTS = {
+    'kruskal': kruskal,
+    'prim': prim,
+    'wilson': wilson,
+    'caves': caves
+}
@@ -0,0 +1,234 @@
+import math
+from collections import deque
+
+import numpy as np
+
+# Positions drawn for respawning items of each level
+RESPAWN_POSITIONS = 64
+
+class Maze(object):
+    """
+    Maze
+
+    Static level data, shared by every environment and snapshot of a level.
+    `walls[i, j]` is the tile `i` across and `j` up, as `MapLayer.cells`.
+    """
+
+    def __init__(self, walls, tw, th, spawn, rotation, item_positions=None,
+                 item_radius=None, item_kinds=None, item_types=(), respawn_positions=None,
+                 item_velocities=None):
+        self.walls = np.array(walls, dtype=bool)
+        self.walls.setflags(write=False)
+        self.cols, self.rows = self.walls.shape
+        self.tw = tw
+        self.th = th
+        # Outer wall sits on the last row/column
+        self.width = tw * (self.cols - 1)
+        self.height = th * (self.rows - 1)
+
+        self.spawn = (float(spawn[0]), float(spawn[1]))
+        self.spawn_cell = (int(self.spawn[0] // tw), int(self.spawn[1] // th))
+        self.rotation = float(rotation)
+
+        self.item_types = list(item_types)
+        if item_positions is None:
+            item_positions = np.zeros((0, 2))
+            item_radius = np.zeros(0)
+            item_kinds = np.zeros(0, dtype=np.intp)
+        self.item_positions = np.array(item_positions, dtype=np.float64).reshape(-1, 2)
+        self.item_radius = np.array(item_radius, dtype=np.float64)
+        self.item_kinds = np.array(item_kinds, dtype=np.intp)
+        # Taken items of types which respawn reappear at each of these in turn
+        if respawn_positions is None:
+            respawn_positions = np.zeros((0, 2))
+        self.respawn_positions = np.array(respawn_positions, dtype=np.float64).reshape(-1, 2)
+        # Pixels per second each item drifts at, bouncing off walls
+        if item_velocities is None:
+            item_velocities = np.zeros((self.items_num, 2))
+        self.item_velocities = np.array(item_velocities, dtype=np.float64).reshape(-1, 2)
+        for a in (self.item_positions, self.item_radius, self.item_kinds, self.respawn_positions,
+                  self.item_velocities):
+            a.setflags(write=False)
+
+        # Distance fields by origin tile, see `distance_field`
+        self.distances = {}
+
+    @property
+    def items_num(self):
+        return len(self.item_kinds)
+
+    def distance_field(self, cell=None):
+        """
+        Tiles along open floor from `cell` to every tile, the spawn tile by
+        default. Computed once per origin and shared, -1 where unreachable.
+        """
+        cell = self.spawn_cell if cell is None else (int(cell[0]), int(cell[1]))
+        field = self.distances.get(cell)
+        if field is None:
+            field = bfs_distance(self.walls, cell)
+            field.setflags(write=False)
+            self.distances[cell] = field
+        return field
+
+    def distance_at_pixel(self, x, y, cell=None):
+        """
+        Tiles from `cell` to the tile under a point, see `distance_field`
+        """
+        i, j = int(x // self.tw), int(y // self.th)
+        if i < 0 or j < 0 or i >= self.cols or j >= self.rows:
+            return -1
+        return int(self.distance_field(cell)[i, j])
+
+    def wall_at_pixel(self, x, y):
+        """
+        Wall under a point, outside the grid is open as in `MapLayer.get_at_pixel`
+        """
+        i, j = int(x // self.tw), int(y // self.th)
+        if i < 0 or j < 0 or i >= self.cols or j >= self.rows:
+            return False
+        return bool(self.walls[i, j])
+
+def bfs_distance(walls, cell):
+    """
+    Breadth-first steps between open tiles from `cell`, -1 for walls and unreachable tiles
+    """
+    cols, rows = walls.shape
+    distance = np.full((cols, rows), -1, dtype=np.int32)
+    i, j = cell
+    if i < 0 or j < 0 or i >= cols or j >= rows or walls[i, j]:
+        return distance
+
+    blocked = walls.tolist()
+    steps = [[-1] * rows for _ in range(cols)]
+    steps[i][j] = 0
+    queue = deque([cell])
+    while queue:
+        i, j = queue.popleft()
+        d = steps[i][j] + 1
+        for ni, nj in ((i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1)):
+            if 0 <= ni < cols and 0 <= nj < rows and not blocked[ni][nj] and steps[ni][nj] < 0:
+                steps[ni][nj] = d
+                queue.append((ni, nj))
+    distance[:] = steps
+    return distance
+
+def corner_poses(walls, tw, th):
+    """
+    Positions and rotations facing into the maze from each corner
+    """
+    tiles_w, tiles_h = walls.shape[0]-1, walls.shape[1]-1
+    padding = (tw*1.5, th*1.5)
+    corners = [
+        (padding[0], padding[1]), # Bottom left
+        (((tiles_w+1)*tw)-padding[0], padding[1]), # Bottom right
+        (padding[0], ((tiles_h+1)*th)-padding[1]), # Top right
+        (((tiles_w+1)*tw)-padding[0], ((tiles_h+1)*th)-padding[1]) # Top left
+    ]
+    rotations = [
+        45,
+        -45,
+        135,
+        -135
+    ]
+    return corners, rotations
+
+def spawn_pose(walls, tw, th, rng):
+    """
+    Start in random corner, returns position and rotation
+    """
+    corner = rng.randint(0,3)
+    corners, rotations = corner_poses(walls, tw, th)
+    return corners[corner], rotations[corner]
+
+def clear_of_walls(maze, cx, cy, r):
+    return not (maze.wall_at_pixel(cx-r, cy-r) or maze.wall_at_pixel(cx+r, cy-r) or
+                maze.wall_at_pixel(cx-r, cy+r) or maze.wall_at_pixel(cx+r, cy+r))
+
+def respawn_positions(maze, r, num, rng):
+    """
+    Up to `num` random open positions for items of radius `r`, apart from
+    walls only as other items move
+    """
+    positions = []
+    for n in range(num):
+        for tries in range(100):
+            cx = r + rng.random() * (maze.width - 2.0 * r)
+            cy = r + rng.random() * (maze.height - 2.0 * r)
+            if clear_of_walls(maze, cx, cy, r):
+                positions.append((cx, cy))
+                break
+    return positions
+
+def place_items(maze, player_radius, mode, counts, rng):
+    """
+    Random open positions for `counts` items of each type in `mode`.
+    Items keep `1.1` radius from each other and the player, those not
+    placed within 100 tries are dropped.
+    """
+    positions, radius, kinds = [], [], []
+    types = list(mode['items'])
+    # Separation is tested edge to edge, the player first
+    placed = [(maze.spawn[0], maze.spawn[1], player_radius)]
+
+    for kind, item_type in enumerate(types):
+        r = mode['items'][item_type]['scale'] * player_radius
+        min_separation = 1.1 * r
+        for n in range(counts[item_type]):
+            tries = 0
+            while tries < 100:
+                cx = r + rng.random() * (maze.width - 2.0 * r)
+                cy = r + rng.random() * (maze.height - 2.0 * r)
+
+                # Test if colliding with wall
+                if not clear_of_walls(maze, cx, cy, r):
+                    continue
+
+                near = False
+                for ox, oy, o_r in placed:
+                    if math.sqrt((cx-ox)**2 + (cy-oy)**2) <= r + o_r + min_separation:
+                        near = True
+                        break
+                if not near:
+                    placed.append((cx, cy, r))
+                    positions.append((cx, cy))
+                    radius.append(r)
+                    kinds.append(kind)
+                    break
+                tries += 1
+
+    # Drawn after placing, so levels without respawns keep their items
+    respawn = [mode['items'][t]['scale'] * player_radius for t in types if mode['items'][t].get('respawn')]
+    ring = respawn_positions(maze, max(respawn), RESPAWN_POSITIONS, rng) if respawn else None
+
+    # Moving items head in a random direction, drawn last likewise
+    velocities = []
+    for kind in kinds:
+        speed = mode['items'][types[kind]].get('speed', 0.0)
+        if speed:
+            heading = rng.random() * 2 * math.pi
+            velocities.append((speed * math.sin(heading), speed * math.cos(heading)))
+        else:
+            velocities.append((0.0, 0.0))
+
+    return {
+        'item_positions': positions,
+        'item_radius': radius,
+        'item_kinds': kinds,
+        'item_types': types,
+        'respawn_positions': ring,
+        'item_velocities': velocities
+    }
+
+def build_maze(generator, cfg, mode, level, rng):
+    """
+    Generate walls, spawn and items of `curriculum.Level` from `rng`
+    """
+    tw, th = cfg.tiles['tw'], cfg.tiles['th']
+    walls = generator.grid(level.width, level.height, level.min_size, rng, mode.get('generator'))
+    spawn, rotation = spawn_pose(walls, tw, th, rng)
+    maze = Maze(walls, tw, th, spawn, rotation)
+    if not mode['items']:
+        return maze
+
+    items = place_items(maze, cfg.settings['player']['radius'], mode, level.items, rng)
+    return Maze(walls, tw, th, spawn, rotation, **items)
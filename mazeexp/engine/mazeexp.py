@@ -1,5 +1,7 @@
 from __future__ import division, print_function, unicode_literals
 
+import random
+
 import numpy as np
 import pyglet
 #from pyglet.gl import *
@@ -7,9 +9,12 @@ import pyglet
 import cocos
 from cocos.director import director
 
-import config
-from message import MessageLayer
-from world import WorldLayer
+from . import config
+from .message import MessageLayer
+from .metrics import EpisodeMetrics
+from .recorder import TrajectoryRecorder
+from .simulation import sensor_layout, observation_storage
+from .world import WorldLayer
 
 class MazeExplorer():
     """
@@ -18,56 +23,118 @@ class MazeExplorer():
     Wrapper for game engine
     """
 
-    def __init__(self, mode_id=0, visible = True):
-        config.settings['window']['visible'] = visible
-
-        self.mode_id = int(mode_id)
-        self.mode = config.modes[self.mode_id]
+    def __init__(self, mode_id=0, visible = True, cfg=None, curriculum=None, seed=None):
+        # Settings for this environment only, see `config.Config`
+        self.cfg = cfg or config.default()
+        # Optional `curriculum.Curriculum`, may be shared across environments
+        self.curriculum = curriculum
+        # Level seeds are drawn from here unless passed to `reset`
+        self.rng = random.Random(seed)
+        self.seed = None
+        self.recorder = None
+        # Episodes played so far, recorded on `reset`
+        self.metrics = EpisodeMetrics()
+        self.world_layer = None
+        # Draw every Nth rendered step, ticks in between only simulate
+        self.render_interval = max(1, int(self.cfg.settings['view']['render_interval']))
+        self.frame = 0
+
+        # Mode number or path to a mode definition
+        self.mode_id = mode_id
+        self.mode = config.get_mode(self.mode_id)
+
+        window = dict(self.cfg.settings['window'])
+        window.setdefault('visible', visible)
 
         self.director = director
-        self.director.init(**config.settings['window'])
+        self.director.init(**window)
         #pyglet.font.add_directory('.') # adjust as necessary if font included
         self.z = 0
 
-        self.actions_num = len(config.settings['player']['actions'])
+        self.actions_num = len(self.cfg.settings['player']['actions'])
         # Sensors
-        self.observation_num = config.settings['player']['sensors']['num']
+        self.observation_num = len(sensor_layout(self.cfg.settings['player']['sensors'])[0])
         # Plus one for battery indicator
         if 'battery' in self.mode:
             self.observation_num += 1
         # Observation channels as game mode requires, plus one for walls
         self.observation_chans = len(self.mode['items']) + 1
 
-    def reset(self):
+    def observation_shape(self):
+        if len(self.mode['items']) > 0:
+            return (self.observation_num, self.observation_chans)
+        return (self.observation_num,)
+
+    def record(self, path, capacity=4096, compress=False):
         """
-        Attach a new engine to director
+        Stream every `act` step to a trajectory log, see `recorder.TrajectoryRecorder`
+        """
+        self.stop_recording()
+        dtype = observation_storage(self.cfg.settings['player'].get('observation_dtype', 'float64'))
+        self.recorder = TrajectoryRecorder(path, self.observation_shape(), capacity, compress, dtype)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            try:
+                self.recorder.close()
+            finally:
+                self.recorder = None
+
+    def reset(self, seed=None, level=None, render=True):
+        """
+        Start a new episode on the same engine, `seed` and `level` reproduce a level
+        """
+        self.seed = self.rng.getrandbits(32) if seed is None else seed
+        if self.world_layer is not None:
+            self.metrics.record(self.world_layer.sim, [0], self.mode)
+            self.world_layer.restart(self.seed, level)
+        else:
+            self.create_scene(level)
+
+        self.frame = 0
+
+        # Step once to refresh before `act`
+        if render:
+            self.step()
+        else:
+            self.tick()
+
+        if self.recorder is not None:
+            level = self.world_layer.level
+            self.recorder.begin(self.seed, {
+                'mode': self.mode_id,
+                'digest': self.mode.get('digest'),
+                'level': [level.width, level.height, level.min_size],
+                'items': level.items
+            })
+
+        # TODO: Reset to `ones`?
+        return self.world_layer.get_state()
+
+    def create_scene(self, level=None):
+        """
+        Attach the engine to director, kept for the lifetime of the environment
         """
         self.scene = cocos.scene.Scene()
         self.z = 0
 
-        palette = config.settings['view']['palette']
+        palette = self.cfg.settings['view']['palette']
         #Player.palette = palette
         r, g, b = palette['bg']
         self.scene.add(cocos.layer.ColorLayer(r, g, b, 255), z=self.z)
         self.z += 1
-        message_layer = MessageLayer()
+        message_layer = MessageLayer(self.cfg)
         self.scene.add(message_layer, z=self.z)
         self.z += 1
-        self.world_layer = WorldLayer(self.mode_id, fn_show_message=message_layer.show_message)
+        self.world_layer = WorldLayer(self.mode_id, fn_show_message=message_layer.show_message, cfg=self.cfg, curriculum=self.curriculum, seed=self.seed, level=level)
         self.scene.add(self.world_layer, z=self.z)
         self.z += 1
 
         self.director._set_scene(self.scene)
 
-        # Step once to refresh before `act`
-        self.step()
-
-        # TODO: Reset to `ones`?
-        return self.world_layer.get_state()
-
-    def act(self, action):
+    def act(self, action, render=True):
         """
-        Take one action for one step
+        Take one action for one step, without drawing unless `render`
         """
         # FIXME: Hack to change in return type
         action = int(action)
@@ -84,23 +151,56 @@ class MazeExplorer():
                 self.world_layer.buttons[key] = 1
 
         # Act in the environment
-        self.step()
+        if render:
+            self.step()
+        else:
+            self.tick()
 
         observation = self.world_layer.get_state()
-        reward = self.world_layer.player.get_reward()
+        reward = self.world_layer.get_reward()
         terminal = self.world_layer.player.game_over
-        info = {}
+        info = self.world_layer.sim.episode_info()
+
+        if self.recorder is not None:
+            x, y, rotation = self.world_layer.get_pose()
+            self.recorder.append(action, x, y, rotation, observation, reward, terminal)
 
         return observation, reward, terminal, info
 
+    def get_snapshot(self):
+        """
+        Compact copy of the current state for tree search, see `simulation.Snapshot`.
+        The maze is shared, not copied, so snapshots only restore on this level.
+        """
+        return self.world_layer.get_snapshot()
+
+    def restore(self, snapshot):
+        """
+        Return to a state from `get_snapshot`, returns its observation
+        """
+        self.world_layer.restore(snapshot)
+        return self.world_layer.get_state()
+
+    def rollout_batch(self, state, action_sequences):
+        """
+        Evaluate action sequences of shape (n, horizon) from `state`, a
+        snapshot or `None` for the current state, in one vectorised call.
+        Returns `(reward_sums, terminals, observations)` with a row per sequence.
+        """
+        if state is None:
+            state = self.get_snapshot()
+        return self.world_layer.rollout_batch(state, action_sequences)
+
     def step(self):
         """
-        Step the engine one tick
+        Step the engine one tick, drawing every `render_interval` ticks
         """
         self.director.window.switch_to()
         self.director.window.dispatch_events()
-        self.director.window.dispatch_event('on_draw')
-        self.director.window.flip()
+        if self.frame % self.render_interval == 0:
+            self.director.window.dispatch_event('on_draw')
+            self.director.window.flip()
+        self.frame += 1
 
         # Ticking before events caused glitches.
         pyglet.clock.tick()
@@ -111,6 +211,22 @@ class MazeExplorer():
         #    window.dispatch_event('on_draw')
         #    window.flip()
 
+    def tick(self):
+        """
+        Step the simulation one tick without drawing or the clock
+        """
+        assert self.world_layer.force_fps > 0, "Headless ticks need a fixed `force_fps`"
+        self.world_layer.update(1 / self.world_layer.force_fps)
+
+    def render(self):
+        """
+        Draw the current state without stepping
+        """
+        self.director.window.switch_to()
+        self.director.window.dispatch_events()
+        self.director.window.dispatch_event('on_draw')
+        self.director.window.flip()
+
     def run(self):
         """
         Run in real-time
@@ -1,7 +1,7 @@
 import cocos
 import cocos.actions as ac
 
-import config
+from . import config
 
 class MessageLayer(cocos.layer.Layer):
 
@@ -15,12 +15,17 @@ class MessageLayer(cocos.layer.Layer):
     optional callback after hiding the message.
     """
 
+    def __init__(self, cfg=None):
+        super(MessageLayer, self).__init__()
+
+        self.cfg = cfg or config.default()
+
     def show_message(self, msg, callback=None):
-        w, h = config.settings['window']['width'], config.settings['window']['height']
+        w, h = self.cfg.settings['window']['width'], self.cfg.settings['window']['height']
 
         self.msg = cocos.text.Label(msg,
                                     font_size=52,
-                                    font_name=config.settings['view']['font_name'],
+                                    font_name=self.cfg.settings['view']['font_name'],
                                     anchor_y='center',
                                     anchor_x='center',
                                     width=w,
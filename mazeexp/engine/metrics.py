@@ -0,0 +1,196 @@
+from __future__ import division
+
+import numpy as np
+
+from .world_rewards import EVENT_BATTERY
+
+# Steps and counts, the first bin holds zero then bins grow tenfold every ten
+COUNT_EDGES = np.concatenate([[0.0], np.logspace(0, 6, 61)])
+# Either sign of `COUNT_EDGES`, for scores
+SIGNED_EDGES = np.concatenate([-COUNT_EDGES[::-1], COUNT_EDGES[1:]])
+SHARE_EDGES = np.linspace(0, 1, 51)
+BATTERY_EDGES = np.linspace(0, 100, 51)
+
+# Histogram edges by metric, item types by `items` prefix
+METRIC_EDGES = {
+    'length': COUNT_EDGES,
+    'coverage': SHARE_EDGES,
+    'items': COUNT_EDGES,
+    'score': SIGNED_EDGES,
+    'battery': BATTERY_EDGES,
+    'goal': SHARE_EDGES,
+    'time_to_goal': COUNT_EDGES,
+    'truncated': SHARE_EDGES
+}
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+def mode_key(mode):
+    """
+    Name metrics are kept under for a game mode, or a name as is
+    """
+    if isinstance(mode, dict):
+        return mode.get('name') or mode.get('digest') or 'mode'
+    return str(mode)
+
+def episode_values(sim, rows):
+    """
+    Metrics of the episodes of `rows` of `sim` as they stand, NaN where
+    undefined. Coverage is the share of open tiles visited, and episodes
+    neither over nor at the goal are `truncated`.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    counts = sim.episode_events[rows]
+    visited = sim.visited[rows].sum(axis=(1, 2))
+    floor = sim.floor[sim.slot[rows]].sum(axis=(1, 2))
+    values = {
+        'length': counts[:, EVENT_BATTERY],
+        'coverage': visited / np.maximum(floor, 1),
+        'items': counts[:, sim.item_columns].sum(axis=1),
+        'score': sim.score[rows],
+        'battery': sim.battery[rows],
+        'truncated': ~(sim.game_over[rows] | sim.goal_reached[rows])
+    }
+    for item_type, column in zip(sim.item_types, sim.item_columns):
+        values['items.' + item_type] = counts[:, column]
+    if sim.goal_term is not None:
+        values['goal'] = sim.goal_reached[rows].astype(np.float64)
+        values['time_to_goal'] = np.where(sim.goal_reached[rows], sim.goal_tick[rows], np.nan)
+    return values
+
+class Statistic(object):
+    """
+    Statistic
+
+    Running count, moments, range and histogram of one metric. Adding two
+    is adding their arrays, so statistics merge across processes.
+    """
+    def __init__(self, edges):
+        self.edges = edges
+        self.count = 0
+        self.total = 0.0
+        self.squares = 0.0
+        self.low = np.inf
+        self.high = -np.inf
+        self.histogram = np.zeros(len(edges) - 1, dtype=np.int64)
+
+    def add(self, values):
+        """
+        Count `values`, those past the edges in the outer bins
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        self.total += values.sum()
+        self.squares += (values ** 2).sum()
+        self.low = min(self.low, values.min())
+        self.high = max(self.high, values.max())
+        bins = np.clip(np.searchsorted(self.edges, values, side='right') - 1, 0, len(self.histogram) - 1)
+        self.histogram += np.bincount(bins, minlength=len(self.histogram))
+
+    def merge(self, other):
+        self.count += other.count
+        self.total += other.total
+        self.squares += other.squares
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+        self.histogram += other.histogram
+
+    def quantile(self, q):
+        """
+        Value below which a share `q` of values fall, interpolated within
+        its histogram bin and kept within the range seen
+        """
+        if not self.count:
+            return np.nan
+        cumulative = np.cumsum(self.histogram)
+        target = q * self.count
+        k = min(int(np.searchsorted(cumulative, target)), len(self.histogram) - 1)
+        before = cumulative[k - 1] if k else 0
+        left = max(self.edges[k], self.low)
+        right = min(self.edges[k + 1], self.high)
+        share = (target - before) / self.histogram[k] if self.histogram[k] else 0.0
+        return float(min(max(left + share * (right - left), self.low), self.high))
+
+    def summary(self, quantiles=QUANTILES):
+        if not self.count:
+            return {'count': 0}
+        mean = self.total / self.count
+        return {
+            'count': self.count,
+            'mean': float(mean),
+            'std': float(np.sqrt(max(self.squares / self.count - mean ** 2, 0.0))),
+            'min': float(self.low),
+            'max': float(self.high),
+            'quantiles': dict((q, self.quantile(q)) for q in quantiles),
+            'histogram': (self.edges, self.histogram.copy())
+        }
+
+class EpisodeMetrics(object):
+    """
+    EpisodeMetrics
+
+    Streaming statistics of finished episodes by game mode
+
+    Responsabilities:
+        Record episodes of a `simulation.Simulation` as they end, flagging
+        those cut short by a reset as truncated
+        Keep running means, histograms and quantiles of each metric
+        Merge with metrics of other threads or processes, snapshot on demand
+    """
+
+    def __init__(self):
+        # Statistics by metric, by mode key
+        self.modes = {}
+
+    def record(self, sim, rows, mode):
+        """
+        Count the episodes of `rows` of `sim`, before they reset or load.
+        Episodes without a step yet are skipped.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        rows = rows[sim.episode_events[rows, EVENT_BATTERY] > 0]
+        if len(rows):
+            self.add(mode, episode_values(sim, rows))
+
+    def add(self, mode, values):
+        """
+        Count episodes from `values`, arrays by metric name
+        """
+        stats = self.modes.setdefault(mode_key(mode), {})
+        for name, value in values.items():
+            if name not in stats:
+                stats[name] = Statistic(METRIC_EDGES[name.split('.')[0]])
+            stats[name].add(value)
+
+    def merge(self, other):
+        """
+        Add the episodes of `other`, e.g. returned by a worker process
+        """
+        for mode, metrics in other.modes.items():
+            stats = self.modes.setdefault(mode, {})
+            for name, stat in metrics.items():
+                if name not in stats:
+                    stats[name] = Statistic(stat.edges)
+                stats[name].merge(stat)
+        return self
+
+    @classmethod
+    def merged(cls, metrics):
+        merged = cls()
+        for other in metrics:
+            merged.merge(other)
+        return merged
+
+    @property
+    def episodes(self):
+        return sum(stats['length'].count for stats in self.modes.values() if 'length' in stats)
+
+    def snapshot(self, quantiles=QUANTILES):
+        """
+        Summary of every metric by mode, copied so recording may go on
+        """
+        return dict((mode, dict((name, stat.summary(quantiles)) for name, stat in stats.items()))
+                    for mode, stats in self.modes.items())
@@ -0,0 +1,92 @@
+import random
+
+import numpy as np
+
+from . import config
+from .curriculum import Level
+from .generator import Generator
+from .maze import build_maze, corner_poses
+from .metrics import EpisodeMetrics
+from .simulation import Simulation
+from .world_rewards import compile_mode
+
+class MultiAgentMaze(object):
+    """
+    MultiAgentMaze
+
+    `num_agents` headless players in one maze, stepped as one shared
+    `simulation.Simulation`. Agents spawn in turn at each corner, the first
+    where a single player would. Each explores for itself, an item goes to
+    the first agent to reach it. Agents in a terminal state hold until
+    `reset`, with `team` every agent receives the sum of rewards.
+
+    Responsabilities:
+        Generate one level per episode for all agents
+        Step agents still playing together
+        Share rewards between cooperating agents
+    """
+
+    def __init__(self, num_agents, mode_id=0, cfg=None, curriculum=None, seed=None, team=False):
+        self.cfg = cfg or config.default()
+        self.mode_id = mode_id
+        self.mode = config.get_mode(mode_id)
+        self.battery = 'battery' in self.mode
+        self.num_agents = num_agents
+        self.actions_num = len(self.cfg.settings['player']['actions'])
+        self.curriculum = curriculum
+        self.team = team
+
+        self.generator = Generator(self.cfg)
+        self.compiled_mode = compile_mode(self.mode)
+        self.rng = random.Random(seed)
+        self.seed = None
+        self.maze = None
+        self.sim = None
+        # Episodes of every agent, recorded on `reset`
+        self.metrics = EpisodeMetrics()
+
+    def sample_level(self):
+        if self.curriculum is None:
+            return Level.default(self.cfg, self.mode)
+        return self.curriculum.sample(self.mode)
+
+    def reset(self, seed=None):
+        """
+        New level for every agent, `seed` reproduces a level. Returns observations.
+        """
+        self.seed = self.rng.getrandbits(32) if seed is None else seed
+        self.maze = build_maze(self.generator, self.cfg, self.mode, self.sample_level(), random.Random(self.seed))
+
+        if self.sim is None:
+            self.sim = Simulation(self.maze, self.cfg, self.compiled_mode, self.num_agents, shared=True)
+        else:
+            self.metrics.record(self.sim, self.sim.index, self.mode)
+            self.sim.load(self.sim.index, self.maze)
+
+        corners, rotations = corner_poses(self.maze.walls, self.maze.tw, self.maze.th)
+        first = rotations.index(self.maze.rotation)
+        order = [(first + i) % len(corners) for i in range(self.num_agents)]
+        self.sim.spawn_at(self.sim.index, [corners[k] for k in order], [rotations[k] for k in order])
+        self.sim.sense()
+        return self.sim.observation(self.battery)
+
+    def step(self, actions):
+        """
+        Step agents still playing by one action each, returns `(observations, rewards, terminals)`
+        """
+        actions = np.asarray(actions, dtype=np.intp)
+        assert actions.shape == (self.num_agents,), "Expected one action per agent"
+
+        sim = self.sim
+        sim.step_actions(actions, mask=~sim.game_over)
+        rewards = sim.take_reward()
+        if self.team:
+            rewards[:] = rewards.sum()
+        return sim.observation(self.battery), rewards, sim.game_over.copy()
+
+    @property
+    def done(self):
+        """
+        Every agent reached a terminal state
+        """
+        return bool(self.sim.game_over.all())
@@ -0,0 +1,451 @@
+import heapq
+import random
+import multiprocessing
+
+import numpy as np
+
+from . import config
+from .curriculum import Level
+from .generator import Generator
+from .maze import build_maze
+from .recorder import TrajectoryRecorder, record_dtype
+from .simulation import Simulation, sensor_layout, observation_storage
+from .world_rewards import compile_mode
+
+NEIGHBOURS = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+# Waypoints count as reached within this fraction of a tile
+REACH = 0.3
+# Heading errors in degrees to turn in place, or to turn while moving
+TURN_IN_PLACE = 40.0
+TURN_MOVING = 6.0
+# Extra tiles a route will take to avoid passing a negative item
+HAZARD_COST = 20
+
+def descend(field, tile):
+    """
+    Tiles from the origin of a `bfs_distance` field to `tile`
+    """
+    path = [tile]
+    i, j = tile
+    cols, rows = field.shape
+    while field[i, j] > 0:
+        d = field[i, j]
+        for di, dj in NEIGHBOURS:
+            ni, nj = i + di, j + dj
+            if 0 <= ni < cols and 0 <= nj < rows and field[ni, nj] == d - 1:
+                i, j = ni, nj
+                break
+        path.append((i, j))
+    return path[::-1]
+
+def covering_route(walls, start):
+    """
+    Walk of adjacent open tiles from `start`, depth first, entering only
+    tiles next to floor not yet passed. Ends on the last tile entered.
+    """
+    cols, rows = walls.shape
+    floor = ~walls
+    seen = np.zeros(walls.shape, dtype=bool)
+
+    def pass_by(i, j):
+        # As `Simulation.visit`, the tile and its neighbours
+        seen[max(i - 1, 0):i + 2, j] = True
+        seen[i, max(j - 1, 0):j + 2] = True
+
+    def unseen(i, j):
+        for di, dj in ((0, 0),) + NEIGHBOURS:
+            ni, nj = i + di, j + dj
+            if 0 <= ni < cols and 0 <= nj < rows and floor[ni, nj] and not seen[ni, nj]:
+                return True
+        return False
+
+    route = [start]
+    stack = [start]
+    entered = set(stack)
+    pass_by(*start)
+    last = 0
+    while stack:
+        i, j = stack[-1]
+        for di, dj in NEIGHBOURS:
+            tile = (i + di, j + dj)
+            if (0 <= tile[0] < cols and 0 <= tile[1] < rows and floor[tile]
+                    and tile not in entered and unseen(*tile)):
+                stack.append(tile)
+                entered.add(tile)
+                pass_by(*tile)
+                route.append(tile)
+                last = len(route) - 1
+                break
+        else:
+            stack.pop()
+            if stack:
+                route.append(stack[-1])
+    return route[:last + 1]
+
+def cheapest_paths(walls, cost, start):
+    """
+    Dijkstra from `start` over open tiles, entering a tile costs `cost`.
+    Returns total costs, -1 where unreachable, and the previous tile of each.
+    """
+    cols, rows = walls.shape
+    total = np.full(walls.shape, -1, dtype=np.int64)
+    previous = {}
+    total[start] = 0
+    queue = [(0, start)]
+    while queue:
+        d, (i, j) = heapq.heappop(queue)
+        if d > total[i, j]:
+            continue
+        for di, dj in NEIGHBOURS:
+            tile = (i + di, j + dj)
+            if 0 <= tile[0] < cols and 0 <= tile[1] < rows and not walls[tile]:
+                nd = d + cost[tile]
+                if total[tile] < 0 or nd < total[tile]:
+                    total[tile] = nd
+                    previous[tile] = (i, j)
+                    heapq.heappush(queue, (nd, tile))
+    return total, previous
+
+def food_route(walls, start, targets, hazards=()):
+    """
+    Cheapest target first from `start`. Tiles of each of `hazards` cost
+    `HAZARD_COST` more until a route passes them. Targets passed on the way
+    count as reached, unreachable ones are skipped.
+    """
+    route = [start]
+    remaining = set(targets)
+    remaining.discard(start)
+    hazards = [set(h) for h in hazards]
+    while remaining:
+        cost = np.ones(walls.shape, dtype=np.int64)
+        for hazard in hazards:
+            for tile in hazard:
+                cost[tile] += HAZARD_COST
+        total, previous = cheapest_paths(walls, cost, route[-1])
+        reachable = [(total[t], t) for t in remaining if total[t] >= 0]
+        if not reachable:
+            break
+
+        tile = min(reachable)[1]
+        path = [tile]
+        while tile in previous and tile != route[-1]:
+            tile = previous[tile]
+            path.append(tile)
+        path = path[::-1]
+        route.extend(path[1:])
+        passed = set(path)
+        remaining -= passed
+        hazards = [h for h in hazards if not h & passed]
+    return route
+
+class Oracle(object):
+    """
+    Oracle
+
+    Tile routes of an expert from the rules of a game mode
+
+    Responsabilities:
+        Route to every item with a positive reward, around those with a negative one
+        Otherwise cover the maze when exploring is rewarded
+        Return to spawn when reaching it is rewarded, once its condition holds
+    """
+
+    def __init__(self, mode, cfg=None):
+        self.cfg = cfg or config.default()
+        self.mode = mode
+        self.radius = self.cfg.settings['player']['radius']
+        items = mode.get('items') or {}
+        self.food = [t for t, rule in items.items() if rule['reward'] > 0]
+        self.poison = [t for t, rule in items.items() if rule['reward'] < 0]
+        self.explore = bool(mode.get('explore') and mode['explore']['reward'] > 0)
+        # Holds at spawn until `goal` fires
+        self.goal = bool(mode.get('goal') and mode['goal']['reward'] > 0)
+
+    def hazards(self, maze):
+        """
+        For each negative item, open tiles passing it within `REACH` of their centre
+        """
+        kinds = [maze.item_types.index(t) for t in self.poison if t in maze.item_types]
+        near = np.isin(maze.item_kinds, kinds)
+        centres = (np.indices(maze.walls.shape).transpose(1, 2, 0) + 0.5) * (maze.tw, maze.th)
+        hazards = []
+        for pos, r in zip(maze.item_positions[near], maze.item_radius[near]):
+            d = np.sqrt(((centres - pos) ** 2).sum(axis=2))
+            tiles = np.argwhere((d < r + self.radius + REACH * min(maze.tw, maze.th)) & ~maze.walls)
+            hazards.append([tuple(t) for t in tiles])
+        return hazards
+
+    def route(self, maze, start=None, back=True):
+        """
+        Tiles to visit in order, from `start` or the spawn tile. With `back`,
+        the route ends at spawn when reaching it is rewarded.
+        """
+        if start is None:
+            start = maze.spawn_cell
+        start = tuple(int(t) for t in start)
+        if self.food:
+            kinds = [maze.item_types.index(t) for t in self.food if t in maze.item_types]
+            tiles = np.floor_divide(maze.item_positions[np.isin(maze.item_kinds, kinds)],
+                                    (maze.tw, maze.th)).astype(np.intp)
+            route = food_route(maze.walls, start, [tuple(t) for t in tiles], self.hazards(maze))
+        elif self.explore:
+            route = covering_route(maze.walls, start)
+        else:
+            route = [start]
+
+        if back and self.goal:
+            route.extend(self.way_back(maze, route[-1])[1:])
+        return np.array(route, dtype=np.intp).reshape(-1, 2)
+
+    def way_back(self, maze, tile):
+        """
+        Shortest path of tiles from `tile` to spawn
+        """
+        return descend(maze.distance_field(), tuple(int(t) for t in tile))[::-1]
+
+def steer(pos, rotation, speed, target, turn_after, tile, top_speed, accel, deaccel, dt):
+    """
+    Action index for each player towards `target` pixels, easing off ahead
+    of waypoints followed by a turn of `turn_after` degrees
+    """
+    d = target - pos
+    distance = np.sqrt((d ** 2).sum(axis=1))
+    desired = np.degrees(np.arctan2(d[:, 0], d[:, 1]))
+    error = np.mod(desired - rotation + 180, 360) - 180
+
+    # Coasting distance from the speed after one more push
+    faster = np.minimum(speed + accel * dt, top_speed)
+    brakes = np.ceil(faster / (deaccel * dt))
+    coast = dt * (faster * brakes - deaccel * dt * brakes * (brakes - 1) / 2)
+    # At rest there is no coasting past, every action but a push turns
+    ease = (turn_after > TURN_MOVING) & (distance - coast < REACH * tile) & (speed > 0)
+
+    side = np.where(error < 0, 0, 4)
+    action = np.where(np.abs(error) > TURN_MOVING, np.where(error < 0, 1, 3), 2)
+    return np.where((np.abs(error) > TURN_IN_PLACE) | ease, side, action)
+
+class DemoGenerator(object):
+    """
+    DemoGenerator
+
+    Expert episodes from `Oracle` routes played in one headless
+    `Simulation`, a level per row. Episodes match `mazeexp.MazeExplorer`
+    run headless, so `replay.Replayer` verifies them.
+
+    Responsabilities:
+        Build levels from seeds as `MazeExplorer.reset` does
+        Steer every row along its route together
+        Collect records in `recorder.record_dtype` per episode
+    """
+
+    def __init__(self, mode_id=0, cfg=None, batch=64, max_steps=1000):
+        self.cfg = cfg or config.default()
+        self.mode_id = mode_id
+        self.mode = config.get_mode(mode_id)
+        self.battery = 'battery' in self.mode
+        self.compiled_mode = compile_mode(self.mode)
+        self.oracle = Oracle(self.mode, self.cfg)
+        self.batch = batch
+        self.max_steps = max_steps
+        self.level = Level.default(self.cfg, self.mode)
+        # Condition on top of being at spawn for the goal to fire, e.g. a spent
+        # battery. Rows explore until it holds, then head back.
+        goal = self.compiled_mode.term_index.get('goal')
+        self.goal_cond = self.compiled_mode.terms[goal].cond if self.oracle.goal and goal is not None else None
+
+        player = self.cfg.settings['player']
+        self.top_speed = player['top_speed']
+        self.accel = player['accel']
+        self.deaccel = player['deaccel']
+        self.dt = 1 / float(self.cfg.settings['world']['force_fps'])
+
+    @property
+    def observation_shape(self):
+        rows = len(sensor_layout(self.cfg.settings['player']['sensors'])[0]) + (1 if self.battery else 0)
+        types = len(self.compiled_mode.item_types)
+        return (rows,) if types == 0 else (rows, types + 1)
+
+    @property
+    def observation_dtype(self):
+        return observation_storage(self.cfg.settings['player'].get('observation_dtype', 'float64'))
+
+    @property
+    def meta(self):
+        level = self.level
+        return {
+            'mode': self.mode_id,
+            'digest': self.mode.get('digest'),
+            'level': [level.width, level.height, level.min_size],
+            'items': level.items,
+            'expert': 'oracle'
+        }
+
+    def build(self, seed):
+        # `WorldLayer` builds its first level with a new `Generator`
+        return build_maze(Generator(self.cfg), self.cfg, self.mode, self.level, random.Random(seed))
+
+    def waypoints(self, maze, route=None):
+        """
+        Pixel centres of the tiles of `route`, by default that of the oracle,
+        and the turn onto the next leg at each of them
+        """
+        if route is None:
+            route = self.oracle.route(maze, back=self.goal_cond is None)
+        centres = (route + 0.5) * (maze.tw, maze.th)
+        # Turn at each waypoint onto the next leg
+        legs = np.diff(centres, axis=0)
+        bearings = np.degrees(np.arctan2(legs[:, 0], legs[:, 1]))
+        turns = np.abs(np.mod(np.diff(bearings) + 180, 360) - 180)
+        turn_after = np.zeros(len(centres))
+        turn_after[1:-1] = turns
+        # Final waypoint, stop there
+        turn_after[-1] = 180
+        return centres, turn_after
+
+    def episodes(self, seeds):
+        """
+        Yields `(seed, meta, records)` for each of `seeds`, in completion order
+        """
+        seeds = list(seeds)
+        batch = min(self.batch, len(seeds))
+        if batch == 0:
+            return
+        dtype = record_dtype(self.observation_shape, self.observation_dtype)
+        # Step major, rows write their own step
+        buffer = np.zeros((self.max_steps, batch), dtype=dtype)
+
+        pending = seeds[::-1]
+        row_seed = [pending.pop() for i in range(batch)]
+        mazes = [self.build(seed) for seed in row_seed]
+        sim = Simulation(mazes, self.cfg, self.compiled_mode, batch)
+        routes = [self.waypoints(maze) for maze in mazes]
+        cursor = np.zeros(batch, dtype=np.intp)
+        steps = np.zeros(batch, dtype=np.intp)
+        active = np.ones(batch, dtype=bool)
+        index = np.arange(batch)
+        zeros = np.zeros(batch)
+        tile = min(sim.tw, sim.th)
+
+        # Rows on their way back to spawn, see `goal_cond`
+        returning = np.zeros(batch, dtype=bool)
+
+        # `MazeExplorer.reset` ticks once without buttons, rewarded with the first action
+        sim.step(zeros, zeros, self.dt)
+
+        while active.any():
+            if self.goal_cond is not None:
+                self.plan_return(sim, mazes, routes, cursor, active, returning)
+
+            target = np.zeros((batch, 2))
+            turn_after = np.zeros(batch)
+            for i in np.flatnonzero(active):
+                centres, turns = routes[i]
+                k = cursor[i]
+                while k < len(centres) - 1 and np.hypot(*(centres[k] - sim.pos[i])) < REACH * tile:
+                    k += 1
+                cursor[i] = k
+                target[i], turn_after[i] = centres[k], turns[k]
+
+            speed = np.sqrt((sim.vel ** 2).sum(axis=1))
+            actions = steer(sim.pos, sim.rotation, speed, target, turn_after, tile,
+                            self.top_speed, self.accel, self.deaccel, self.dt)
+            sim.step_actions(actions, self.dt, mask=active)
+            rewards = sim.take_reward()
+
+            rows = np.flatnonzero(active)
+            at = steps[rows]
+            records = buffer[at, rows]
+            records['step'] = at
+            records['action'] = actions[rows]
+            records['x'] = sim.pos[rows, 0]
+            records['y'] = sim.pos[rows, 1]
+            records['rotation'] = sim.rotation[rows]
+            records['observation'] = sim.observation(self.battery, rows)
+            records['reward'] = rewards[rows]
+            records['terminal'] = sim.game_over[rows]
+            buffer[at, rows] = records
+            steps[rows] += 1
+
+            # Modes with a `goal` hold at spawn, turning in place until it fires
+            arrived = np.array([cursor[i] == len(routes[i][0]) - 1 for i in index]) & (speed == 0)
+            done = active & (sim.game_over | (steps == self.max_steps) | (arrived & ~self.oracle.goal))
+            for i in np.flatnonzero(done):
+                yield row_seed[i], self.meta, buffer[:steps[i], i].copy()
+                if not pending:
+                    active[i] = False
+                    continue
+                row_seed[i] = pending.pop()
+                maze = self.build(row_seed[i])
+                sim.load([i], maze)
+                mazes[i] = maze
+                routes[i] = self.waypoints(maze)
+                cursor[i] = 0
+                steps[i] = 0
+                returning[i] = False
+
+            loaded = done & active
+            if loaded.any():
+                sim.step(zeros, zeros, self.dt, mask=loaded)
+
+    def plan_return(self, sim, mazes, routes, cursor, active, returning):
+        """
+        Route rows back to spawn once `goal_cond` holds, rows still exploring
+        at the end of their route cover the maze again from where they are
+        """
+        ready = self.goal_cond({'battery': sim.battery})
+        tile = min(sim.tw, sim.th)
+        for i in np.flatnonzero(active & ~returning):
+            tiles = np.floor_divide(sim.pos[i], (sim.tw, sim.th)).astype(np.intp)
+            if ready[i]:
+                returning[i] = True
+                route = self.oracle.way_back(mazes[i], tiles)
+            else:
+                centres = routes[i][0]
+                if cursor[i] < len(centres) - 1 or np.hypot(*(centres[-1] - sim.pos[i])) >= REACH * tile:
+                    continue
+                route = self.oracle.route(mazes[i], tiles, back=False)
+            routes[i] = self.waypoints(mazes[i], np.array(route, dtype=np.intp).reshape(-1, 2))
+            cursor[i] = 0
+
+def demo_worker(args):
+    """
+    Episodes for one share of seeds, run in a pool process
+    """
+    mode_id, cfg, batch, max_steps, seeds = args
+    generator = DemoGenerator(mode_id, cfg, batch, max_steps)
+    return list(generator.episodes(seeds))
+
+def generate_demos(path, episodes, mode_id=0, processes=None, seed=None, batch=64, max_steps=1000,
+                   compress=False, cfg=None):
+    """
+    Write `episodes` expert demonstrations to a trajectory log at `path`,
+    generated across `processes`, each given `cfg`. Returns the number of
+    steps written.
+    """
+    cfg = cfg or config.default()
+    rng = random.Random(seed)
+    seeds = [rng.getrandbits(32) for i in range(episodes)]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    shares = [(mode_id, cfg, batch, max_steps, [int(s) for s in share])
+              for share in np.array_split(seeds, max(1, processes) * 4) if len(share)]
+
+    generator = DemoGenerator(mode_id, cfg)
+    recorder = TrajectoryRecorder(path, generator.observation_shape, compress=compress,
+                                  observation_dtype=generator.observation_dtype)
+    steps = 0
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    try:
+        results = pool.imap(demo_worker, shares) if pool else (demo_worker(share) for share in shares)
+        for demos in results:
+            for demo_seed, meta, records in demos:
+                recorder.begin(demo_seed, meta)
+                recorder.extend(records)
+                steps += len(records)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+        recorder.close()
+    return steps
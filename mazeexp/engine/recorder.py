@@ -0,0 +1,232 @@
+import json
+import zlib
+import struct
+import threading
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+import numpy as np
+
+MAGIC = b'MXTR'
+VERSION = 1
+CHUNK_MAGIC = b'MXCH'
+
+# magic, version, dtype json length
+FILE_HEADER = struct.Struct('<4sHI')
+# magic, flags, seed, records, raw bytes, stored bytes, metadata json length
+CHUNK_HEADER = struct.Struct('<4sIQIQQI')
+
+FLAG_ZLIB = 1
+
+def record_dtype(observation_shape, observation_dtype=np.float32):
+    """
+    Fixed-size step record for observations of `observation_shape`
+    """
+    return np.dtype([
+        ('step', np.uint32),
+        ('action', np.int16),
+        ('x', np.float32),
+        ('y', np.float32),
+        ('rotation', np.float32),
+        ('observation', observation_dtype, tuple(observation_shape)),
+        ('reward', np.float32),
+        ('terminal', np.bool_)
+    ])
+
+class TrajectoryRecorder(object):
+    """
+    TrajectoryRecorder
+
+    Streams steps to a chunked binary log
+
+    Responsabilities:
+        Append records to a preallocated buffer
+        Write full buffers as chunks on a background thread, optionally zlib compressed
+        Tag each chunk with the level seed so mazes are rebuilt rather than stored
+        Raise errors of the writer thread from the next `flush` or `close`
+    """
+
+    def __init__(self, path, observation_shape, capacity=4096, compress=False,
+                 observation_dtype=np.float32):
+        self.dtype = record_dtype(observation_shape, observation_dtype)
+        self.buffer = np.zeros(capacity, dtype=self.dtype)
+        self.count = 0
+        self.step = 0
+        self.compress = compress
+
+        self.seed = 0
+        self.meta = {}
+
+        self.file = open(path, 'wb')
+        descr = json.dumps(np.lib.format.dtype_to_descr(self.dtype)).encode('utf-8')
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, len(descr)))
+        self.file.write(descr)
+
+        self.queue = Queue(maxsize=4)
+        # Error the writer stopped on, chunks after it are dropped
+        self.error = None
+        self.writer = threading.Thread(target=self.write_chunks)
+        self.writer.daemon = True
+        self.writer.start()
+
+    def begin(self, seed, meta=None):
+        """
+        Start an episode, later records are tagged with `seed` and `meta`
+        """
+        self.flush()
+        self.seed = seed
+        self.meta = meta or {}
+        self.step = 0
+
+    def append(self, action, x, y, rotation, observation, reward, terminal):
+        """
+        Copy a step into the buffer, flushing when full
+        """
+        record = self.buffer[self.count]
+        record['step'] = self.step
+        record['action'] = action
+        record['x'] = x
+        record['y'] = y
+        record['rotation'] = rotation
+        record['observation'] = observation
+        record['reward'] = reward
+        record['terminal'] = terminal
+
+        self.count += 1
+        self.step += 1
+        if self.count == len(self.buffer):
+            self.flush()
+
+    def extend(self, records):
+        """
+        Copy steps already in `dtype`, numbered on from the current step
+        """
+        start = 0
+        while start < len(records):
+            k = min(len(self.buffer) - self.count, len(records) - start)
+            block = self.buffer[self.count:self.count + k]
+            block[...] = records[start:start + k]
+            block['step'] = np.arange(self.step, self.step + k)
+            self.count += k
+            self.step += k
+            start += k
+            if self.count == len(self.buffer):
+                self.flush()
+
+    def flush(self):
+        """
+        Hand buffered records to the writer as one chunk
+        """
+        self.check()
+        if self.count == 0:
+            return
+        data = self.buffer[:self.count].tobytes()
+        self.queue.put((self.seed, self.meta, self.count, data))
+        self.count = 0
+
+    def check(self):
+        """
+        Raise the error the writer stopped on, if any
+        """
+        if self.error is not None:
+            raise self.error
+
+    def write_chunks(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+            # Keep taking chunks so `flush` never blocks on a full queue
+            if self.error is not None:
+                continue
+            try:
+                self.write_chunk(*chunk)
+            except Exception as e:
+                self.error = e
+
+    def write_chunk(self, seed, meta, count, data):
+        flags = 0
+        stored = data
+        if self.compress:
+            flags |= FLAG_ZLIB
+            stored = zlib.compress(data)
+
+        meta = json.dumps(meta).encode('utf-8')
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, flags, seed, count, len(data), len(stored), len(meta)))
+        self.file.write(meta)
+        self.file.write(stored)
+
+    def close(self):
+        """
+        Flush remaining records and wait for the writer, raising its error if any
+        """
+        try:
+            self.flush()
+        finally:
+            self.queue.put(None)
+            self.writer.join()
+            self.file.close()
+        self.check()
+
+class TrajectoryReader(object):
+    """
+    TrajectoryReader
+
+    Reads chunks written by `TrajectoryRecorder`, uncompressed chunks are memory-mapped
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, length = FILE_HEADER.unpack(f.read(FILE_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError('{} is not a trajectory log'.format(path))
+            if version != VERSION:
+                raise ValueError('Unsupported trajectory log version {}'.format(version))
+            descr = json.loads(f.read(length).decode('utf-8'))
+            # JSON turns field tuples and shapes into lists
+            self.dtype = np.dtype([tuple(tuple(v) if isinstance(v, list) else str(v) for v in field) for field in descr])
+            self.offset = f.tell()
+
+    def chunks(self):
+        """
+        Yields `(seed, meta, records)` for each chunk in file order
+        """
+        with open(self.path, 'rb') as f:
+            offset = self.offset
+            while True:
+                f.seek(offset)
+                header = f.read(CHUNK_HEADER.size)
+                if len(header) < CHUNK_HEADER.size:
+                    break
+                magic, flags, seed, count, raw, stored, length = CHUNK_HEADER.unpack(header)
+                if magic != CHUNK_MAGIC:
+                    raise ValueError('Corrupt chunk at offset {}'.format(offset))
+                meta = json.loads(f.read(length).decode('utf-8'))
+                offset += CHUNK_HEADER.size + length
+
+                if flags & FLAG_ZLIB:
+                    records = np.frombuffer(zlib.decompress(f.read(stored)), dtype=self.dtype)
+                else:
+                    records = np.memmap(self.path, dtype=self.dtype, mode='r', offset=offset, shape=(count,))
+                offset += stored
+
+                yield seed, meta, records
+
+    def episodes(self):
+        """
+        Yields `(seed, meta, records)` with chunks of the same episode joined
+        """
+        current = None
+        for seed, meta, records in self.chunks():
+            if current is not None and records[0]['step'] == 0:
+                yield current[0], current[1], np.concatenate(current[2])
+                current = None
+            if current is None:
+                current = (seed, meta, [])
+            current[2].append(records)
+        if current is not None:
+            yield current[0], current[1], np.concatenate(current[2])
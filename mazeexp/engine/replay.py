@@ -0,0 +1,144 @@
+import random
+
+import numpy as np
+
+from . import config
+from .curriculum import Level
+from .generator import Generator
+from .maze import build_maze
+from .simulation import Simulation
+from .world_rewards import compile_mode
+
+class ReplayResult(object):
+    """
+    ReplayResult
+
+    Outcome of re-simulating an episode
+    """
+
+    def __init__(self, rewards, terminals, poses, diverged_at=None):
+        self.rewards = rewards
+        self.terminals = terminals
+        self.poses = poses
+        # First step which disagreed with the recording, if any
+        self.diverged_at = diverged_at
+
+    @property
+    def diverged(self):
+        return self.diverged_at is not None
+
+class Replayer(object):
+    """
+    Replayer
+
+    Re-simulates episodes from a seed and action list
+
+    Responsabilities:
+        Rebuild maze, items and spawn from the level seed
+        Step a headless `Simulation` at max speed, without cocos or a window
+        Draw selected frames in a `mazeexp.MazeExplorer` when asked to
+        Flag the first step diverging from recorded rewards, terminals or poses
+    """
+
+    def __init__(self, mode_id=0, cfg=None, visible=False):
+        self.cfg = cfg or config.default()
+        self.mode_id = mode_id
+        self.mode = config.get_mode(mode_id)
+        self.compiled_mode = compile_mode(self.mode)
+        self.dt = 1 / float(self.cfg.settings['world']['force_fps'])
+        # Replays go through the view only when it is shown or frames are drawn
+        self.visible = visible
+        self.engine = None
+        self.sim = None
+
+    def run(self, seed, actions, level=None, rewards=None, terminals=None, poses=None,
+            render_frames=(), on_frame=None, atol=1e-4):
+        """
+        Replay `actions` on the level from `seed`.
+        Frames in `render_frames` are drawn and passed to `on_frame(step, engine)`,
+        without any the episode never leaves the simulation.
+        """
+        render_frames = set(render_frames)
+        if render_frames or self.visible:
+            step = self.view_steps(seed, level)
+        else:
+            step = self.sim_steps(seed, level)
+
+        steps = len(actions)
+        result = ReplayResult(np.zeros(steps, dtype=np.float64),
+                              np.zeros(steps, dtype=bool),
+                              np.zeros((steps, 3), dtype=np.float64))
+
+        for i, action in enumerate(actions):
+            result.rewards[i], result.terminals[i], result.poses[i] = step(action)
+
+            if i in render_frames:
+                self.engine.render()
+                if on_frame is not None:
+                    on_frame(i, self.engine)
+
+            if result.diverged_at is None and self.diverges(result, i, rewards, terminals, poses, atol):
+                result.diverged_at = i
+
+        return result
+
+    def sim_steps(self, seed, level):
+        """
+        Step function for the level from `seed` played in a `Simulation`
+        """
+        # `WorldLayer` builds its first level with a new `Generator`
+        level = level or Level.default(self.cfg, self.mode)
+        maze = build_maze(Generator(self.cfg), self.cfg, self.mode, level, random.Random(seed))
+        if self.sim is None:
+            self.sim = Simulation(maze, self.cfg, self.compiled_mode)
+        else:
+            self.sim.load([0], maze)
+        sim = self.sim
+
+        # `MazeExplorer.reset` ticks once without buttons, rewarded with the first action
+        sim.step(np.zeros(1), np.zeros(1), self.dt)
+
+        def step(action):
+            sim.step_actions(np.array([action], dtype=np.intp), self.dt)
+            reward = sim.take_reward()[0]
+            return reward, sim.game_over[0], (sim.pos[0, 0], sim.pos[0, 1], sim.rotation[0])
+        return step
+
+    def view_steps(self, seed, level):
+        """
+        Step function for the level from `seed` played in a `mazeexp.MazeExplorer`
+        """
+        if self.engine is None:
+            from .mazeexp import MazeExplorer
+            self.engine = MazeExplorer(self.mode_id, visible=self.visible, cfg=self.cfg)
+        engine = self.engine
+        engine.reset(seed, level=level, render=False)
+
+        def step(action):
+            _, reward, terminal, _ = engine.act(action, render=False)
+            return reward, terminal, engine.world_layer.get_pose()
+        return step
+
+    def diverges(self, result, i, rewards, terminals, poses, atol):
+        if rewards is not None and not np.isclose(result.rewards[i], rewards[i], atol=atol):
+            return True
+        if terminals is not None and bool(result.terminals[i]) != bool(terminals[i]):
+            return True
+        if poses is not None and not np.allclose(result.poses[i], poses[i], atol=atol * 100):
+            return True
+        return False
+
+    def episode(self, seed, meta, records, **kwargs):
+        """
+        Replay and verify an episode from `recorder.TrajectoryReader.episodes`
+        """
+        digest = self.mode.get('digest')
+        if meta.get('digest') and digest and meta['digest'] != digest:
+            raise ValueError('Recorded with game mode {}, replaying {}'.format(meta['digest'], digest))
+
+        width, height, min_size = meta['level']
+        level = Level(width, height, min_size, dict((str(k), v) for k, v in meta['items'].items()))
+        poses = np.stack([records['x'], records['y'], records['rotation']], axis=1)
+
+        return self.run(seed, records['action'], level=level, rewards=records['reward'],
+                        terminals=records['terminal'], poses=poses, **kwargs)
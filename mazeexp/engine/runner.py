@@ -0,0 +1,159 @@
+import random
+import threading
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+
+from . import config
+from .curriculum import Level
+from .generator import Generator
+from .maze import build_maze
+from .metrics import EpisodeMetrics
+from .simulation import Simulation
+from .world_rewards import compile_mode
+
+class MazeShard(object):
+    """
+    MazeShard
+
+    Headless environments stepped together on one thread, without the
+    cocos director or pyglet clock
+
+    Responsabilities:
+        Generate a level per environment from its own seed
+        Step all environments as one `Simulation`
+        Start a new level for environments which reached a terminal state
+        Record metrics of finished episodes
+    """
+
+    def __init__(self, count, mode, cfg, seed, curriculum=None, lock=None):
+        self.mode = mode
+        self.cfg = cfg
+        self.curriculum = curriculum
+        self.lock = lock
+        self.battery = 'battery' in mode
+
+        # Per shard as `Generator.grid` keeps its `rng`
+        self.generator = Generator(cfg)
+        rng = random.Random(seed)
+        self.rngs = [random.Random(rng.getrandbits(32)) for i in range(count)]
+        self.seeds = [None] * count
+        # Read between steps, shards step on their own threads
+        self.metrics = EpisodeMetrics()
+
+        self.sim = Simulation([self.next_maze(i) for i in range(count)], cfg, compile_mode(mode))
+
+    def sample_level(self):
+        if self.curriculum is None:
+            return Level.default(self.cfg, self.mode)
+        with self.lock:
+            return self.curriculum.sample(self.mode)
+
+    def next_maze(self, i):
+        """
+        New level for environment `i`, reproducible from `seeds[i]`
+        """
+        self.seeds[i] = self.rngs[i].getrandbits(32)
+        level = self.sample_level()
+        return build_maze(self.generator, self.cfg, self.mode, level, random.Random(self.seeds[i]))
+
+    def reset(self):
+        self.metrics.record(self.sim, self.sim.index, self.mode)
+        for i in range(self.sim.n):
+            self.sim.load([i], self.next_maze(i))
+        self.sim.sense()
+        return self.sim.observation(self.battery)
+
+    def step(self, actions):
+        sim = self.sim
+        sim.step_actions(actions)
+        rewards = sim.take_reward()
+        terminals = sim.game_over.copy()
+
+        done = np.flatnonzero(terminals)
+        self.metrics.record(sim, done, self.mode)
+        for i in done:
+            sim.load([i], self.next_maze(i))
+        if len(done):
+            sim.sense()
+
+        return sim.observation(self.battery), rewards, terminals
+
+class ThreadPoolMazeRunner(object):
+    """
+    ThreadPoolMazeRunner
+
+    Steps `num_envs` headless environments split into shards across a
+    thread pool. Environments reaching a terminal state start a new level,
+    the observation returned with `terminal` is from that new level.
+    One shard by default, stepped on the calling thread: a larger batch
+    gains more than threads, which only pay off with several cores and
+    shards of hundreds of environments, see `benchmarks/threads.py`.
+
+    Responsabilities:
+        Partition environments between threads
+        Gather observations, rewards and terminals in environment order
+    """
+
+    def __init__(self, num_envs, threads=1, mode_id=0, cfg=None, curriculum=None, seed=None):
+        self.cfg = cfg or config.default()
+        self.mode = config.get_mode(mode_id)
+        self.num_envs = num_envs
+        self.actions_num = len(self.cfg.settings['player']['actions'])
+
+        if threads is None:
+            threads = multiprocessing.cpu_count()
+        threads = max(1, min(threads, num_envs))
+
+        rng = random.Random(seed)
+        lock = threading.Lock()
+        sizes = [len(a) for a in np.array_split(np.arange(num_envs), threads)]
+        self.shards = [MazeShard(size, self.mode, self.cfg, rng.getrandbits(32), curriculum, lock)
+                       for size in sizes]
+        self.splits = np.cumsum(sizes)[:-1]
+        self.pool = ThreadPool(threads) if threads > 1 else None
+
+    def map(self, fn, items):
+        """
+        `fn` of each item on the pool, or in turn on this thread without one
+        """
+        if self.pool is None:
+            return [fn(item) for item in items]
+        return self.pool.map(fn, items)
+
+    @property
+    def seeds(self):
+        """
+        Level seed of each environment, see `replay.Replayer`
+        """
+        return [seed for shard in self.shards for seed in shard.seeds]
+
+    def metrics(self):
+        """
+        `metrics.EpisodeMetrics` of episodes finished by every shard so far
+        """
+        return EpisodeMetrics.merged(shard.metrics for shard in self.shards)
+
+    def reset(self):
+        """
+        New levels for every environment, returns observations
+        """
+        return np.concatenate(self.map(lambda shard: shard.reset(), self.shards))
+
+    def step(self, actions):
+        """
+        Step every environment by one action, returns `(observations, rewards, terminals)`
+        """
+        actions = np.asarray(actions, dtype=np.intp)
+        assert actions.shape == (self.num_envs,), "Expected one action per environment"
+
+        results = self.map(lambda args: args[0].step(args[1]),
+                           list(zip(self.shards, np.split(actions, self.splits))))
+        observations, rewards, terminals = zip(*results)
+        return np.concatenate(observations), np.concatenate(rewards), np.concatenate(terminals)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
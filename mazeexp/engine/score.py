@@ -1,6 +1,6 @@
 import cocos
 
-import config
+from . import config
 
 class ScoreLayer(cocos.layer.Layer):
 
@@ -12,30 +12,31 @@ class ScoreLayer(cocos.layer.Layer):
     Responsabilities:
         display score and battery
     """
-    def __init__(self, stats=None):
+    def __init__(self, stats=None, cfg=None):
         super(ScoreLayer, self).__init__()
 
         self.stats = stats
+        cfg = cfg or config.default()
 
         self.labels = {
             "score": "Score: ",
             "battery": "Battery: "
         }
 
-        w, h = config.settings['window']['width'], config.settings['window']['height']
+        w, h = cfg.settings['window']['width'], cfg.settings['window']['height']
         lineheight = 15
         offset_x = -lineheight
         offset_y = lineheight
 
         self.msgs = {}
 
-        for key, value in self.labels.iteritems():
+        for key, value in self.labels.items():
             str_val = str(int(self.stats[key]))
             msg = cocos.text.Label(self.labels[key] + str_val,
                                     bold=True,
                                     color=(255, 50, 0, 255),
                                     font_size=12,
-                                    font_name=config.settings['view']['font_name'],
+                                    font_name=cfg.settings['view']['font_name'],
                                     anchor_y='top',
                                     anchor_x='right',
                                     width=w,
@@ -47,7 +48,7 @@ class ScoreLayer(cocos.layer.Layer):
                                     bold=True,
                                     color=(0, 0, 0, 255),
                                     font_size=12,
-                                    font_name=config.settings['view']['font_name'],
+                                    font_name=cfg.settings['view']['font_name'],
                                     anchor_y='top',
                                     anchor_x='right',
                                     width=w,
@@ -61,15 +62,15 @@ class ScoreLayer(cocos.layer.Layer):
 
             offset_y += lineheight
 
-        self.schedule(self.update)
-
     def update(self, dt):
         """
         Responsabilities:
-            Updates game engine each tick
-            Copies new stats into labels
+            Copies new stats into labels, called by `WorldLayer` for drawn frames
+            Skips labels whose text is unchanged, setting text lays it out again
         """
-        for key, value in self.labels.iteritems():
-            str_val = str(int(self.stats[key]))
-            self.msgs[key][0].element.text = self.labels[key] + str_val
-            self.msgs[key][1].element.text = self.labels[key] + str_val
+        for key, value in self.labels.items():
+            text = self.labels[key] + str(int(self.stats[key]))
+            msg, shad = self.msgs[key]
+            if msg.element.text != text:
+                msg.element.text = text
+                shad.element.text = text
@@ -0,0 +1,332 @@
+"""
+Headless environments served to remote agents over TCP or a Unix socket.
+Requires Python 3.5+.
+
+    python -m mazeexp.engine.server --port 7450 --capacity 256
+"""
+import json
+import random
+import struct
+import asyncio
+import argparse
+import logging
+
+import numpy as np
+
+from . import config
+from .curriculum import Level
+from .generator import Generator
+from .maze import build_maze
+from .simulation import Simulation, observation_storage
+from .world_rewards import compile_mode
+
+DEFAULT_PORT = 7450
+
+# type, payload length
+FRAME_HEADER = struct.Struct('<BI')
+MAX_PAYLOAD = 1 << 20
+
+# Server to client, json of observation shape and dtype, actions and mode
+MSG_HELLO = 0
+# Client to server, optional level seed
+MSG_RESET = 1
+# Client to server, action index
+MSG_STEP = 2
+# Server to client, `RESULT` then observation, float32 unless quantised
+MSG_OBSERVATION = 3
+# Server to client, utf-8 message
+MSG_ERROR = 4
+
+RESET = struct.Struct('<Q')
+STEP = struct.Struct('<H')
+# reward, terminal
+RESULT = struct.Struct('<fB')
+
+class ProtocolError(Exception):
+    pass
+
+async def read_frame(reader):
+    """
+    Next `(type, payload)`, raises `asyncio.IncompleteReadError` on disconnect
+    """
+    kind, length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if length > MAX_PAYLOAD:
+        raise ProtocolError('Frame of {} bytes'.format(length))
+    payload = await reader.readexactly(length) if length else b''
+    return kind, payload
+
+def write_frame(writer, kind, payload=b''):
+    writer.write(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+class EnvironmentServer(object):
+    """
+    EnvironmentServer
+
+    Hosts up to `capacity` headless environments as rows of one
+    `Simulation`, one per connection. Steps arriving within `window`
+    seconds of each other run as one vectorised step, sooner once every
+    playing client has sent its action.
+
+    Responsabilities:
+        Generate levels off the event loop thread
+        Batch actions into masked steps
+        Reply with reward, terminal and observation, one request at a time
+        per client so slow readers hold back only their own environment
+    """
+
+    def __init__(self, mode_id=0, cfg=None, capacity=256, window=0.002, seed=None, curriculum=None):
+        self.cfg = cfg or config.default()
+        self.mode_id = mode_id
+        self.mode = config.get_mode(mode_id)
+        self.battery = 'battery' in self.mode
+        self.curriculum = curriculum
+        self.window = window
+        self.rng = random.Random(seed)
+        self.actions_num = len(self.cfg.settings['player']['actions'])
+
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(self.cfg.settings['log_level'])
+
+        # Rows wait on this level until their client resets
+        maze = self.build(self.sample_level(), self.rng.getrandbits(32))
+        self.sim = Simulation(maze, self.cfg, compile_mode(self.mode), capacity)
+        self.observation_shape = self.sim.observation(self.battery).shape[1:]
+        self.observation_dtype = observation_storage(self.sim.observation_dtype)
+
+        self.free = list(range(capacity))[::-1]
+        # Rows with a level, expected to step
+        self.playing = set()
+        # Row to action and future of its reply
+        self.pending = {}
+        self.flush_handle = None
+        self.server = None
+
+        # Batches stepped and rows stepped, for mean batch size
+        self.batches = 0
+        self.stepped = 0
+
+    @property
+    def hello(self):
+        return {
+            'observation_shape': list(self.observation_shape),
+            'observation_dtype': self.observation_dtype.name,
+            'actions_num': self.actions_num,
+            'mode': self.mode_id
+        }
+
+    def sample_level(self):
+        if self.curriculum is None:
+            return Level.default(self.cfg, self.mode)
+        return self.curriculum.sample(self.mode)
+
+    def build(self, level, seed):
+        # `Generator.grid` keeps its `rng`, one generator per level
+        return build_maze(Generator(self.cfg), self.cfg, self.mode, level, random.Random(seed))
+
+    def result(self, row, reward=0, terminal=False):
+        observation = self.sim.observation(self.battery, [row])[0].astype(self.observation_dtype)
+        return RESULT.pack(reward, int(terminal)) + observation.tobytes()
+
+    async def reset(self, row, seed):
+        """
+        New level for `row` from `seed`, returns the encoded observation
+        """
+        self.playing.discard(row)
+        self.pending.pop(row, None)
+        self.flush_ready()
+
+        loop = asyncio.get_event_loop()
+        maze = await loop.run_in_executor(None, self.build, self.sample_level(), seed)
+        self.sim.load([row], maze)
+        self.sim.sense([row])
+        self.playing.add(row)
+        return self.result(row)
+
+    def step(self, row, action):
+        """
+        Queue `action` for `row`, returns a future of the encoded reply
+        """
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        self.pending[row] = (action, future)
+        if not self.flush_ready() and self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.window, self.flush)
+        return future
+
+    def flush_ready(self):
+        """
+        Flush when every playing row has an action queued
+        """
+        if self.pending and self.playing.issubset(self.pending):
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """
+        Step queued rows together, others hold
+        """
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        pending, self.pending = self.pending, {}
+        if not pending:
+            return
+
+        sim = self.sim
+        rows = np.fromiter(pending, dtype=np.intp, count=len(pending))
+        actions = np.zeros(sim.n, dtype=np.intp)
+        actions[rows] = [pending[row][0] for row in rows]
+        mask = np.zeros(sim.n, dtype=bool)
+        mask[rows] = True
+        # Only queued rows go through the step kernels
+        sim.step_actions(actions, mask=mask)
+
+        rewards = sim.reward[rows].copy()
+        sim.reward[rows] = 0
+        terminals = sim.game_over[rows]
+        observations = sim.observation(self.battery, rows).astype(self.observation_dtype)
+        for k, row in enumerate(rows):
+            future = pending[row][1]
+            if not future.done():
+                future.set_result(RESULT.pack(rewards[k], int(terminals[k])) + observations[k].tobytes())
+
+        self.batches += 1
+        self.stepped += len(rows)
+
+    async def handle(self, reader, writer):
+        if not self.free:
+            write_frame(writer, MSG_ERROR, b'Server full')
+            writer.close()
+            return
+
+        row = self.free.pop()
+        try:
+            write_frame(writer, MSG_HELLO, json.dumps(self.hello).encode('utf-8'))
+            await writer.drain()
+            while True:
+                try:
+                    kind, payload = await read_frame(reader)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+                if kind == MSG_RESET:
+                    seed = RESET.unpack(payload)[0] if payload else self.rng.getrandbits(32)
+                    reply = await self.reset(row, seed)
+                elif kind == MSG_STEP and row in self.playing:
+                    action, = STEP.unpack(payload)
+                    if action >= self.actions_num:
+                        raise ProtocolError('Action {} out of range'.format(action))
+                    reply = await self.step(row, action)
+                elif kind == MSG_STEP:
+                    raise ProtocolError('Step before reset')
+                else:
+                    raise ProtocolError('Unknown message {}'.format(kind))
+
+                write_frame(writer, MSG_OBSERVATION, reply)
+                # Nothing more is read from a client not keeping up with replies
+                await writer.drain()
+        except (ProtocolError, struct.error) as e:
+            self.logger.warning('Closing client: %s', e)
+            write_frame(writer, MSG_ERROR, str(e).encode('utf-8'))
+        except ConnectionError:
+            pass
+        finally:
+            self.playing.discard(row)
+            self.pending.pop(row, None)
+            self.free.append(row)
+            writer.close()
+            # Others may be waiting on this row
+            self.flush_ready()
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT, path=None):
+        """
+        Listen on `host`, `port` or the Unix socket at `path`
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path)
+        else:
+            self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+class EnvironmentClient(object):
+    """
+    EnvironmentClient
+
+    One remote environment of `EnvironmentServer`, see `connect`
+    """
+
+    def __init__(self, reader, writer, hello):
+        self.reader = reader
+        self.writer = writer
+        self.observation_shape = tuple(hello['observation_shape'])
+        self.observation_dtype = np.dtype(hello.get('observation_dtype', 'float32'))
+        self.actions_num = hello['actions_num']
+        self.mode = hello['mode']
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=DEFAULT_PORT, path=None):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        kind, payload = await read_frame(reader)
+        if kind != MSG_HELLO:
+            writer.close()
+            raise ProtocolError(payload.decode('utf-8'))
+        return cls(reader, writer, json.loads(payload.decode('utf-8')))
+
+    async def request(self, kind, payload):
+        write_frame(self.writer, kind, payload)
+        await self.writer.drain()
+        kind, payload = await read_frame(self.reader)
+        if kind != MSG_OBSERVATION:
+            raise ProtocolError(payload.decode('utf-8'))
+        reward, terminal = RESULT.unpack_from(payload)
+        observation = np.frombuffer(payload, dtype=self.observation_dtype, offset=RESULT.size)
+        return observation.reshape(self.observation_shape), reward, bool(terminal)
+
+    async def reset(self, seed=None):
+        """
+        Start a new level, seeded by the server when `seed` is None
+        """
+        observation, reward, terminal = await self.request(
+            MSG_RESET, RESET.pack(seed) if seed is not None else b'')
+        return observation
+
+    async def step(self, action):
+        """
+        Returns `(observation, reward, terminal)`
+        """
+        return await self.request(MSG_STEP, STEP.pack(action))
+
+    def close(self):
+        self.writer.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve headless Maze Explorer environments')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', help='Unix socket path instead of TCP')
+    parser.add_argument('--mode', type=int, default=0)
+    parser.add_argument('--capacity', type=int, default=256)
+    parser.add_argument('--window', type=float, default=0.002, help='Seconds to gather actions')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    server = EnvironmentServer(args.mode, capacity=args.capacity, window=args.window, seed=args.seed)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(server.start(args.host, args.port, args.unix))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.close())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1281 @@
+from __future__ import division
+
+import math
+
+import numpy as np
+
+from .maze import Maze
+from .world_rewards import EVENTS, EVENT_BATTERY, EVENT_WALL, EVENT_EXPLORE, EVENT_GOAL, EVENT_APPROACH
+
+# Cells marked by `visit`, current tile then its neighbours
+VISIT_OFFSETS = [(0, 0), (0, 1), (0, -1), (-1, 0), (1, 0)]
+
+# Boundary crossings each sensor ray may make
+CAST_DEPTH = 10
+
+# Crossings overshoot one pixel into the next tile
+BUCKET_MARGIN = 1
+
+# Pixels between the crossings of both axes for a ray to pass through their corner
+CORNER_TOLERANCE = 1e-6
+
+# Bearings of cached readings are quantised to this many bins around the circle,
+# a reused reading is from a bearing less than one bin away
+CACHE_BITS = 40
+CACHE_BINS = 1 << CACHE_BITS
+# Readings cached by each player, `CACHE_PER_RAY` per ray but at least
+# `CACHE_SECTORS`, rounded up to a power of two
+CACHE_PER_RAY = 4
+CACHE_SECTORS = 512
+# Fewer rays than this are cast again each step unless the sensor `cache` is set,
+# looking their readings up costs about as much as casting them
+CACHE_MIN_RAYS = 64
+
+# Formats of `Simulation.observation`, the last two quantised
+OBSERVATION_DTYPES = ('float64', 'float32', 'float16', 'uint8')
+# Readings of `uint8` observations, 1.0 is this
+UINT8_SCALE = 255
+
+def sensor_layout(sensors):
+    """
+    Bearings from heading and ranges of each ray of `settings['player']['sensors']`.
+    Rays are `fov` apart unless listed in `angles`, `max_range` is one range or one per ray.
+    """
+    if sensors.get('angles') is not None:
+        angles = np.array(sensors['angles'], dtype=np.float64)
+    else:
+        angles = (np.arange(sensors['num']) - sensors['num'] // 2) * sensors['fov']
+    ranges = np.broadcast_to(np.asarray(sensors['max_range'], dtype=np.float64), angles.shape).copy()
+    return angles, ranges
+
+def observation_storage(dtype):
+    """
+    Dtype observations of `dtype` are recorded and sent as, `float32`
+    unless quantised
+    """
+    dtype = np.dtype(dtype)
+    return dtype if dtype.itemsize < 4 else np.dtype(np.float32)
+
+def observation_values(observation):
+    """
+    Readings in [0, 1] of observations in any of `OBSERVATION_DTYPES`
+    """
+    observation = np.asarray(observation)
+    if observation.dtype == np.uint8:
+        return observation / np.float32(UINT8_SCALE)
+    return observation.astype(np.float32)
+
+class Snapshot(object):
+    """
+    Snapshot
+
+    Compact state of one environment, the maze is shared rather than copied
+    """
+    __slots__ = ('maze', 'data')
+
+    def __init__(self, maze, data):
+        self.maze = maze
+        self.data = data
+
+    def __len__(self):
+        return len(self.data)
+
+class Simulation(object):
+    """
+    Simulation
+
+    World state for `n` players as arrays. Each player has its own copy of
+    a maze, either one `Maze` shared by all or a list with one per player.
+    When `shared`, players instead play one maze together: walls and items
+    are stored once, an item goes to the first player to reach it.
+    Instances share only read-only data, mazes and the compiled game mode,
+    so separate threads may step separate instances; the array kernels
+    release the GIL.
+
+    Responsabilities:
+        Step movement, wall collisions, exploration, sensors and item pickups
+        Evaluate compiled game mode rewards
+        Snapshot and restore compact state
+    """
+
+    # x, y, vx, vy, rotation, battery, reward, score
+    STATE_FLOATS = 8
+
+    def __init__(self, maze, cfg, compiled_mode, n=1, shared=False):
+        mazes = [maze] * n if isinstance(maze, Maze) else list(maze)
+        n = len(mazes)
+        assert not shared or len(set(mazes)) == 1, "Shared players need one maze"
+
+        self.cfg = cfg
+        self.compiled_mode = compiled_mode
+        self.n = n
+        self.tw = cfg.tiles['tw']
+        self.th = cfg.tiles['th']
+
+        player = cfg.settings['player']
+        self.radius = player['radius']
+        self.top_speed = player['top_speed']
+        self.angular_velocity = player['angular_velocity']
+        self.accel = player['accel']
+        self.deaccel = player['deaccel']
+        self.battery_angular = player['battery_use']['angular']
+        self.battery_linear = player['battery_use']['linear']
+
+        self.observation_dtype = np.dtype(player.get('observation_dtype', 'float64'))
+        if self.observation_dtype.name not in OBSERVATION_DTYPES:
+            raise ValueError('Unknown observation dtype {!r}, expected one of {}'.format(
+                self.observation_dtype.name, OBSERVATION_DTYPES))
+
+        sensors = player['sensors']
+        self.angles, self.ranges = sensor_layout(sensors)
+        self.sensors_num = len(self.angles)
+        cache = sensors.get('cache')
+        self.cache_sensors = self.sensors_num >= CACHE_MIN_RAYS if cache is None else bool(cache)
+
+        self.force_fps = cfg.settings['world']['force_fps']
+        # Time it takes to travel half a square at full speed
+        self.consumed_dt = self.top_speed / min(self.th, self.tw) / 2
+
+        # Buttons held by each action
+        controls = player['actions']
+        self.action_turn = np.array([('right' in c) - ('left' in c) for c in controls], dtype=np.float64)
+        self.action_up = np.array([1 if 'up' in c else 0 for c in controls], dtype=np.float64)
+
+        self.item_types = compiled_mode.item_types
+        self.item_columns = np.array([compiled_mode.columns[t] for t in self.item_types], dtype=np.intp)
+
+        self.index = np.arange(n)
+        # Row of walls and items for each player
+        self.shared = shared
+        self.slots = 1 if shared else n
+        self.slot = np.zeros(n, dtype=np.intp) if shared else self.index
+
+        # Level buffers are sized for `Config` tiles, larger mazes grow them
+        self.mazes = [None] * n
+        self.cols = self.rows = 0
+        self.allocate_grid(cfg.tiles['width'] + 1, cfg.tiles['height'] + 1)
+        self.items_capacity = 0
+        self.items_num = np.zeros(n, dtype=np.intp)
+        self.item_pos = np.zeros((self.slots, 0, 2))
+        self.item_radius = np.zeros((self.slots, 0))
+        self.item_type = np.zeros((self.slots, 0), dtype=np.intp)
+        self.alive = np.zeros((self.slots, 0), dtype=bool)
+        self.item_vel = np.zeros((self.slots, 0, 2))
+        # Item types drifting around, see `move_items`
+        self.moving = bool((compiled_mode.speed > 0).any())
+        # Items moved from where their maze placed them
+        self.items_moved = np.zeros(self.slots, dtype=bool)
+        # Taken items of these types move to the next respawn position of their maze
+        self.respawn_type = compiled_mode.respawn
+        self.respawns = bool(self.respawn_type.any())
+        self.respawn_pos = np.zeros((self.slots, 0, 2))
+        self.respawn_num = np.zeros(self.slots, dtype=np.intp)
+        self.respawn_next = np.zeros(self.slots, dtype=np.intp)
+        # Items by tile, see `bucket_items`, and tiles each item is listed in
+        self.item_tiles = np.zeros((self.slots, 0, 4), dtype=np.intp)
+        self.buckets = np.full((self.slots, self.cols, self.rows, 0), -1, dtype=np.int32)
+        self.occupied = np.zeros((self.slots, self.cols, self.rows), dtype=bool)
+
+        self.width = np.zeros(n)
+        self.height = np.zeros(n)
+        self.spawn = np.zeros((n, 2))
+        self.spawn_cell = np.zeros((n, 2), dtype=np.intp)
+        self.spawn_rotation = np.zeros(n)
+
+        # Tiles to spawn of the tile each player is on, see `Maze.distance_field`
+        self.spawn_distance = np.zeros(n)
+
+        self.pos = np.zeros((n, 2))
+        self.vel = np.zeros((n, 2))
+        self.rotation = np.zeros(n)
+        self.battery = np.zeros(n)
+        self.reward = np.zeros(n)
+        self.score = np.zeros(n)
+        self.game_over = np.zeros(n, dtype=bool)
+        self.bumped = np.zeros(n, dtype=bool)
+        self.proximity = np.zeros((n, self.sensors_num))
+        # 0 for walls, item type + 1 otherwise
+        self.sensed = np.zeros((n, self.sensors_num), dtype=np.intp)
+        self.events = np.zeros((n, compiled_mode.events_num))
+        self.fired = np.zeros((n, len(compiled_mode.terms)))
+
+        # Events of each episode so far, see `episode_info`
+        self.episode_events = np.zeros((n, compiled_mode.events_num))
+        self.goal_term = compiled_mode.term_index.get('goal')
+        self.goal_reached = np.zeros(n, dtype=bool)
+        self.goal_tick = np.zeros(n, dtype=np.int64)
+        # Last `event_log` events as they fire, by tick, column, count and position
+        self.event_names = np.array(EVENTS + list(self.item_types))
+        self.log_capacity = int(cfg.settings['world'].get('event_log', 0))
+        self.event_tick = np.zeros((n, self.log_capacity), dtype=np.int64)
+        self.event_column = np.zeros((n, self.log_capacity), dtype=np.intp)
+        self.event_count = np.zeros((n, self.log_capacity))
+        self.event_pos = np.zeros((n, self.log_capacity, 2))
+        self.events_logged = np.zeros(n, dtype=np.int64)
+
+        # Rays cast and readings reused by `sense`, see `sense_hit_rate`
+        self.rays_cast = 0
+        self.rays_reused = 0
+        # Unclipped readings sensed from the cached position, by bearing, see `sense_cached`
+        self.cached = np.zeros(n, dtype=bool)
+        self.cache_pos = np.zeros((n, 2))
+        self.cache_bits = int(math.ceil(math.log(max(self.sensors_num * CACHE_PER_RAY, CACHE_SECTORS), 2)))
+        size = 1 << self.cache_bits
+        # Bearing bin of each entry, -1 when empty, and its readings
+        self.cache_key = np.full((n, size), -1, dtype=np.int64)
+        self.cache_wall = np.zeros((n, size))
+        self.cache_item_distance = np.zeros((n, size))
+        self.cache_item = np.zeros((n, size), dtype=np.intp)
+        # Bearing bins of each ray from heading
+        self.angle_bins = self.angles * (CACHE_BINS / (math.pi * 2))
+        self.cache_alive = self.alive.copy()
+
+        for maze in set(mazes):
+            self.load([i for i, m in enumerate(mazes) if m is maze], maze)
+
+    def allocate_grid(self, cols, rows):
+        """
+        Grow tile buffers to hold `cols` x `rows`
+        """
+        if cols <= self.cols and rows <= self.rows:
+            return
+        cols, rows = max(cols, self.cols), max(rows, self.rows)
+        grids = []
+        for name, size in (('walls', self.slots), ('floor', self.slots), ('visited', self.n)):
+            grid = np.zeros((size, cols, rows), dtype=bool)
+            if self.cols:
+                grid[:, :self.cols, :self.rows] = getattr(self, name)
+            grids.append(grid)
+        self.walls, self.floor, self.visited = grids
+        # Distance field to the spawn of each player
+        field = np.full((self.n, cols, rows), -1, dtype=np.int32)
+        if self.cols:
+            field[:, :self.cols, :self.rows] = self.spawn_field
+        self.spawn_field = field
+        self.cols, self.rows = cols, rows
+
+    def allocate_items(self, items):
+        """
+        Grow item buffers to hold `items` per player
+        """
+        if items <= self.items_capacity:
+            return
+        k = self.items_capacity
+        item_pos = np.zeros((self.slots, items, 2))
+        item_radius = np.zeros((self.slots, items))
+        item_type = np.zeros((self.slots, items), dtype=np.intp)
+        alive = np.zeros((self.slots, items), dtype=bool)
+        item_vel = np.zeros((self.slots, items, 2))
+        item_tiles = np.zeros((self.slots, items, 4), dtype=np.intp)
+        item_pos[:, :k] = self.item_pos
+        item_radius[:, :k] = self.item_radius
+        item_type[:, :k] = self.item_type
+        alive[:, :k] = self.alive
+        item_vel[:, :k] = self.item_vel
+        item_tiles[:, :k] = self.item_tiles
+        self.item_pos, self.item_radius, self.item_type, self.alive = item_pos, item_radius, item_type, alive
+        self.item_vel, self.item_tiles = item_vel, item_tiles
+        self.items_capacity = items
+
+    def load(self, rows, maze):
+        """
+        Give players in `rows` a new maze and reset them
+        """
+        assert (maze.tw, maze.th) == (self.tw, self.th), "Maze tiles differ from Config"
+        rows = np.asarray(rows, dtype=np.intp)
+        assert not self.shared or len(set(rows)) == self.n, "Shared players load one maze together"
+        self.allocate_grid(maze.cols, maze.rows)
+        self.allocate_items(maze.items_num)
+
+        for i in rows:
+            self.mazes[i] = maze
+        self.cached[rows] = False
+        slots = self.slot[rows]
+        self.walls[slots] = False
+        self.walls[slots, :maze.cols, :maze.rows] = maze.walls
+        self.floor[slots] = False
+        self.floor[slots, :maze.cols, :maze.rows] = ~maze.walls
+        self.width[rows] = maze.width
+        self.height[rows] = maze.height
+        self.spawn[rows] = maze.spawn
+        self.spawn_cell[rows] = maze.spawn_cell
+        self.spawn_rotation[rows] = maze.rotation
+        self.spawn_field[rows] = -1
+        self.spawn_field[rows, :maze.cols, :maze.rows] = maze.distance_field()
+
+        k = maze.items_num
+        self.items_num[rows] = k
+        self.item_pos[slots] = 0
+        self.item_radius[slots] = 0
+        self.item_type[slots] = 0
+        self.item_vel[slots] = 0
+        self.items_moved[slots] = False
+        if k:
+            # Maze item kinds to game mode order
+            types = np.array([self.item_types.index(t) for t in maze.item_types], dtype=np.intp)
+            self.item_pos[slots, :k] = maze.item_positions
+            self.item_radius[slots, :k] = maze.item_radius
+            self.item_type[slots, :k] = types[maze.item_kinds]
+            self.item_vel[slots, :k] = maze.item_velocities
+        self.bucket_items(slots)
+
+        r = len(maze.respawn_positions)
+        if r > self.respawn_pos.shape[1]:
+            respawn_pos = np.zeros((self.slots, r, 2))
+            respawn_pos[:, :self.respawn_pos.shape[1]] = self.respawn_pos
+            self.respawn_pos = respawn_pos
+        self.respawn_pos[slots, :r] = maze.respawn_positions
+        self.respawn_num[slots] = r
+        self.respawn_next[slots] = 0
+
+        self.reset(rows)
+
+    def bucket_items(self, slots):
+        """
+        Index items of `slots` by each tile their bounds overlap, so a ray
+        segment tests the items in the tile it starts in
+        """
+        slots = np.unique(slots)
+        size = (self.cols, self.rows)
+        if self.buckets.shape[1:3] != size:
+            buckets = np.full((self.slots,) + size + (self.buckets.shape[3],), -1, dtype=np.int32)
+            c, r = min(self.cols, self.buckets.shape[1]), min(self.rows, self.buckets.shape[2])
+            buckets[:, :c, :r] = self.buckets[:, :c, :r]
+            self.buckets = buckets
+        self.buckets[slots] = -1
+        self.occupied = (self.buckets >= 0).any(axis=3)
+
+        s, k = np.nonzero(self.item_radius[slots] > 0)
+        if not len(s):
+            return
+        s = slots[s]
+        bounds = self.item_bounds(s, k)
+        self.item_tiles[s, k] = bounds
+        self.insert_entries(*self.tile_entries(s, k, bounds))
+
+    def item_bounds(self, s, k):
+        """
+        First and last tile across and up, `(i0, j0, i1, j1)`, that items `k`
+        of slots `s` overlap
+        """
+        pos = self.item_pos[s, k]
+        reach = self.item_radius[s, k] + BUCKET_MARGIN
+        return np.stack([np.floor_divide(pos[:, 0] - reach, self.tw),
+                         np.floor_divide(pos[:, 1] - reach, self.th),
+                         np.floor_divide(pos[:, 0] + reach, self.tw),
+                         np.floor_divide(pos[:, 1] + reach, self.th)], axis=1).astype(np.intp)
+
+    def tile_entries(self, s, k, bounds):
+        """
+        Flat tile of `buckets` and item for each tile within `bounds` of
+        items `k` of slots `s`
+        """
+        tiles, items = [], []
+        for di in range(int((bounds[:, 2] - bounds[:, 0]).max()) + 1):
+            for dj in range(int((bounds[:, 3] - bounds[:, 1]).max()) + 1):
+                i, j = bounds[:, 0] + di, bounds[:, 1] + dj
+                ok = ((i <= bounds[:, 2]) & (j <= bounds[:, 3]) & (i >= 0) & (j >= 0) &
+                      (i < self.cols) & (j < self.rows))
+                tiles.append((s[ok] * self.cols + i[ok]) * self.rows + j[ok])
+                items.append(k[ok])
+        return np.concatenate(tiles), np.concatenate(items)
+
+    def insert_entries(self, tile, k):
+        """
+        List items `k` in flat tiles `tile`, in free places of each tile
+        """
+        # Place among entries of the same tile, by item
+        order = np.argsort(tile * self.items_capacity + k)
+        tile, k = tile[order], k[order]
+        start = np.ones(len(tile), dtype=bool)
+        start[1:] = tile[1:] != tile[:-1]
+        first = np.maximum.accumulate(np.where(start, np.arange(len(tile)), 0))
+        need = np.arange(len(tile)) - first + 1
+
+        free = self.bucket_cells()[tile] < 0
+        short = int((need - free.sum(axis=1)).max()) if len(tile) else 0
+        if short > 0:
+            depth = self.buckets.shape[3]
+            buckets = np.full(self.buckets.shape[:3] + (depth + short,), -1, dtype=np.int32)
+            buckets[..., :depth] = self.buckets
+            self.buckets = buckets
+            free = self.bucket_cells()[tile] < 0
+        place = np.argmax(np.cumsum(free, axis=1) == need[:, None], axis=1)
+        self.bucket_cells()[tile, place] = k
+        self.occupied.reshape(-1)[tile] = True
+
+    def bucket_cells(self):
+        """
+        View of `buckets` with one row per flat tile
+        """
+        return self.buckets.reshape(self.slots * self.cols * self.rows, self.buckets.shape[3])
+
+    def rebucket_items(self, s, k):
+        """
+        Move items `k` of slots `s` to the tiles they overlap now, only
+        those whose tiles changed
+        """
+        bounds = self.item_bounds(s, k)
+        changed = (bounds != self.item_tiles[s, k]).any(axis=1)
+        if not changed.any():
+            return
+        s, k, bounds = s[changed], k[changed], bounds[changed]
+
+        cells = self.bucket_cells()
+        tile, item = self.tile_entries(s, k, self.item_tiles[s, k])
+        e, place = np.nonzero(cells[tile] == item[:, None])
+        cells[tile[e], place] = -1
+        self.occupied.reshape(-1)[tile] = (cells[tile] >= 0).any(axis=1)
+
+        self.item_tiles[s, k] = bounds
+        self.insert_entries(*self.tile_entries(s, k, bounds))
+
+    def reset(self, rows=None):
+        """
+        Players at spawn with a full battery, every player by default.
+        Shared items come back only when every player resets.
+        """
+        if rows is None:
+            rows = self.index
+        rows = np.asarray(rows, dtype=np.intp)
+        self.pos[rows] = self.spawn[rows]
+        self.vel[rows] = 0
+        self.rotation[rows] = self.spawn_rotation[rows]
+        self.battery[rows] = 100
+        self.reward[rows] = 0
+        self.score[rows] = 0
+        self.game_over[rows] = False
+        self.bumped[rows] = False
+        self.visited[rows] = False
+        self.episode_events[rows] = 0
+        self.goal_reached[rows] = False
+        self.events_logged[rows] = 0
+        if not self.shared or len(set(rows)) == self.n:
+            self.alive[self.slot[rows]] = np.arange(self.items_capacity)[None, :] < self.items_num[rows, None]
+            # Respawned and moving items back where the maze placed them
+            moved = rows[self.items_moved[self.slot[rows]]]
+            if len(moved):
+                self.home_items(moved)
+        self.proximity[rows] = self.ranges
+        self.sensed[rows] = 0
+        self.spawn_distance[rows] = self.spawn_field[rows, self.spawn_cell[rows, 0], self.spawn_cell[rows, 1]]
+
+    def home_items(self, rows):
+        """
+        Items of players in `rows` at their maze positions and velocities
+        """
+        for i in rows:
+            maze = self.mazes[i]
+            self.item_pos[self.slot[i], :maze.items_num] = maze.item_positions
+            self.item_vel[self.slot[i], :maze.items_num] = maze.item_velocities
+        slots = self.slot[rows]
+        self.respawn_next[slots] = 0
+        self.items_moved[slots] = False
+        self.bucket_items(slots)
+        self.cached[np.isin(self.slot, slots)] = False
+
+    def respawn_items(self, items):
+        """
+        Place `items`, a mask of (slots, capacity), again at the next respawn
+        positions of each slot. Items move in place rather than being replaced.
+        """
+        s, k = np.nonzero(items)
+        # Draws of a slot follow on from each other
+        rank = np.arange(len(s)) - np.searchsorted(s, s)
+        draw = (self.respawn_next[s] + rank) % self.respawn_num[s]
+        self.item_pos[s, k] = self.respawn_pos[s, draw]
+        self.alive[s, k] = True
+        self.respawn_next += np.bincount(s, minlength=self.slots)
+        slots = np.unique(s)
+        self.items_moved[slots] = True
+        self.rebucket_items(s, k)
+        self.cached[np.isin(self.slot, slots)] = False
+
+    def spawn_at(self, rows, spawn, rotation):
+        """
+        Move the spawn of players in `rows` from that of their maze, and reset them
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        self.spawn[rows] = spawn
+        self.spawn_cell[rows] = np.floor_divide(self.spawn[rows], (self.tw, self.th)).astype(np.intp)
+        self.spawn_rotation[rows] = rotation
+        for i in rows:
+            maze = self.mazes[i]
+            self.spawn_field[i] = -1
+            self.spawn_field[i, :maze.cols, :maze.rows] = maze.distance_field(self.spawn_cell[i])
+        self.reset(rows)
+
+    def step(self, turn, up, dt=None, mask=None):
+        """
+        Advance every player one tick, `turn` is right minus left buttons.
+        With a boolean `mask` only those players advance: the others are
+        left out of every kernel, keep their state and fire no events.
+        """
+        if dt is None:
+            dt = 1 / self.force_fps
+        rows = slice(None) if mask is None else np.flatnonzero(mask)
+
+        self.events.fill(0)
+        self.fired.fill(0)
+        self.events[rows, EVENT_BATTERY] = 1
+        charged = self.battery[rows] > 0
+
+        self.move(np.asarray(turn)[rows], np.asarray(up)[rows], dt, rows)
+        if self.moving:
+            self.move_items(dt, mask)
+        self.visit(rows)
+        self.sense(rows)
+        self.collide_items(rows)
+        self.apply_rewards(rows)
+        self.count_events(charged & (self.battery[rows] <= 0), rows)
+
+    def count_events(self, emptied, rows=slice(None)):
+        """
+        Add this tick's events to each episode of players `rows`, logging
+        those which fired when `event_log` is set. Battery is logged as it
+        runs out.
+        """
+        events = self.events[rows]
+        self.episode_events[rows] += events
+        if self.goal_term is not None:
+            reached = self.fired[rows, self.goal_term] > 0
+            first = reached & ~self.goal_reached[rows]
+            self.goal_tick[rows] = np.where(first, self.episode_events[rows, EVENT_BATTERY], self.goal_tick[rows])
+            self.goal_reached[rows] |= reached
+        else:
+            reached = False
+        if not self.log_capacity:
+            return
+
+        fired = events > 0
+        fired[:, EVENT_BATTERY] = emptied
+        fired[:, EVENT_GOAL] = reached
+        fired[:, EVENT_APPROACH] = False
+        at_row, columns = np.nonzero(fired)
+        if not len(at_row):
+            return
+        players = self.index[rows][at_row]
+        # Events of a player follow on from each other
+        rank = np.arange(len(at_row)) - np.searchsorted(at_row, at_row)
+        at = (self.events_logged[players] + rank) % self.log_capacity
+        self.event_tick[players, at] = self.episode_events[players, EVENT_BATTERY]
+        self.event_column[players, at] = columns
+        self.event_count[players, at] = np.where(columns == EVENT_BATTERY, 1, events[at_row, columns])
+        self.event_pos[players, at] = self.pos[players]
+        self.events_logged += np.bincount(players, minlength=self.n)
+
+    def episode_info(self, i=0):
+        """
+        Counters of the episode of player `i` so far, with the last events
+        as arrays when `event_log` is set
+        """
+        counts = self.episode_events[i]
+        info = {
+            'steps': int(counts[EVENT_BATTERY]),
+            'wall_hits': int(counts[EVENT_WALL]),
+            'explored': int(counts[EVENT_EXPLORE]),
+            'items': dict((t, int(counts[c])) for t, c in zip(self.item_types, self.item_columns)),
+            'goal': bool(self.goal_reached[i]),
+            'battery_out': bool(self.battery[i] <= 0)
+        }
+        if self.log_capacity:
+            k = min(int(self.events_logged[i]), self.log_capacity)
+            order = (self.events_logged[i] - k + np.arange(k)) % self.log_capacity
+            info['events'] = {
+                'tick': self.event_tick[i, order],
+                'name': self.event_names[self.event_column[i, order]],
+                'count': self.event_count[i, order],
+                'pos': self.event_pos[i, order]
+            }
+        return info
+
+    def step_actions(self, actions, dt=None, mask=None):
+        """
+        Advance every player one tick by action index
+        """
+        self.step(self.action_turn[actions], self.action_up[actions], dt, mask)
+
+    def move_items(self, dt, mask=None):
+        """
+        Drift alive items of slots with a player stepping, each axis in turn.
+        An item which would overlap a wall stays put on that axis and bounces.
+        """
+        moving = self.alive & (self.item_vel != 0).any(axis=2)
+        if mask is not None:
+            stepping = np.zeros(self.slots, dtype=bool)
+            stepping[self.slot[mask]] = True
+            moving &= stepping[:, None]
+        s, k = np.nonzero(moving)
+        if not len(s):
+            return
+
+        pos = self.item_pos[s, k]
+        vel = self.item_vel[s, k]
+        r = self.item_radius[s, k]
+        # Points across each item bounds no further apart than a tile
+        points = int(math.ceil(2 * r.max() / min(self.tw, self.th))) + 1
+        offsets = np.linspace(-1, 1, points)[None, :] * r[:, None]
+        for axis in (0, 1):
+            ahead = pos[:, axis] + vel[:, axis] * dt
+            x = (ahead if axis == 0 else pos[:, 0])[:, None, None] + offsets[:, :, None]
+            y = (ahead if axis == 1 else pos[:, 1])[:, None, None] + offsets[:, None, :]
+            i = np.floor_divide(x, self.tw).astype(np.intp)
+            j = np.floor_divide(y, self.th).astype(np.intp)
+            blocked = self.wall_at(i, j, s[:, None, None]).any(axis=(1, 2))
+            pos[:, axis] = np.where(blocked, pos[:, axis], ahead)
+            vel[blocked, axis] *= -1
+
+        self.item_pos[s, k] = pos
+        self.item_vel[s, k] = vel
+        slots = np.unique(s)
+        self.items_moved[slots] = True
+        self.rebucket_items(s, k)
+        self.cached[np.isin(self.slot, slots)] = False
+
+    def wall_at(self, i, j, slots=None):
+        """
+        Walls at tiles `i`, `j` of shape (n, ...), outside the grid is open.
+        `slots` picks the wall grid of each tile, by default that of its player.
+        """
+        if slots is None:
+            slots = self.slot.reshape((-1,) + (1,) * (np.ndim(i) - 1))
+        inside = (i >= 0) & (j >= 0) & (i < self.cols) & (j < self.rows)
+        i = np.clip(i, 0, self.cols - 1).astype(np.intp)
+        j = np.clip(j, 0, self.rows - 1).astype(np.intp)
+        return inside & self.walls[slots, i, j]
+
+    def move(self, turn, up, dt, rows=slice(None)):
+        """
+        Rotate, accelerate and slide along walls, players `rows` only
+        with `turn` and `up` given for those
+        """
+        self.battery[rows] -= (turn != 0) * self.battery_angular
+        self.rotation[rows] += turn * dt * self.angular_velocity
+
+        # Redirect existing velocity in new direction
+        a = np.radians(self.rotation[rows])
+        impulse = np.stack([np.sin(a), np.cos(a)], axis=1)
+        vel = self.vel[rows]
+        nv = np.sqrt(vel[:, 0] * vel[:, 0] + vel[:, 1] * vel[:, 1])
+        vel = nv[:, None] * impulse
+
+        moving = up != 0
+        self.battery[rows] -= moving * self.battery_linear
+        brake = dt * self.deaccel
+        vel = np.where(moving[:, None], vel + (dt * up * self.accel)[:, None] * impulse,
+                       np.where((nv < brake)[:, None], 0.0, vel + brake * -impulse))
+
+        nv = np.sqrt(vel[:, 0] * vel[:, 0] + vel[:, 1] * vel[:, 1])
+        over = nv > self.top_speed
+        vel[over] *= (self.top_speed / nv[over])[:, None]
+
+        # Player rects as left, bottom
+        size = self.radius * 2
+        x, y = self.pos[rows, 0], self.pos[rows, 1]
+        last_left = x - self.radius
+        last_bottom = y - self.radius
+
+        slots = self.slot[rows]
+        vx, vy = vel[:, 0].copy(), vel[:, 1].copy()
+        bumped_x = bumped_y = np.zeros(len(x), dtype=bool)
+        remaining = dt
+        while remaining > 1.e-6:
+            left = (x + remaining * vx) - size / 2
+            bottom = (y + remaining * vy) - size / 2
+            bumped_x, bumped_y = self.collide_map(last_left, last_bottom, left, bottom, size, slots)
+            vx[bumped_x] = 0.0
+            vy[bumped_y] = 0.0
+            remaining -= self.consumed_dt
+
+        left = (x + dt * vx) - size / 2
+        bottom = (y + dt * vy) - size / 2
+
+        # Ensure player can't escape borders
+        width, height = self.width[rows], self.height[rows]
+        border = np.zeros(len(x), dtype=bool)
+        out = bottom + size > height
+        bottom = np.where(out, height - size, bottom)
+        border |= out
+        out = bottom < self.th
+        bottom = np.where(out, self.th, bottom)
+        border |= out
+        out = left < self.th
+        left = np.where(out, self.th, left)
+        border |= out
+        out = left + size > width
+        left = np.where(out, width - size, left)
+        border |= out
+
+        self.pos[rows, 0] = left + size / 2
+        self.pos[rows, 1] = bottom + size / 2
+        self.vel[rows, 0] = vx
+        self.vel[rows, 1] = vy
+
+        bumped = border | bumped_x | bumped_y
+        self.bumped[rows] = bumped
+        self.events[rows, EVENT_WALL] += bumped
+
+    def collide_map(self, last_left, last_bottom, left, bottom, size, slots=None):
+        """
+        Push rects at `left`, `bottom` out of walls they moved into, one per
+        player or in the wall grids of `slots`.
+        Cells are resolved in map region order, those needing both axes last.
+        """
+        tw, th = self.tw, self.th
+        last_right, last_top = last_left + size, last_bottom + size
+        left, bottom = left.copy(), bottom.copy()
+        bumped_x = np.zeros(len(left), dtype=bool)
+        bumped_y = np.zeros(len(left), dtype=bool)
+
+        i0 = np.maximum(0, np.floor_divide(left, tw)).astype(np.intp)
+        j0 = np.maximum(0, np.floor_divide(bottom, th)).astype(np.intp)
+        i1 = np.floor_divide(left + size, tw).astype(np.intp) + 1
+        j1 = np.floor_divide(bottom + size, th).astype(np.intp) + 1
+        span_x = int(size // tw) + 2
+        span_y = int(size // th) + 2
+
+        def intersects(cl, cb, left, bottom):
+            return ~((cl + tw <= left) | (left + size <= cl) | (cb + th <= bottom) | (bottom + size <= cb))
+
+        def detect(cl, cb, left, bottom):
+            cr, ct = cl + tw, cb + th
+            right, top = left + size, bottom + size
+            dy = np.where((last_bottom >= ct) & (ct > bottom), ct - bottom,
+                          np.where((last_top <= cb) & (cb < top), cb - top, 0.0))
+            dx = np.where((last_right <= cl) & (cl < right), cl - right,
+                          np.where((last_left >= cr) & (cr > left), cr - left, 0.0))
+            return dx, dy
+
+        def resolve(hit, dx, dy, left, bottom):
+            hit_x = hit & (dx != 0)
+            hit_y = hit & (dy != 0)
+            left = np.where(hit_x, left + dx, left)
+            bottom = np.where(hit_y, ((bottom + size) + dy) - size, bottom)
+            return hit_x, hit_y, left, bottom
+
+        later = []
+        for di in range(span_x):
+            for dj in range(span_y):
+                i, j = i0 + di, j0 + dj
+                wall = (i < i1) & (j < j1) & self.wall_at(i, j, slots)
+                if not wall.any():
+                    continue
+                cl, cb = i * tw, j * th
+
+                hit = wall & intersects(cl, cb, left, bottom)
+                dx, dy = detect(cl, cb, left, bottom)
+                single = hit & ((dx == 0) | (dy == 0))
+                hit_x, hit_y, left, bottom = resolve(single, dx, dy, left, bottom)
+                bumped_x |= hit_x
+                bumped_y |= hit_y
+                later.append((cl, cb, hit & ~single))
+
+        # Second pass, for cells that initially collided in both axis
+        for cl, cb, pending in later:
+            hit = pending & intersects(cl, cb, left, bottom)
+            if not hit.any():
+                continue
+            dx, dy = detect(cl, cb, left, bottom)
+            only_x = np.abs(dx) < np.abs(dy)
+            only_y = np.abs(dy) < np.abs(dx)
+            dy = np.where(only_x, 0.0, dy)
+            dx = np.where(only_y, 0.0, dx)
+            hit_x, hit_y, left, bottom = resolve(hit, dx, dy, left, bottom)
+            bumped_x |= hit_x
+            bumped_y |= hit_y
+
+        return bumped_x, bumped_y
+
+    def visit(self, rows=slice(None)):
+        """
+        Mark current tile and neighbours of players `rows` visited, rewarding new floor
+        """
+        index, slot = self.index[rows], self.slot[rows]
+        ci = np.floor_divide(self.pos[rows, 0], self.tw).astype(np.intp)
+        cj = np.floor_divide(self.pos[rows, 1], self.th).astype(np.intp)
+
+        spawn = self.spawn_cell[rows]
+        self.events[rows, EVENT_GOAL] += (ci == spawn[:, 0]) & (cj == spawn[:, 1])
+
+        # Potential of tiles to spawn, unchanged off the field
+        distance = self.spawn_field.ravel().take((index * self.cols + ci) * self.rows + cj)
+        last = self.spawn_distance[rows]
+        known = (distance >= 0) & (last >= 0)
+        self.events[rows, EVENT_APPROACH] += np.where(known, last - distance, 0)
+        self.spawn_distance[rows] = np.where(distance >= 0, distance, last)
+
+        for di, dj in VISIT_OFFSETS:
+            i, j = ci + di, cj + dj
+            inside = (i >= 0) & (j >= 0) & (i < self.cols) & (j < self.rows)
+            i = np.clip(i, 0, self.cols - 1)
+            j = np.clip(j, 0, self.rows - 1)
+            new = inside & self.floor[slot, i, j] & ~self.visited[index, i, j]
+            self.visited[index, i, j] |= new
+            self.events[rows, EVENT_EXPLORE] += new
+
+    def cells(self, x, y, slots):
+        """
+        Flat index into tile grids of points `x`, `y`, and whether inside the grid
+        """
+        i = np.floor_divide(x, self.tw)
+        j = np.floor_divide(y, self.th)
+        inside = (i >= 0) & (j >= 0) & (i < self.cols) & (j < self.rows)
+        # Cast first, points of stopped rays may not be finite
+        i = np.minimum(np.maximum(i.astype(np.intp), 0), self.cols - 1)
+        j = np.minimum(np.maximum(j.astype(np.intp), 0), self.rows - 1)
+        return (slots * self.cols + i) * self.rows + j, inside
+
+    def cast(self, x, y, rad, items=False, rows=None):
+        """
+        Distance to the nearest wall along bearings `rad` of shape (n, ...),
+        dead-reckoning from tile boundary to tile boundary. Each crossing
+        steps only rays still travelling. With `rows` of the same shape as
+        `rad`, rays are of those players instead.
+        With `items`, each segment also tests ray-circle hits against items
+        bucketed in its tile, rays stop at the first item or wall. Returns wall
+        distances, item distances and item indices, infinite and -1 without a hit.
+        """
+        tw, th = self.tw, self.th
+        shape = np.shape(rad)
+
+        def flat(a):
+            return np.broadcast_to(a, shape).ravel()
+
+        if rows is None:
+            rows = self.index.reshape((-1,) + (1,) * (len(shape) - 1))
+        rows = flat(rows)
+        width = self.width[rows]
+        height = self.height[rows]
+        slots = self.slot[rows]
+        rad = flat(rad)
+        sin, cos = np.sin(rad), np.cos(rad)
+        ox = sx = flat(x).astype(np.float64)
+        oy = sy = flat(y).astype(np.float64)
+        distance = np.zeros(rad.shape)
+        # Rays still travelling
+        ray = np.arange(rad.size)
+        walls = self.walls.ravel()
+
+        if items:
+            item_distance = np.full(rad.shape, np.inf)
+            item = np.full(rad.shape, -1, dtype=np.intp)
+        bucketed = items and self.buckets.shape[3] > 0
+        if bucketed:
+            occupied = self.occupied.ravel()
+            # Tile each segment starts in
+            cell, in_grid = self.cells(sx, sy, slots)
+
+        with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+            m = np.tan(rad)
+            for depth in range(CAST_DEPTH):
+                # Exit if outside window
+                inside = (np.abs(sx) <= width) & (np.abs(sy) <= height)
+
+                # Next horizontal boundary, one pixel into the tile
+                up = cos > 0
+                rem = np.mod(sy, th)
+                bound = np.where(up, sy + (th - rem), sy - rem)
+                ey_x = -m * (sy - bound) + sx
+                ey_y = np.minimum(bound + np.where(up, 1, -1), height)
+
+                # Next vertical boundary
+                right = sin > 0
+                rem = np.mod(sx, tw)
+                bound = np.where(right, sx + (tw - rem), sx - rem)
+                ex_x = np.minimum(bound + np.where(right, 1, -1), width)
+                ex_y = ((bound - sx) / m) + sy
+
+                len_x = np.where(sin != 0, np.sqrt((sx - ex_x) ** 2 + (sy - ex_y) ** 2), np.inf)
+                len_y = np.where(cos != 0, np.sqrt((sx - ey_x) ** 2 + (sy - ey_y) ** 2), np.inf)
+
+                # Shortest boundary intersect, x on ties
+                use_x = len_x <= len_y
+                length = np.where(use_x, len_x, len_y)
+                # Through a tile corner, into the diagonal tile
+                corner = np.abs(len_x - len_y) <= CORNER_TOLERANCE
+                active = inside & (length > 0)
+                distance[ray[active]] += length[active]
+
+                if bucketed:
+                    test = active & in_grid & occupied.take(cell)
+                    if test.any():
+                        tested = ray[test]
+                        self.hit_items(tested, cell[test], ox[tested], oy[tested], sin[test],
+                                       cos[test], item_distance, item)
+                        # Past the first item along the ray
+                        test[test] = item_distance[tested] <= distance[tested]
+                        active &= ~test
+
+                # Tile entered, wall or the next segment's
+                ex = np.where(use_x | corner, ex_x, ey_x)
+                ey = np.where(use_x & ~corner, ex_y, ey_y)
+                cell, in_grid = self.cells(ex, ey, slots)
+                blocked = in_grid & walls.take(cell)
+                if corner.any():
+                    # Grazing a wall beside the diagonal tile stops the ray too
+                    back_x = ex_x - np.where(right, 2, -2)
+                    back_y = ey_y - np.where(up, 2, -2)
+                    for px, py in ((ex_x, back_y), (back_x, ey_y)):
+                        side, in_side = self.cells(px, py, slots)
+                        blocked |= corner & in_side & walls.take(side)
+                active &= ~blocked
+                if not active.any():
+                    break
+                ray, sx, sy = ray[active], ex[active], ey[active]
+                sin, cos, m = sin[active], cos[active], m[active]
+                width, height, slots = width[active], height[active], slots[active]
+                cell, in_grid = cell[active], in_grid[active]
+
+        if not items:
+            return distance.reshape(shape)
+        return distance.reshape(shape), item_distance.reshape(shape), item.reshape(shape)
+
+    def hit_items(self, ray, cell, ox, oy, sin, cos, item_distance, item):
+        """
+        Ray-circle hits of rays `ray` from `ox`, `oy` against alive items
+        bucketed in tiles `cell`, see `cells`. Keeps the nearest of each ray.
+        """
+        buckets = self.buckets.reshape(-1, self.buckets.shape[3])
+        candidates = buckets.take(cell, axis=0).astype(np.intp)
+        listed = candidates >= 0
+        # Flat item index across slots
+        slots = cell // (self.cols * self.rows)
+        candidates = np.where(listed, candidates, 0) + (slots * self.items_capacity)[:, None]
+        listed &= self.alive.ravel().take(candidates)
+
+        # Along the ray to the nearest point of each circle
+        dx = self.item_pos[..., 0].ravel().take(candidates) - ox[:, None]
+        dy = self.item_pos[..., 1].ravel().take(candidates) - oy[:, None]
+        along = dx * sin[:, None] + dy * cos[:, None]
+        chord = self.item_radius.ravel().take(candidates) ** 2 - (dx * dx + dy * dy - along * along)
+        half = np.sqrt(np.maximum(chord, 0))
+        hit = listed & (chord >= 0) & (along + half >= 0)
+        entry = np.where(hit, np.maximum(along - half, 0), np.inf)
+
+        nearest = entry.argmin(axis=1)
+        entry = entry[np.arange(len(ray)), nearest]
+        closer = entry < item_distance[ray]
+        item_distance[ray[closer]] = entry[closer]
+        item[ray[closer]] = candidates[closer, nearest[closer]] % self.items_capacity
+
+    def sense(self, rows=slice(None)):
+        """
+        Sensor ranges to the first wall or item along each ray, of players `rows`.
+        Readings are cached by bearing while a player stays put: a ray at a
+        bearing sensed since it last moved reuses that reading, within one of
+        `CACHE_BINS`. A reused reading differs from a new cast by at most the
+        sensor range times 2 pi / `CACHE_BINS`, about 1e-9 pixels, except for
+        rays passing within `CORNER_TOLERANCE` of a tile corner without going
+        through it, which either cast may take for the corner.
+        Loading a level or a change to alive items clears the cache of players
+        sharing it.
+        """
+        index = self.index[rows]
+        rad = np.radians(self.rotation[rows])[:, None] + self.angles[None, :]
+        if not self.cache_sensors:
+            pos = self.pos[rows]
+            wall, item_distance, item = self.cast(pos[:, 0:1], pos[:, 1:2], rad, items=True, rows=index[:, None])
+            self.rays_cast += rad.size
+        else:
+            wall, item_distance, item = self.sense_cached(rad, index)
+
+        dis = np.minimum(wall, self.ranges)
+        hit = item_distance <= dis
+        sensed = np.zeros(rad.shape, dtype=np.intp)
+        if hit.any():
+            kind = self.item_type[self.slot[index][:, None], np.maximum(item, 0)]
+            sensed = np.where(hit, kind + 1, 0)
+            dis = np.where(hit, item_distance, dis)
+
+        # Keep state of sensed range, `dis` is from center
+        self.proximity[rows] = dis - self.radius
+        self.sensed[rows] = sensed
+
+    def sense_cached(self, rad, index):
+        """
+        Unclipped `cast` readings along `rad` of players `index`, casting
+        only rays not cached. Each player keeps readings from its position
+        in a table keyed by bearing, quantised to `CACHE_BINS`, with one
+        entry per sector of the circle. A new reading replaces the one in
+        its sector, moving clears the table.
+        """
+        if self.cache_alive.shape == self.alive.shape:
+            changed = (self.alive != self.cache_alive).any(axis=1)
+            self.cached[changed[self.slot]] = False
+        else:
+            self.cached[:] = False
+        self.cache_alive = self.alive.copy()
+        pos = self.pos[index]
+        still = self.cached[index] & (pos == self.cache_pos[index]).all(axis=1)
+        self.cache_key[index[~still]] = -1
+
+        size = self.cache_key.shape[1]
+        bins = (self.rotation[index] * (CACHE_BINS / 360.0))[:, None] + self.angle_bins[None, :]
+        key = np.rint(bins).astype(np.int64) & (CACHE_BINS - 1)
+        # Entries are equal sectors of the circle
+        entry = (index[:, None] * size + (key >> (CACHE_BITS - self.cache_bits))).ravel()
+
+        # Look up only players which stayed put
+        kept = np.flatnonzero(still)
+        reuse = np.zeros(rad.shape, dtype=bool)
+        if len(kept):
+            reuse[kept] = self.cache_key.ravel().take(entry).reshape(rad.shape)[kept] == key[kept]
+        if not reuse.any():
+            wall, item_distance, item = self.cast(pos[:, 0:1], pos[:, 1:2], rad, items=True, rows=index[:, None])
+            self.rays_cast += rad.size
+        else:
+            wall = self.cache_wall.ravel().take(entry).reshape(rad.shape)
+            item_distance = self.cache_item_distance.ravel().take(entry).reshape(rad.shape)
+            item = self.cache_item.ravel().take(entry).reshape(rad.shape)
+            missing = np.nonzero(~reuse)
+            if len(missing[0]):
+                wall[missing], item_distance[missing], item[missing] = self.cast(
+                    pos[missing[0], 0], pos[missing[0], 1], rad[missing], items=True, rows=index[missing[0]])
+            self.rays_cast += len(missing[0])
+            self.rays_reused += rad.size - len(missing[0])
+
+        # Rays sharing an entry keep the last reading
+        self.cache_key.ravel()[entry] = key.ravel()
+        self.cache_wall.ravel()[entry] = wall.ravel()
+        self.cache_item_distance.ravel()[entry] = item_distance.ravel()
+        self.cache_item.ravel()[entry] = item.ravel()
+        self.cached[index] = True
+        self.cache_pos[index] = pos
+        return wall, item_distance, item
+
+    @property
+    def sense_hit_rate(self):
+        """
+        Fraction of sensor readings reused from the cache
+        """
+        total = self.rays_cast + self.rays_reused
+        return self.rays_reused / total if total else 0.0
+
+    def collide_items(self, rows=slice(None)):
+        """
+        Consume items overlapping players `rows`
+        """
+        if self.items_capacity == 0:
+            return
+        # Shared items are one slot for every player, otherwise each has its own
+        slots = slice(None) if self.shared else rows
+        d = self.item_pos[slots] - self.pos[rows][:, None, :]
+        distance = (d ** 2).sum(axis=2)
+        hit = self.alive[slots] & (distance < (self.radius + self.item_radius[slots]) ** 2)
+        if not hit.any():
+            return
+
+        if self.shared:
+            # Nearest player takes an item reached by several, first on ties
+            taken = hit.any(axis=0)
+            nearest = np.where(hit, distance, np.inf).argmin(axis=0)
+            hit = taken[None, :] & (np.arange(len(hit))[:, None] == nearest[None, :])
+            self.alive[0] &= ~taken
+            taken = taken[None, :]
+        else:
+            self.alive[rows] &= ~hit
+            taken = np.zeros(self.alive.shape, dtype=bool)
+            taken[rows] = hit
+        item_type = self.item_type[slots]
+        for t, column in enumerate(self.item_columns):
+            self.events[rows, column] += (hit & (item_type == t)).sum(axis=1)
+
+        if self.respawns:
+            again = taken & self.respawn_type[self.item_type] & (self.respawn_num > 0)[:, None]
+            if again.any():
+                self.respawn_items(again)
+
+    def proximity_norm(self, rows=slice(None)):
+        return np.clip(self.proximity[rows] / self.ranges, 0, self.ranges)
+
+    def apply_rewards(self, rows=slice(None)):
+        """
+        Evaluate this tick's events of players `rows` into reward, score
+        and terminal state
+        """
+        state = {
+            'battery': self.battery[rows]
+        }
+        if self.compiled_mode.proximity is not None:
+            state['proximity'] = np.where(self.sensed[rows] == 0, self.proximity_norm(rows), 1.0)
+
+        reward, score, terminal, self.fired[rows] = self.compiled_mode.evaluate(self.events[rows], state)
+        self.reward[rows] += reward
+        self.score[rows] += score
+        self.game_over[rows] |= terminal
+
+    def take_reward(self):
+        """
+        Return rewards and reset for next step
+        """
+        reward = self.reward.copy()
+        self.reward[:] = 0
+        return reward
+
+    def quantize(self, values):
+        """
+        Readings in `observation_dtype`, `uint8` clipped to [0, 1] in steps of 1/255
+        """
+        if self.observation_dtype == np.uint8:
+            return np.rint(np.clip(values, 0, 1) * UINT8_SCALE).astype(np.uint8)
+        return np.asarray(values, dtype=self.observation_dtype)
+
+    def observation(self, battery=False, rows=slice(None)):
+        """
+        Normalised sensor ranges, channel per item type when the mode has items,
+        of players `rows`. Built in `observation_dtype`, see `observation_values`.
+        """
+        norm = self.quantize(self.proximity_norm(rows))
+        far = self.quantize(1.0)
+        types = len(self.item_types)
+        size = self.sensors_num + (1 if battery else 0)
+        n = len(norm)
+
+        if types == 0:
+            observation = np.full((n, size), far, dtype=self.observation_dtype)
+            observation[:, :self.sensors_num] = norm
+            if battery:
+                observation[:, -1] = self.quantize(self.battery[rows] / 100)
+            return observation
+
+        sensed = self.sensed[rows]
+        observation = np.full((n, size, types + 1), far, dtype=self.observation_dtype)
+        # Always include range in channel 0
+        observation[:, :self.sensors_num, 0] = norm
+        for k in range(types):
+            observation[:, :self.sensors_num, k + 1] = np.where(sensed == k + 1, norm, far)
+        if battery:
+            observation[:, -1, 0] = self.quantize(self.battery[rows] / 100)
+        return observation
+
+    def rollout(self, snapshot, action_sequences, battery=False, dt=None):
+        """
+        Play row `i` of `action_sequences` (n, horizon) in player `i`, all from `snapshot`.
+        Returns reward sums, terminals and observations, rows stop counting once terminal.
+        """
+        action_sequences = np.asarray(action_sequences, dtype=np.intp)
+        assert action_sequences.shape[0] == self.n, "Expected {} action sequences".format(self.n)
+
+        self.restore(snapshot)
+        # Reward pending in the snapshot belongs to the step before it
+        self.take_reward()
+
+        rewards = np.zeros(self.n)
+        terminals = self.game_over.copy()
+        observations = self.observation(battery)
+        for t in range(action_sequences.shape[1]):
+            self.step_actions(action_sequences[:, t], dt)
+            rewards += np.where(terminals, 0.0, self.take_reward())
+
+            live = ~terminals
+            terminals = terminals | self.game_over
+            if live.any():
+                observations[live] = self.observation(battery)[live]
+            if terminals.all():
+                break
+
+        return rewards, terminals, observations
+
+    def snapshot(self, i=0):
+        """
+        Compact copy of player `i`
+        """
+        maze = self.mazes[i]
+        head = np.array([self.pos[i, 0], self.pos[i, 1], self.vel[i, 0], self.vel[i, 1],
+                         self.rotation[i], self.battery[i], self.reward[i], self.score[i]])
+        data = b''.join([
+            head.tobytes(),
+            np.array([self.game_over[i]], dtype=np.uint8).tobytes(),
+            np.packbits(self.visited[i, :maze.cols, :maze.rows]).tobytes(),
+            np.packbits(self.alive[self.slot[i], :maze.items_num]).tobytes(),
+            # Episode counters, see `episode_info`
+            self.episode_events[i].tobytes(),
+            np.array([self.goal_reached[i]], dtype=np.uint8).tobytes(),
+            np.array([self.goal_tick[i], self.events_logged[i]], dtype=np.int64).tobytes()
+        ])
+        if self.respawns or self.moving:
+            # Respawned and moving items have moved from the maze
+            data += np.array([self.respawn_next[self.slot[i]]], dtype=np.int64).tobytes()
+            data += self.item_pos[self.slot[i], :maze.items_num].tobytes()
+        if self.moving:
+            data += self.item_vel[self.slot[i], :maze.items_num].tobytes()
+        if self.log_capacity:
+            data += b''.join([self.event_tick[i].tobytes(), self.event_column[i].astype(np.int64).tobytes(),
+                              self.event_count[i].tobytes(), self.event_pos[i].tobytes()])
+        return Snapshot(maze, data)
+
+    def restore(self, snapshot, rows=None):
+        """
+        Load `snapshot` into `rows`, every player by default
+        """
+        if rows is None:
+            rows = self.index
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.intp))
+        maze = snapshot.maze
+        other = [i for i in rows if self.mazes[i] is not maze]
+        if other:
+            self.load(other, maze)
+
+        data = snapshot.data
+        offset = self.STATE_FLOATS * 8
+        head = np.frombuffer(data[:offset], dtype=np.float64)
+        self.pos[rows] = head[0:2]
+        self.vel[rows] = head[2:4]
+        self.rotation[rows] = head[4]
+        self.battery[rows] = head[5]
+        self.reward[rows] = head[6]
+        self.score[rows] = head[7]
+        self.game_over[rows] = data[offset:offset + 1] != b'\x00'
+        offset += 1
+
+        cells = maze.cols * maze.rows
+        size = (cells + 7) // 8
+        bits = np.unpackbits(np.frombuffer(data[offset:offset + size], dtype=np.uint8))
+        self.visited[rows] = False
+        self.visited[rows, :maze.cols, :maze.rows] = bits[:cells].reshape(maze.cols, maze.rows).astype(bool)
+        offset += size
+
+        k = maze.items_num
+        size = (k + 7) // 8
+        bits = np.unpackbits(np.frombuffer(data[offset:offset + size], dtype=np.uint8))
+        slots = self.slot[rows]
+        self.alive[slots] = False
+        self.alive[slots, :k] = bits[:k].astype(bool)
+        offset += size
+
+        size = self.episode_events.shape[1] * 8
+        self.episode_events[rows] = np.frombuffer(data[offset:offset + size], dtype=np.float64)
+        offset += size
+        self.goal_reached[rows] = data[offset:offset + 1] != b'\x00'
+        offset += 1
+        self.goal_tick[rows], self.events_logged[rows] = np.frombuffer(data[offset:offset + 16], dtype=np.int64)
+        offset += 16
+
+        if self.respawns or self.moving:
+            self.respawn_next[slots] = np.frombuffer(data[offset:offset + 8], dtype=np.int64)[0]
+            offset += 8
+            self.item_pos[slots, :k] = np.frombuffer(data[offset:offset + k * 16], dtype=np.float64).reshape(k, 2)
+            offset += k * 16
+            if self.moving:
+                self.item_vel[slots, :k] = np.frombuffer(data[offset:offset + k * 16], dtype=np.float64).reshape(k, 2)
+                offset += k * 16
+            self.items_moved[slots] = True
+            self.bucket_items(slots)
+            self.cached[rows] = False
+
+        if self.log_capacity:
+            size = self.log_capacity * 8
+            self.event_tick[rows] = np.frombuffer(data[offset:offset + size], dtype=np.int64)
+            offset += size
+            self.event_column[rows] = np.frombuffer(data[offset:offset + size], dtype=np.int64)
+            offset += size
+            self.event_count[rows] = np.frombuffer(data[offset:offset + size], dtype=np.float64)
+            offset += size
+            self.event_pos[rows] = np.frombuffer(data[offset:offset + size * 2], dtype=np.float64).reshape(-1, 2)
+            offset += size * 2
+
+        self.bumped[rows] = False
+        ci = np.floor_divide(self.pos[rows, 0], self.tw).astype(np.intp)
+        cj = np.floor_divide(self.pos[rows, 1], self.th).astype(np.intp)
+        self.spawn_distance[rows] = self.spawn_field[rows, ci, cj]
+        self.sense()
@@ -1,29 +1,30 @@
 import logging
 logging.basicConfig()
 
-import math
-from random import randint
+import random
 
+import numpy as np
 import pyglet
 
 import cocos
 import cocos.euclid as eu
-import cocos.mapcolliders as mc
-import cocos.tiles as ti
-from cocos import draw
-
-import config
-from player import Player
-from generator import Generator
-from score import ScoreLayer
-from world_items import WorldItems
-from world_queries import WorldQueries
-from world_rewards import WorldRewards
+
+from . import config
+from .player import Player, SensorLines
+from .generator import Generator
+from .curriculum import Level
+from .score import ScoreLayer
+from .maze import build_maze
+from .simulation import Simulation
+from .world_items import WorldItems
+from .world_queries import WorldQueries
+from .world_rewards import WorldRewards
+from .world_tiles import WorldTiles
 
 import os
 script_dir = os.path.dirname(__file__)
 
-class WorldLayer(WorldItems, WorldQueries, WorldRewards, cocos.layer.Layer, mc.RectMapCollider):
+class WorldLayer(WorldItems, WorldQueries, WorldRewards, WorldTiles, cocos.layer.Layer):
 
     """
     WorldLayer
@@ -34,45 +35,71 @@ class WorldLayer(WorldItems, WorldQueries, WorldRewards, cocos.layer.Layer, mc.R
         Play: updates level state, by time and user input. Detection of
         end-of-level conditions.
         Level progression.
+        State: snapshots of `simulation.Simulation` for tree search.
     """
     is_event_handler = True
 
-    def __init__(self, mode_id = 0, fn_show_message=None):
+    def __init__(self, mode_id = 0, fn_show_message=None, cfg=None, curriculum=None, seed=None, level=None):
+        # Needed by mixins during `__init__`
+        self.cfg = cfg or config.default()
+
         super(WorldLayer, self).__init__()
 
         self.logger = logging.getLogger(__name__)
-        self.logger.setLevel(config.settings['log_level'])
+        self.logger.setLevel(self.cfg.settings['log_level'])
 
         self.mode_id = mode_id
-        self.mode = config.modes[self.mode_id]
-        self.force_fps = config.settings['world']['force_fps']
-
-        # Time it takes to travel half a square at full speed
-        self.consumed_dt = config.settings['player']['top_speed'] / min(config.tiles['th'], config.tiles['tw']) / 2
+        self.mode = config.get_mode(self.mode_id)
+        self.compile_rewards()
+        self.force_fps = self.cfg.settings['world']['force_fps']
 
         self.fn_show_message = fn_show_message
 
         self.z = 0
 
-        # basic geometry
-        world = config.settings['world']
+        # basic geometry, upper bounds when levels come from a curriculum
+        world = self.cfg.settings['world']
         self.width = world['width']  # world virtual width
         self.height = world['height']  # world virtual height
 
-        self.tiles_w = config.tiles['width']
-        self.tiles_h = config.tiles['height']
+        self.tiles_w = self.cfg.tiles['width']
+        self.tiles_h = self.cfg.tiles['height']
 
-        self.generator = Generator()
+        self.generator = Generator(self.cfg)
+        self.curriculum = curriculum
 
         self.bindings = world['bindings']
         buttons = {}
         for k in self.bindings:
             buttons[self.bindings[k]] = 0
         self.buttons = buttons
+        self.turn = np.zeros(1)
+        self.up = np.zeros(1)
 
-        self.on_bump_handler = self.on_bump_slide
+        # Kept across levels, each level loads its maze into them
+        self.sim = None
+        self.sensor_lines = None
+        # Batch simulations by size, snapshots carry their maze
+        self.rollouts = {}
 
         self.schedule(self.update)
+        self.restart(seed, level)
+
+    def restart(self, seed=None, level=None):
+        """
+        Begin again from the first level, keeping the simulation, tile maps
+        and item sprites of this layer. `seed` and `level` reproduce a level.
+        """
+        # Seeds maze, items and spawn of the first level, later levels follow on
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = None
+        # Fixed parameters for the first level, when replaying
+        self.next_level = level
+
+        for k in self.buttons:
+            self.buttons[k] = 0
         self.ladder_begin()
 
     def ladder_begin(self):
@@ -83,6 +110,9 @@ class WorldLayer(WorldItems, WorldQueries, WorldRewards, cocos.layer.Layer, mc.R
         self.level_launch()
 
     def level_launch(self):
+        if self.rng is not None:
+            self.seed = self.rng.getrandbits(32)
+        self.rng = random.Random(self.seed)
         self.generate_random_level()
         #msg = 'level %d' % self.level_num
         #self.fn_show_message(msg, callback=self.level_start)
@@ -115,7 +145,7 @@ class WorldLayer(WorldItems, WorldQueries, WorldRewards, cocos.layer.Layer, mc.R
         assert len(self.children) == 0
         self.player = None
         self.gate = None
-        self.to_remove = []
+        self.view_dirty = False
 
         self.win_status = 'intermission'  # | 'undecided' | 'conquered' | 'losed'
 
@@ -123,82 +153,71 @@ class WorldLayer(WorldItems, WorldQueries, WorldRewards, cocos.layer.Layer, mc.R
         #if self.player is Player:
         #    self.player.reset()
 
+    def sample_level(self):
+        """
+        Parameters for the next level, from the curriculum when scheduled
+        """
+        if self.next_level is not None:
+            level, self.next_level = self.next_level, None
+            return level
+
+        if self.curriculum is not None:
+            return self.curriculum.sample(self.mode)
+
+        return Level.default(self.cfg, self.mode)
+
     def generate_random_level(self):
         """
         Configure and add cocos layers
         """
+        # Level size within the `Config` bounds
+        self.level = self.sample_level()
+        self.tiles_w = self.level.width
+        self.tiles_h = self.level.height
+        self.width = self.cfg.tiles['tw'] * self.tiles_w
+        self.height = self.cfg.tiles['th'] * self.tiles_h
 
         # build !
-        width = self.width
-        height = self.height
-        tiles_w = self.tiles_w
-        tiles_h = self.tiles_h
         self.z = 0
 
-        # add walls
-        #self.map_layer = ti.load(os.path.join(script_dir, 'test.tmx'))['map0']
-        self.map_layer = self.generator.map(tiles_w, tiles_h)
-        self.map_layer.set_view(0, 0, self.map_layer.px_width, self.map_layer.px_height)
-        # FIXME: Both `scale_x` and `scale_y`
-        self.map_layer.scale = config.scale_x
-        self.add(self.map_layer, z=self.z)
-        self.z += 1
+        # Static maze shared by simulation state and snapshots
+        self.maze = build_maze(self.generator, self.cfg, self.mode, self.level, self.rng)
+        if self.sim is None:
+            self.sim = Simulation(self.maze, self.cfg, self.compiled_mode)
+        else:
+            self.sim.load([0], self.maze)
+        if self.generator.stats.get('doors') or self.generator.stats.get('rejected'):
+            self.logger.debug("Layout repaired: %s", self.generator.stats)
 
-        # add floor
-        # TODO: Move to `Generator.inverse(map)`
-        self.visit_layer = ti.load(os.path.join(script_dir, 'assets', 'ones.tmx'))['map0']
-        for i in xrange(0, len(self.map_layer.cells)):
-            for j in xrange(0, len(self.map_layer.cells[i])):
-                col = self.map_layer.cells[i][j]
-                # If wall exists, remove floor
-                if col.tile and col.tile.id > 0:
-                    self.visit_layer.cells[i][j].tile = None
-
-        self.visit_layer.set_view(0, 0, self.visit_layer.px_width, self.visit_layer.px_height)
-        # FIXME: Both `scale_x` and `scale_y`
-        self.visit_layer.scale = config.scale_x
-        self.add(self.visit_layer, z=-1)
+        # add walls and floor
+        self.create_tiles()
+        self.visited_shown = np.zeros(self.sim.visited.shape[1:], dtype=bool)
 
         # add player
-        # Start in random corner
-        corner = randint(0,3)
-        padding = eu.Vector2(self.map_layer.tw*1.5, self.map_layer.th*1.5)
-        corners = [
-            eu.Vector2(padding.x, padding.y), # Bottom left
-            eu.Vector2(((tiles_w+1)*self.map_layer.tw)-padding.x, padding.y), # Bottom right
-            eu.Vector2(padding.x, ((tiles_h+1)*self.map_layer.th)-padding.y), # Top right
-            eu.Vector2(((tiles_w+1)*self.map_layer.tw)-padding.x, ((tiles_h+1)*self.map_layer.th)-padding.y) # Top left
-        ]
-        rotations = [
-            45,
-            -45,
-            135,
-            -135
-        ]
-        self.spawn = corners[corner]
-        self.player = Player(self.spawn.x, self.spawn.y)
-        self.player.rotation = rotations[corner]
+        self.spawn = eu.Vector2(*self.maze.spawn)
+        self.player = Player(self.spawn.x, self.spawn.y, cfg=self.cfg)
+        self.player.rotation = self.maze.rotation
         self.add(self.player, z=self.z)
         self.z += 1
 
-        self.score = ScoreLayer(self.player.stats)
+        self.score = ScoreLayer(self.player.stats, cfg=self.cfg)
         self.add(self.score, z=self.z)
         self.z += 1
 
         # Draw sensors
         # TODO: Decouple into view rendering
-        a = math.radians(self.player.rotation)
-        for sensor in self.player.sensors:
-            rad = a + sensor.angle
-            start = self.player.cshape.center
-            end = start.copy()
-            end.x += math.sin(rad) * sensor.proximity;
-            end.y += math.cos(rad) * sensor.proximity;
-            sensor.line = draw.Line(start, end, self.player.palette['wall'] + (int(255*0.5),))
-            self.map_layer.add(sensor.line)
-
-        # Generate obstacles
+        palette = self.player.palette
+        alpha = (int(255*0.5),)
+        # Colour by `Simulation.sensed`, walls then item types
+        self.sensor_colors = np.array([palette['wall'] + alpha] +
+                                      [palette[t] + alpha for t in self.maze.item_types], dtype=np.uint8)
+        if self.sensor_lines is None:
+            self.sensor_lines = SensorLines(len(self.player.sensors))
+            self.map_layer.add(self.sensor_lines)
+
+        # Show obstacles
         self.create_items()
+        self.view_dirty = True
 
     def update(self, dt):
         """
@@ -212,227 +231,126 @@ class WorldLayer(WorldItems, WorldQueries, WorldRewards, cocos.layer.Layer, mc.R
         if self.force_fps > 0:
             dt = 1 / self.force_fps
 
-        # update target
-        self.player.update_rotation(dt, self.buttons)
-
-        # Get planned update
-        newVel = self.player.do_move(dt, self.buttons)
-
-        # Position collision rects
-        oldRect = self.player.get_rect()
-        newRect = oldRect.copy()
-
-        oldPos = self.player.cshape.center
-        remaining_dt = dt
-        newPos = oldPos.copy()
-
-        # So WorldLayer is given `bumped` attributes at startup.
-        if dt == 0:
-            newVel.x, newVel.y = self.collide_map(self.map_layer, oldRect, oldRect, newVel.x, newVel.y)
-
-        # Get planned velocity result
-        def get_new_rect(pos, width, height, dt, velocity):
-            targetPos = pos + dt * velocity
-            x = targetPos.x - width/2
-            y = targetPos.y - height/2
-            return x, y
-
-        while remaining_dt > 1.e-6:
-            #print('remaining_dt', remaining_dt)
-            newRect.x, newRect.y = get_new_rect(oldPos, newRect.width, newRect.height, remaining_dt, newVel)
-            newVel.x, newVel.y = self.collide_map(self.map_layer, oldRect, newRect, newVel.x, newVel.y)
-
-            remaining_dt -= self.consumed_dt
-
-        newRect.x, newRect.y = get_new_rect(oldPos, newRect.width, newRect.height, dt, newVel)
-
-        # Ensure player can't escape borders
-        border = False
-        if newRect.top > self.height:
-            newRect.top = self.height
-            border = True
-        if newRect.bottom < self.map_layer.th:
-            newRect.bottom = self.map_layer.th
-            border = True
-        if newRect.left < self.map_layer.th:
-            newRect.left = self.map_layer.th
-            border = True
-        if newRect.right > self.width:
-            newRect.right = self.width
-            border = True
-
-        newPos = self.player.cshape.center
-        newPos.x, newPos.y = newRect.center
-        self.player.velocity = newVel
-        self.player.update_center(newPos)
-
-        # Collision detected
-        if border or self.bumped_x or self.bumped_y:
-            #print('bumped')
-            self.reward_wall()
-
-        # In WorldLayer so we can access map
-        self.update_visited()
-        self.update_sensors()
+        self.turn[0] = self.buttons['right'] - self.buttons['left']
+        self.up[0] = self.buttons['up']
+        self.sim.step(self.turn, self.up, dt)
 
-        self.reward_battery()
-        self.reward_proximity()
+        self.report_rewards(self.sim)
 
         # TODO: Display messages for humans at some point
         #if self.player.game_over:
         #    self.level_losed()
 
-        self.update_collisions()
-
-        # update collman
-        #self.collman.clear()
-        #for z, node in self.children:
-        #    self.collman.add(node)
-
-        # interactions player - others
-        #for other in self.collman.iter_colliding(self.player):
-        #    print('collman', other)
-        #    typeball = other.btype
+        self.sync_player()
 
-        #    if typeball == 'food':
-        #        self.toRemove.add(other)
-        #        self.cnt_food -= 1
-        #        if not self.cnt_food:
-        #            self.open_gate()
-        #
-        #    elif (typeball == 'wall' or
-        #          typeball == 'gate' and self.cnt_food > 0):
-        #        self.level_losed()
-        #
-        #    elif typeball == 'gate':
-        #        self.level_conquered()
-
-
-
-        # at end of frame do removes; as collman is fully regenerated each frame
-        # theres no need to update it here.
-    #    for node in self.toRemove:
-    #        self.remove(node)
-    #    self.toRemove.clear()
+    def sync_player(self):
+        """
+        Mirror player stats from simulation state, the pose and the rest of
+        the view follow on the next drawn frame
+        """
+        sim = self.sim
+        player = self.player
+        player.game_over = bool(sim.game_over[0])
+        player.stats['battery'] = sim.battery[0]
+        player.stats['reward'] = sim.reward[0]
+        player.stats['score'] = sim.score[0]
+        self.view_dirty = True
+
+    def visit(self):
+        # Frames skipped by `render_interval` never reach here
+        if self.view_dirty:
+            self.sync_view()
+        super(WorldLayer, self).visit()
+
+    def sync_view(self):
+        """
+        Move player, visited tiles, sensor lines, items and score to simulation state
+        """
+        self.view_dirty = False
+        sim = self.sim
+        self.player.update_center(eu.Vector2(sim.pos[0, 0], sim.pos[0, 1]))
+        self.player.rotation = sim.rotation[0]
+        self.player.velocity = eu.Vector2(sim.vel[0, 0], sim.vel[0, 1])
+        self.update_visited()
+        self.update_sensors()
+        k = self.maze.items_num
+        self.sync_items(self.sim.alive[0, :k], self.sim.item_pos[0, :k])
+        self.score.update(0)
 
     def update_visited(self):
         """
-        Updates exploration map visited status
+        Shade tiles visited since last drawn
         """
-        assert isinstance(self.player.cshape.center, eu.Vector2)
-        pos = self.player.cshape.center
-
-        # Helper function
-        def set_visited(layer, cell):
-            if cell and not cell.properties.get('visited') and cell.tile and cell.tile.id > 0:
-                cell.properties['visited'] = True
-
-                self.reward_explore()
-
-                # TODO: Decouple into view rendering
-                # Change colour of visited cells
-                key = layer.get_key_at_pixel(cell.x, cell.y)
-                #layer.set_cell_color(key[0], key[1], [155,155,155])
-                layer.set_cell_opacity(key[0], key[1], 255*0.8)
-        # End Helper
-
-        # Get the current tile under player
-        current = self.visit_layer.get_at_pixel(pos.x, pos.y)
-
-        if current:
-            # In spawn square
-            if current == self.visit_layer.get_at_pixel(self.spawn.x, self.spawn.y):
-                self.reward_goal()
-
-            # Only record/reward exploration when battery is above 50%
-            #if self.player.stats['battery'] > 50:
-            set_visited(self.visit_layer, current)
-            neighbours = self.visit_layer.get_neighbors(current)
-            for cell in neighbours:
-                neighbour = neighbours[cell]
-                set_visited(self.visit_layer, neighbour)
+        visited = self.sim.visited[0]
+        # TODO: Decouple into view rendering
+        for i, j in np.argwhere(visited != self.visited_shown):
+            #self.visit_layer.set_cell_color(i, j, [155,155,155])
+            self.visit_layer.set_cell_opacity(i, j, 255*0.8 if visited[i, j] else 255)
+        self.visited_shown = visited.copy()
 
     def update_sensors(self):
         """
-        Check path for each sensor and record wall proximity
+        Redirect sensor lines to sensed ranges
+        """
+        sim = self.sim
+        types = self.maze.item_types
+        for i, sensor in enumerate(self.player.sensors):
+            sensor.proximity = sim.proximity[0, i]
+            kind = sim.sensed[0, i]
+            sensor.sensed_type = types[kind - 1] if kind > 0 else 'wall'
+
+        # `dis` is from center
+        rad = np.radians(sim.rotation[0]) + sim.angles
+        dis = sim.proximity[0] + self.player.radius
+        ends = sim.pos[0] + np.stack([np.sin(rad), np.cos(rad)], axis=1) * dis[:, None]
+        self.sensor_lines.update_lines(sim.pos[0], ends, self.sensor_colors[sim.sensed[0]])
+
+    def get_pose(self):
         """
-        assert isinstance(self.player.cshape.center, eu.Vector2)
-        pos = self.player.cshape.center
-
-        a = math.radians(self.player.rotation)
-        for sensor in self.player.sensors:
-            sensor.sensed_type = 'wall'
-            rad = a + sensor.angle
-            dis = min(self.distance_to_tile(pos, rad), sensor.max_range)
-
-            # Keep state of sensed range, `dis` is from center
-            sensor.proximity = dis - self.player.radius
-
-            # Check for collisions with items
-            # List of items within sensor range, do for each sensor's range
-            if self.mode['items'] and len(self.mode['items']) > 0:
-                nears = self.collman.ranked_objs_near(self.player, sensor.max_range)
-                for near in nears:
-                    other, other_dis = near
-                    # Distances are from edge to edge see #2
-                    other_dis += self.player.radius
-                    # Skip if further
-                    if other_dis > dis:
-                        continue
-
-                    # Determine if within `fov`
-                    other_rad = math.atan2(other.x - self.player.x, other.y - self.player.y)
-                    # Round to bearing within one revolution
-                    other_rad = other_rad % (math.pi*2)
-                    round_rad = rad % (math.pi*2)
-                    if abs(other_rad - round_rad) < (sensor.fov/2):
-                        sensor.proximity = other_dis - self.player.radius
-                        sensor.sensed_type = other.btype
-                        dis = other_dis
-
-            # Redirect sensor lines
-            # TODO: Decouple into view rendering
-            end = pos.copy()
-            end.x += math.sin(rad) * dis
-            end.y += math.cos(rad) * dis
-            sensor.line.start = pos
-            sensor.line.end = end
-            sensor.line.color = self.player.palette[sensor.sensed_type] + (int(255*0.5),)
+        Player position and rotation, `(x, y, rotation)`, drawn or not
+        """
+        return self.sim.pos[0, 0], self.sim.pos[0, 1], self.sim.rotation[0]
 
-    def get_state(self):
+    def get_reward(self):
         """
-        Create state from sensors and battery
+        Return reward and reset for next step
         """
-        # Include battery level in state
-        battery = self.player.stats['battery']/100
-        # Create observation from sensor proximities
-        # TODO: Have state persist, then update columns by `sensed_type`
-
-        # Multi-channel; detecting `items`
-        if len(self.mode['items']) > 0:
-            observation = []
-            for sensor in self.player.sensors:
-                col = []
-                # Always include range in channel 0
-                col.append(sensor.proximity_norm())
-                for item_type in self.mode['items']:
-                    if sensor.sensed_type == item_type:
-                        col.append(sensor.proximity_norm())
-                    else:
-                        # Default to 1 (`max_range/max_range`)
-                        col.append(1)
-                observation.append(col)
-            if 'battery' in self.mode:
-                observation.append([battery,1,1])
-
-        # Single-channel; walls only
-        else:
-            observation = [o.proximity_norm() for o in self.player.sensors]
-            if 'battery' in self.mode:
-                observation.append(battery)
+        return float(self.sim.take_reward()[0])
 
+    def get_state(self):
+        """
+        Create state from sensors and battery, as lists of floats unless
+        `observation_dtype` quantises it, then an array in that dtype
+        """
+        observation = self.sim.observation('battery' in self.mode)[0]
+        if self.sim.observation_dtype == np.float64:
+            return observation.tolist()
         return observation
 
+    def get_snapshot(self):
+        """
+        Compact copy of the level state, see `simulation.Snapshot`
+        """
+        return self.sim.snapshot()
+
+    def restore(self, snapshot):
+        """
+        Return to a state from `get_snapshot` of this level
+        """
+        self.sim.restore(snapshot)
+        self.sync_player()
+
+    def rollout_batch(self, snapshot, action_sequences):
+        """
+        Simulate candidate futures from `snapshot` in one batch, the view is untouched
+        """
+        n = len(action_sequences)
+        sim = self.rollouts.get(n)
+        if sim is None:
+            sim = Simulation(self.maze, self.cfg, self.compiled_mode, n)
+            self.rollouts[n] = sim
+        return sim.rollout(snapshot, action_sequences, 'battery' in self.mode)
+
     #def open_gate(self):
     #    self.gate.color = Player.palette['gate']
 
@@ -1,12 +1,10 @@
-import random
+import numpy as np
 
 import cocos
-import cocos.collision_model as cm
+import cocos.batch
 import cocos.euclid as eu
 
-import config
-
-from collidable import Collidable
+from .collidable import Collidable
 
 class WorldItems(object):
     """
@@ -16,142 +14,53 @@ class WorldItems(object):
     Has context for game settings, map state and player state
 
     Responsabilities:
-        Add rewards to player in response to game events
+        Show items placed in the maze, hide those collected
+        Draw items as one batch, hidden in place rather than removed
+        Keep sprites from level to level, moving those of respawned and drifting items
     """
 
     def __init__(self):
         super(WorldItems, self).__init__()
 
-        player = config.settings['player']
-        world = config.settings['world']
-
-        self.pics = config.pics
-        self.to_remove = []
-
-        # TODO: Only create if needed by game `mode`
-        cell_size = player['radius'] * 0.25
-        self.collman = cm.CollisionManagerGrid(0.0, world['width'],
-                                               0.0, world['height'],
-                                               cell_size, cell_size)
+        self.pics = self.cfg.pics
+        # Sprites by item index in `maze.Maze`, kept from level to level
+        self.item_sprites = []
+        self.items_batch = cocos.batch.BatchNode()
+        self.items_shown = np.zeros(0, dtype=bool)
+        self.items_at = np.zeros((0, 2))
 
     def create_items(self):
         """
-        Create collidable items
-        """
-        if not self.mode['items'] or len(self.mode['items']) == 0: return
-
-        # FIXME: Check if already contains
-        self.collman.add(self.player)
-
-        for k in self.mode['items']:
-            item = self.mode['items'][k]
-            #{'terminal': False, 'num': 50, 'scale': 1.0, 'reward': 2.0}
-            radius = item['scale'] * self.player.radius
-            for i in range(item['num']):
-                self.add_item(radius, k)
-
-            # add gate
-            #rGate = gate_scale * rPlayer
-            #self.gate = Player(cx, cy, rGate, 'gate', pics['wall'])
-            #self.gate.color = Player.palette['wall']
-            #cntTrys = 0
-            #while cntTrys < 100:
-            #    cx = rGate + random.random() * (width - 2.0 * rGate)
-            #    cy = rGate + random.random() * (height - 2.0 * rGate)
-            #    self.gate.update_center(eu.Vector2(cx, cy))
-            #    if not self.collman.they_collide(self.player, self.gate):
-            #        break
-            #    cntTrys += 1
-            #self.add(self.gate, z=z)
-            #z += 1
-            #self.collman.add(self.gate)
-
-
-
-    def add_item(self, radius, item_type):
-        """
-        Add a single item in random open position
+        Show items placed by `maze.place_items`, reusing sprites of earlier levels
         """
-        assert isinstance(radius, int) or isinstance(radius, float)
-        assert isinstance(item_type, str)
-
-        separation_scale = 1.1
-        min_separation = separation_scale * radius
-
-        # Removable item
-        item = Collidable(0, 0, radius, item_type, self.pics[item_type], True)
-        cntTrys = 0
-        while cntTrys < 100:
-            cx = radius + random.random() * (self.width - 2.0 * radius)
-            cy = radius + random.random() * (self.height - 2.0 * radius)
-
-            # Test if colliding with wall.
-            # Top left
-            cells = []
-            cells.append(self.map_layer.get_at_pixel(cx-radius, cy-radius))
-            # Top right
-            cells.append(self.map_layer.get_at_pixel(cx+radius, cy-radius))
-            # Bottom  left
-            cells.append(self.map_layer.get_at_pixel(cx-radius, cy+radius))
-            # Bottom  right
-            cells.append(self.map_layer.get_at_pixel(cx+radius, cy+radius))
-
-            wall = False
-            for cell in cells:
-                wall = cell and cell.tile and cell.tile.id > 0
-                if wall:
-                    break
-
-            if wall:
+        self.add(self.items_batch, z=self.z)
+        self.z += 1
+
+        maze = self.maze
+        for k in range(maze.items_num):
+            item_type = maze.item_types[maze.item_kinds[k]]
+            cx, cy = maze.item_positions[k]
+            if k < len(self.item_sprites):
+                self.item_sprites[k].place(cx, cy, maze.item_radius[k], item_type, self.pics[item_type])
                 continue
+            # Removable item
+            item = Collidable(cx, cy, maze.item_radius[k], item_type, self.pics[item_type], True, cfg=self.cfg)
+            self.items_batch.add(item, z=k)
+            self.item_sprites.append(item)
 
-            item.update_center(eu.Vector2(cx, cy))
-            if self.collman.any_near(item, min_separation) is None:
-                self.add(item, z=self.z)
-                self.z += 1
-                self.collman.add(item)
-                break
-            cntTrys += 1
+        for k, item in enumerate(self.item_sprites):
+            item.visible = k < maze.items_num
+        self.items_shown = np.ones(maze.items_num, dtype=bool)
+        self.items_at = maze.item_positions.copy()
 
-    def update_collisions(self):
+    def sync_items(self, alive, positions):
         """
-        Test player for collisions with items
+        Show only sprites of items still `alive`, moving those which moved
         """
-        if not self.mode['items'] or len(self.mode['items']) == 0: return
-
-        # update collman
-        # FIXME: Why update each frame?
-        self.collman.clear()
-        for z, node in self.children:
-            if hasattr(node, 'cshape') and type(node.cshape) == cm.CircleShape:
-                self.collman.add(node)
-
-        # interactions player - others
-        for other in self.collman.iter_colliding(self.player):
-            typeball = other.btype
-            self.logger.debug('collision', typeball)
-
-            # TODO: Limit player position on non-removable items
-            #if not other.removable:
-            #    pass
-
-            if other.removable:
-                self.to_remove.append(other)
-
-            self.reward_item(typeball)
-
-        #
-        #    elif (typeball == 'wall' or
-        #          typeball == 'gate' and self.cnt_food > 0):
-        #        self.level_losed()
-        #
-        #    elif typeball == 'gate':
-        #        self.level_conquered()
-
-        self.remove_items()
+        for k in np.flatnonzero((positions != self.items_at).any(axis=1)):
+            self.item_sprites[k].update_center(eu.Vector2(positions[k, 0], positions[k, 1]))
+        self.items_at[:] = positions
 
-    def remove_items(self):
-        # at end of frame do removes; as collman is fully regenerated each frame
-        # theres no need to update it here.
-        while len(self.to_remove) > 0:
-            self.remove(self.to_remove.pop())
+        for k in np.flatnonzero(alive != self.items_shown):
+            self.item_sprites[k].visible = bool(alive[k])
+        self.items_shown[:] = alive
@@ -1,117 +1,165 @@
-class WorldRewards(object):
+import numpy as np
+
+# Event columns, item types follow in mode order
+EVENT_BATTERY = 0
+EVENT_WALL = 1
+EVENT_EXPLORE = 2
+EVENT_GOAL = 3
+# Tiles closer to spawn, negative when moving away
+EVENT_APPROACH = 4
+EVENTS = ['battery', 'wall', 'explore', 'goal', 'approach']
+
+class RewardTerm(object):
     """
-    WorldRewards
+    RewardTerm
 
-    Methods inherited by WorldLayer
-    Has context for game settings, map state and player state
+    A single reward rule of a game mode with its constants resolved
+    """
+    __slots__ = ('name', 'column', 'reward', 'terminal', 'score', 'cond')
 
-    Responsabilities:
-        Add rewards to player in response to game events
+    def __init__(self, name, column, reward, terminal=False, score=False, cond=None):
+        self.name = name
+        self.column = column
+        self.reward = float(reward)
+        self.terminal = bool(terminal)
+        self.score = bool(score)
+        self.cond = cond
+
+class CompiledMode(object):
     """
+    CompiledMode
 
-    def __init__(self):
-        super(WorldRewards, self).__init__()
+    Game mode flattened into active reward terms
 
-    # Reward functions implementing game modes
-    def reward_battery(self):
+    Responsabilities:
+        Evaluate rewards, score and terminal state over batched event counts
+    """
+
+    def __init__(self, mode):
+        self.columns = dict((name, i) for i, name in enumerate(EVENTS))
+        self.item_types = list(mode.get('items') or {})
+        for item_type in self.item_types:
+            self.columns[item_type] = len(self.columns)
+        self.events_num = len(self.columns)
+        # Item types placed again once taken
+        self.respawn = np.array([bool(mode['items'][t].get('respawn')) for t in self.item_types], dtype=bool)
+        # Item types drifting around the maze, pixels per second
+        self.speed = np.array([mode['items'][t].get('speed', 0.0) for t in self.item_types], dtype=np.float64)
+
+        # `battery` and `wall` always apply, others need a non-zero reward
+        self.terms = []
+        for name, score, needs_reward in [('battery', False, False),
+                                          ('wall', False, False),
+                                          ('explore', True, True),
+                                          ('goal', True, True),
+                                          ('approach', False, True)]:
+            rule = mode.get(name)
+            if rule and (rule['reward'] or not needs_reward):
+                self.add_term(name, rule, score)
+        for item_type, rule in (mode.get('items') or {}).items():
+            if rule:
+                self.add_term(item_type, rule, True)
+
+        self.index = np.array([t.column for t in self.terms], dtype=np.intp)
+        self.weights = np.array([t.reward for t in self.terms], dtype=np.float64)
+        self.terminal = np.array([t.terminal for t in self.terms], dtype=bool)
+        self.score = np.array([t.score for t in self.terms], dtype=bool)
+        self.conds = [(i, t.cond) for i, t in enumerate(self.terms) if t.cond]
+        self.term_index = dict((t.name, i) for i, t in enumerate(self.terms))
+
+        # Proximity is a continuous term over sensor readings
+        self.proximity = None
+        rule = mode.get('proximity')
+        if rule:
+            self.proximity = RewardTerm('proximity', None, rule['reward'], cond=rule.get('cond'))
+
+    def add_term(self, name, rule, score):
+        self.terms.append(RewardTerm(name, self.columns[name], rule['reward'],
+                                     rule.get('terminal', False), score, rule.get('cond')))
+
+    def evaluate(self, events, state):
         """
-        Add a battery level reward
+        Returns `(reward, score, terminal, fired)` for `events` of shape (n, events_num).
+        `state` maps names used by conditions (`battery`, ...) to scalars or (n,) arrays.
         """
-        if not 'battery' in self.mode:
-            return
-        mode = self.mode['battery']
-        if mode and mode and self.__test_cond(mode):
-            self.logger.debug('Battery out')
-            self.player.stats['reward'] += mode['reward']
+        counts = events[:, self.index]
+        if self.conds:
+            active = np.ones(counts.shape, dtype=bool)
+            for i, cond in self.conds:
+                active[:, i] = cond(state)
+            counts = counts * active
+
+        gained = counts * self.weights
+        reward = gained.sum(axis=1)
+        score = gained[:, self.score].sum(axis=1)
+        terminal = ((counts > 0) & self.terminal).any(axis=1)
+
+        if self.proximity is not None:
+            reward = reward + self.evaluate_proximity(state)
 
-            self.player.game_over = self.player.game_over or mode['terminal']
+        return reward, score, terminal, counts
 
-    def reward_item(self, item_type):
+    def evaluate_proximity(self, state):
         """
-        Add a food collision reward
+        Wall proximity reward from normalised readings of shape (n, sensors)
         """
-        assert isinstance(item_type, str)
+        term = self.proximity
+        reward = np.minimum(1.0, state['proximity'].mean(axis=1) ** 2)
+        if term.cond is None:
+            return reward * term.reward
+        return np.where(term.cond(state), reward * term.reward, reward)
 
-        if not 'items' in self.mode:
-            return
-        mode = self.mode['items']
-        if mode and mode[item_type] and self.__test_cond(mode[item_type]):
-            self.logger.debug("{item_type} consumed".format(item_type=item_type))
-            self.player.stats['reward'] += mode[item_type]['reward']
-            self.player.stats['score'] += mode[item_type]['reward']
+# Compiled modes by definition content hash, for the process. A
+# `CompiledMode` is never changed once built, so simulations share it.
+_compiled = {}
 
-            self.player.game_over = self.player.game_over or mode[item_type]['terminal']
+def compile_mode(mode):
+    """
+    Compile a game mode into reward terms, shared between layers when the
+    mode was loaded from a definition
+    """
+    digest = mode.get('digest')
+    if digest is None:
+        return CompiledMode(mode)
+    if digest not in _compiled:
+        _compiled[digest] = CompiledMode(mode)
+    return _compiled[digest]
 
-    def reward_wall(self):
-        """
-        Add a wall collision reward
-        """
-        if not 'wall' in self.mode:
-            return
-        mode = self.mode['wall']
-        if mode and mode and self.__test_cond(mode):
-            self.logger.debug("Wall {x}/{y}'".format(x=self.bumped_x, y=self.bumped_y))
-            self.player.stats['reward'] += mode['reward']
+class WorldRewards(object):
+    """
+    WorldRewards
 
-            self.player.game_over = self.player.game_over or mode['terminal']
+    Methods inherited by WorldLayer
+    Has context for game settings, map state and player state
 
-    def reward_explore(self):
-        """
-        Add an exploration reward
-        """
-        if not 'explore' in self.mode:
-            return
-        mode = self.mode['explore']
-        if mode and mode['reward'] and self.__test_cond(mode):
-            self.player.stats['reward'] += mode['reward']
-            self.player.stats['score'] += mode['reward']
+    Responsabilities:
+        Compile game mode rewards, events are counted by `simulation.Simulation`
+        Log events as text when `log_events` is set
+    """
 
-            self.player.game_over = self.player.game_over or mode['terminal']
+    def __init__(self):
+        super(WorldRewards, self).__init__()
 
-    def reward_goal(self):
+    def compile_rewards(self):
         """
-        Add an end goal reward
+        Compile game mode once, shared by every simulation of this layer
         """
-        if not 'goal' in self.mode:
-            return
-        mode = self.mode['goal']
-        if mode and mode['reward'] and self.__test_cond(mode):
-            if mode['reward'] > 0:
-                self.logger.info("Escaped!!")
-            self.player.stats['reward'] += mode['reward']
-            self.player.stats['score'] += mode['reward']
-
-            self.player.game_over = self.player.game_over or mode['terminal']
+        self.compiled_mode = compile_mode(self.mode)
 
-    def reward_proximity(self):
+    def report_rewards(self, sim, i=0):
         """
-        Add a wall proximity reward
+        Log events of player `i` this tick, only when `log_events` is set,
+        counters are kept by `Simulation.episode_info` either way
         """
-        if not 'proximity' in self.mode:
+        if not self.cfg.settings['world'].get('log_events'):
             return
-        mode = self.mode['proximity']
-
-        # Calculate proximity reward
-        reward = 0
-        for sensor in self.player.sensors:
-            if sensor.sensed_type == 'wall':
-                reward += sensor.proximity_norm()
-            else:
-                reward += 1
-
-        reward /= len(self.player.sensors)
-        #reward = min(1.0, reward * 2)
-        reward = min(1.0, reward * reward)
-        # TODO: Configurable bonus reward threshold. Pass extra args to `__test_cond`?
-        #if mode and mode and reward > 0.75 and self.__test_cond(mode):
-        if mode and mode and self.__test_cond(mode):
-            # Apply bonus
-            reward *= mode['reward']
-
-        self.player.stats['reward'] += reward
-
-    def __test_cond(self, mode):
-        try:
-            return mode['cond'](self)
-        except KeyError:
-            return True
+
+        # Goal counts each tick at spawn, it is reported once rewarded
+        for column in np.flatnonzero(sim.events[i] > 0):
+            if column not in (EVENT_BATTERY, EVENT_GOAL, EVENT_APPROACH):
+                self.logger.info("%s x%d at (%.0f, %.0f)", sim.event_names[column], sim.events[i, column],
+                                 sim.pos[i, 0], sim.pos[i, 1])
+
+        goal = self.compiled_mode.term_index.get('goal')
+        if goal is not None and sim.fired[i, goal] and self.compiled_mode.weights[goal] > 0:
+            self.logger.info("Escaped!!")
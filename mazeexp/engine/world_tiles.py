@@ -0,0 +1,114 @@
+import numpy as np
+
+import cocos.tiles as ti
+
+import os
+script_dir = os.path.dirname(__file__)
+
+def wall_layer(walls):
+    """
+    Tile layer showing `walls` from `Generator.grid`
+    """
+    width, height = walls.shape[0]-1, walls.shape[1]-1
+
+    template = ti.load(os.path.join(script_dir, 'assets', 'template.tmx'))['map0']
+    #template.set_view(0, 0, template.px_width, template.px_height)
+    template.set_view(0, 0, width*template.tw, height*template.th)
+
+    # TODO: Save the generated map.
+    #epoch = int(time.time())
+    #filename = 'map_' + str(epoch) + '.tmx'
+
+    wall = template.cells[0][0].tile
+    for x, y in np.argwhere(walls):
+        template.cells[x][y].tile = wall
+
+    return template
+
+def refresh_cells(layer, cells):
+    """
+    Rebuild the sprites of `cells` of `layer` after their tile or colour
+    changed, `MapLayer.set_dirty` would rebuild every sprite
+    """
+    for cell in cells:
+        sprite = layer._sprites.pop(cell.origin[:2], None)
+        if sprite is not None:
+            sprite.delete()
+    layer._update_sprite_set()
+
+class WorldTiles(object):
+    """
+    WorldTiles
+
+    Methods inherited by WorldLayer
+    Has context for game settings, map state and player state
+
+    Responsabilities:
+        Show walls and floor of the maze as tile layers, the only part of
+        level generation needing cocos
+        Parse the tile maps once, rewriting only the cells a level changes
+    """
+
+    def __init__(self):
+        super(WorldTiles, self).__init__()
+        self.map_layer = None
+        self.visit_layer = None
+
+    def load_tiles(self):
+        """
+        Parse the wall and floor tile maps, walls are drawn over the template
+        """
+        self.map_layer = ti.load(os.path.join(script_dir, 'assets', 'template.tmx'))['map0']
+        self.visit_layer = ti.load(os.path.join(script_dir, 'assets', 'ones.tmx'))['map0']
+
+        self.wall_tile = self.map_layer.cells[0][0].tile
+        self.template_tiles = [[cell.tile for cell in column] for column in self.map_layer.cells]
+        self.floor_tiles = [[cell.tile for cell in column] for column in self.visit_layer.cells]
+        self.walls_shown = np.zeros((len(self.template_tiles), len(self.template_tiles[0])), dtype=bool)
+        self.visited_shown = np.zeros_like(self.walls_shown)
+        self.update_floor(np.ndindex(*self.walls_shown.shape))
+
+        for layer in (self.map_layer, self.visit_layer):
+            layer.set_view(0, 0, layer.px_width, layer.px_height)
+            # FIXME: Both `scale_x` and `scale_y`
+            layer.scale = self.cfg.scale_x
+
+    def update_floor(self, cells):
+        """
+        Remove the floor of `cells` under a wall, restore it elsewhere
+        """
+        for i, j in cells:
+            tile = self.map_layer.cells[i][j].tile
+            # If wall exists, remove floor
+            self.visit_layer.cells[i][j].tile = None if tile and tile.id > 0 else self.floor_tiles[i][j]
+
+    def create_tiles(self):
+        """
+        Add walls and the floor shaded by `update_visited`
+        """
+        if self.map_layer is None:
+            self.load_tiles()
+
+        # Clear the shading of the last level
+        shaded = [self.visit_layer.cells[i][j] for i, j in np.argwhere(self.visited_shown)]
+        for cell in shaded:
+            cell.properties.pop('color4', None)
+
+        # add walls
+        walls = np.zeros_like(self.walls_shown)
+        cols = min(walls.shape[0], self.maze.walls.shape[0])
+        rows = min(walls.shape[1], self.maze.walls.shape[1])
+        walls[:cols, :rows] = self.maze.walls[:cols, :rows]
+        changed = np.argwhere(walls != self.walls_shown)
+        for i, j in changed:
+            self.map_layer.cells[i][j].tile = self.wall_tile if walls[i, j] else self.template_tiles[i][j]
+        self.walls_shown = walls
+
+        # add floor
+        self.update_floor(changed)
+        refresh_cells(self.map_layer, [self.map_layer.cells[i][j] for i, j in changed])
+        refresh_cells(self.visit_layer, shaded + [self.visit_layer.cells[i][j] for i, j in changed])
+
+        self.add(self.map_layer, z=self.z)
+        self.z += 1
+        self.add(self.visit_layer, z=-1)
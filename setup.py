@@ -9,7 +9,7 @@ setup(name='mazeexp',
     packages=find_packages(),
     url='https://github.com/mryellow/maze_explorer',
     license='MIT',
-    install_requires=['cocos2d', 'pyglet'],
+    install_requires=['cocos2d', 'numpy', 'pyglet'],
     include_package_data=True,
     keywords='maze, game, maze-explorer, openaigym, openai-gym',
     classifiers=[
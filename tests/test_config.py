@@ -0,0 +1,42 @@
+import copy
+import pickle
+
+import pytest
+
+from mazeexp.engine import config
+
+def make_config():
+    return config.Config(tiles={'width': 12, 'height': 14},
+                         settings={'player': {'sensors': {'angles': [0.0, 0.5]}}})
+
+def assert_frozen(settings):
+    assert isinstance(settings, config.FrozenDict)
+    assert isinstance(settings['player']['sensors'], config.FrozenDict)
+    with pytest.raises(TypeError):
+        settings['log_level'] = 0
+    with pytest.raises(TypeError):
+        settings['player']['sensors']['num'] = 1
+
+def test_settings_pickle_round_trip():
+    cfg = make_config()
+    for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+        settings = pickle.loads(pickle.dumps(cfg.settings, protocol))
+        assert settings == cfg.settings
+        assert_frozen(settings)
+
+def test_settings_copies():
+    cfg = make_config()
+    for settings in (copy.deepcopy(cfg.settings), copy.copy(cfg.settings)):
+        assert settings == cfg.settings
+        assert_frozen(settings)
+
+def test_config_pickles_without_pics():
+    cfg = make_config()
+    state = pickle.dumps(cfg)
+    assert b'pics' not in state
+
+    other = pickle.loads(state)
+    assert other.tiles == cfg.tiles
+    assert other.settings == cfg.settings
+    assert (other.scale_x, other.scale_y) == (cfg.scale_x, cfg.scale_y)
+    assert_frozen(other.settings)
@@ -0,0 +1,54 @@
+import pytest
+
+from mazeexp.engine import config
+from mazeexp.engine.curriculum import Curriculum
+from mazeexp.engine.runner import ThreadPoolMazeRunner
+
+STAGES = [
+    {'width': (8, 12), 'height': 10, 'min_size': (2, 3), 'items': {'food': (0, 4)}},
+    {'items': {'food': 1}}
+]
+
+def test_levels_sample_within_each_stage():
+    cfg = config.default()
+    mode = config.get_mode(0)
+    curriculum = Curriculum(STAGES, cfg, seed=1)
+    levels = [curriculum.sample(mode) for _ in range(200)]
+    assert set(level.width for level in levels) == set(range(8, 13))
+    assert set(level.height for level in levels) == {10}
+    assert set(level.min_size for level in levels) == {2, 3}
+    assert set(level.items['food'] for level in levels) == set(range(5))
+    # Missing entries fall back to the mode and `Config`
+    assert set(level.items['poison'] for level in levels) == {mode['items']['poison']['num']}
+
+    curriculum.set_stage(1)
+    level = curriculum.sample(mode)
+    assert (level.width, level.height) == (cfg.tiles['width'], cfg.tiles['height'])
+    assert level.items['food'] == 1
+
+def test_stages_move_on_success_rate():
+    curriculum = Curriculum(STAGES, config.default(), window=4, promote=0.75, demote=0.25)
+    for success in (True, True, False):
+        curriculum.record(success)
+    assert curriculum.stage == 0
+    curriculum.record(True)
+    assert curriculum.stage == 1 and not curriculum.results
+    for _ in range(4):
+        curriculum.record(False)
+    assert curriculum.stage == 0
+
+def test_stages_fit_config_tiles():
+    cfg = config.default()
+    with pytest.raises(ValueError):
+        Curriculum([{'width': (8, cfg.tiles['width'] + 1)}], cfg)
+    with pytest.raises(ValueError):
+        Curriculum([{'min_size': 0}], cfg)
+
+def test_runner_levels_follow_the_curriculum():
+    cfg = config.default()
+    runner = ThreadPoolMazeRunner(8, curriculum=Curriculum(STAGES, cfg, seed=2), seed=2)
+    mazes = runner.shards[0].sim.mazes
+    assert all(8 <= maze.cols - 1 <= 12 and maze.rows - 1 == 10 for maze in mazes)
+    assert all((maze.item_kinds == maze.item_types.index('food')).sum() <= 4 for maze in mazes)
+    assert len(set(maze.cols for maze in mazes)) > 1
+    runner.close()
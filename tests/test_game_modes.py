@@ -0,0 +1,48 @@
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from mazeexp.engine import config, game_modes
+from mazeexp.engine.world_rewards import compile_mode
+
+def definition(items):
+    return OrderedDict([
+        ('name', 'Test'),
+        ('battery', {'cond': 'battery <= 0', 'reward': -1.0, 'terminal': True}),
+        ('items', OrderedDict((t, {'num': 2, 'reward': r}) for t, r in items))
+    ])
+
+def test_loaded_modes_pass_through():
+    for mode in config.modes:
+        assert config.get_mode(mode) is mode
+        assert game_modes.load_mode(mode) is mode
+
+def test_mappings_cached_by_content():
+    mode = game_modes.load_mode(definition([('food', 1), ('poison', -1)]))
+    assert game_modes.load_mode(definition([('food', 1.0), ('poison', -1.0)])) is mode
+    assert list(mode['items']) == ['food', 'poison']
+    assert mode['battery']['cond']({'battery': np.array([0.0, 5.0])}).tolist() == [True, False]
+
+def test_item_order_is_kept():
+    mode = game_modes.load_mode(definition([('food', 1), ('poison', -1)]))
+    swapped = game_modes.load_mode(definition([('poison', -1), ('food', 1)]))
+    assert swapped['digest'] != mode['digest']
+    assert list(swapped['items']) == ['poison', 'food']
+    assert compile_mode(swapped).item_types == ['poison', 'food']
+
+def test_files_and_cache_dir(tmpdir):
+    path = str(tmpdir.join('mode.json'))
+    with open(path, 'w') as f:
+        json.dump(definition([('food', 1)]), f)
+    mode = game_modes.load_mode(path, cache_dir=str(tmpdir))
+    assert game_modes.load_mode(path) is mode
+    assert os.path.exists(str(tmpdir.join(mode['digest'] + '.json')))
+
+def test_invalid_definitions():
+    with pytest.raises(game_modes.ModeError):
+        game_modes.load_mode({'items': {'food': {'reward': 'lots'}}})
+    with pytest.raises(game_modes.ModeError):
+        game_modes.load_mode({'battery': {'reward': 1, 'cond': 'charge > 5'}})
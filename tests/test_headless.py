@@ -0,0 +1,60 @@
+import os
+import sys
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports of cocos and pyglet fail as if they were not installed
+WITHOUT_GUI = '''
+import sys
+for name in ('cocos', 'pyglet'):
+    sys.modules[name] = None
+'''
+
+def run_without_gui(code):
+    subprocess.check_call([sys.executable, '-c', WITHOUT_GUI + code], cwd=ROOT)
+
+def test_core_imports_without_cocos_or_pyglet():
+    run_without_gui('''
+import numpy as np
+import mazeexp
+from mazeexp.engine import config, multiagent, oracle, runner
+if sys.version_info >= (3, 5):
+    from mazeexp.engine import server
+
+env = runner.ThreadPoolMazeRunner(4, threads=2, seed=1)
+env.reset()
+observations, rewards, terminals = env.step(np.zeros(4, dtype=np.intp))
+assert observations.shape[0] == 4
+env.close()
+
+agents = multiagent.MultiAgentMaze(2, mode_id=1, seed=1)
+agents.reset()
+agents.step(np.zeros(2, dtype=np.intp))
+''')
+
+def test_package_without_gui_fails_only_on_use():
+    run_without_gui('''
+import mazeexp
+try:
+    mazeexp.MazeExplorer
+except ImportError:
+    pass
+else:
+    raise AssertionError('MazeExplorer imported without cocos')
+''')
+
+def test_replay_without_cocos_or_pyglet():
+    run_without_gui('''
+from mazeexp.engine.oracle import DemoGenerator
+from mazeexp.engine.replay import Replayer
+
+demos = DemoGenerator(0, batch=2, max_steps=200)
+replayer = Replayer(0)
+for seed, meta, records in demos.episodes([5, 6]):
+    assert not replayer.episode(seed, meta, records).diverged
+    rewards = records['reward'].copy()
+    rewards[50] += 1
+    result = replayer.run(seed, records['action'], rewards=rewards)
+    assert result.diverged_at == 50
+''')
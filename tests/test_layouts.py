@@ -0,0 +1,73 @@
+import random
+
+import numpy as np
+import pytest
+
+from mazeexp.engine import config
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.layouts import ALGORITHMS, LAYOUTS, label_regions, region_sizes
+
+# Down to lattices of a single cell
+SIZES = [(w, h, m) for w in (4, 5, 7) for h in (4, 5, 8) for m in (1, 2, 3, 5, 9)]
+SIZES += [(20, 20, m) for m in (11, 15, 20)]
+
+def assert_playable(walls, width, height):
+    assert walls.shape == (width + 1, height + 1)
+    corners = ([1, width - 1, 1, width - 1], [1, 1, height - 1, height - 1])
+    assert not walls[corners].any()
+    assert len(region_sizes(label_regions(walls))) == 1
+
+@pytest.mark.parametrize('name', sorted(LAYOUTS))
+def test_layouts_connected(name):
+    for width, height, min_size in SIZES:
+        for seed in range(3):
+            walls = LAYOUTS[name](width, height, min_size, random.Random(seed))
+            assert_playable(walls, width, height)
+
+@pytest.mark.parametrize('algorithm', ALGORITHMS)
+def test_generator_connected(algorithm):
+    generator = Generator(config.default())
+    for width, height, min_size in SIZES:
+        walls = generator.grid(width, height, min_size, random.Random(1), algorithm)
+        assert_playable(walls, width, height)
+
+def split_grid():
+    # Two halves either side of a full wall, a spawn corner walled in
+    walls = np.zeros((9, 9), dtype=bool)
+    walls[[0, -1], :] = True
+    walls[:, [0, -1]] = True
+    walls[4, :] = True
+    walls[1, 1] = True
+    return walls
+
+def test_connect_opens_spawns_and_one_door_per_seam():
+    generator = Generator(config.default())
+    generator.rng = random.Random(0)
+    walls = split_grid()
+    stats = generator.connect(walls)
+    assert stats == {'floor': 42, 'reachable': 0.5, 'regions': 1, 'doors': 2}
+    assert not walls[1, 1] and (~walls[4, 1:-1]).sum() == 1
+    assert_playable(walls, 8, 8)
+
+    walls = split_grid()
+    stats = generator.connect(walls, repair=False)
+    assert stats == {'floor': 41, 'reachable': 21.0 / 41, 'regions': 3, 'doors': 0}
+    assert np.array_equal(walls, split_grid())
+
+def test_connectivity_settings():
+    cfg = config.Config(settings={'generator': {'connectivity': None}})
+    generator = Generator(cfg)
+    generator.grid(20, 20, 1, random.Random(0))
+    assert generator.stats == {}
+
+    # Sealed pockets are common with rooms a tile across
+    repaired = Generator(config.default())
+    rejected = Generator(config.Config(settings={'generator': {'connectivity': 'reject'}}))
+    doors = 0
+    for seed in range(5):
+        assert_playable(repaired.grid(20, 20, 1, random.Random(seed)), 20, 20)
+        assert repaired.stats['regions'] == 1
+        doors += repaired.stats['doors']
+        assert_playable(rejected.grid(20, 20, 3, random.Random(seed)), 20, 20)
+        assert rejected.stats['doors'] == 0
+    assert doors > 0
@@ -0,0 +1,56 @@
+import random
+
+import numpy as np
+
+from mazeexp.engine import config
+from mazeexp.engine.curriculum import Level
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.maze import build_maze
+from mazeexp.engine.simulation import Simulation
+from mazeexp.engine.world_rewards import EVENT_APPROACH, compile_mode
+
+def make_maze(cfg, mode, seed):
+    return build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(seed))
+
+def test_distance_field_counts_steps_from_spawn():
+    cfg = config.default()
+    mode = config.get_mode(0)
+    maze = make_maze(cfg, mode, 1)
+    field = maze.distance_field()
+    assert maze.distance_field() is field
+    assert field[maze.spawn_cell] == 0
+    assert (field[maze.walls] == -1).all()
+    assert (field[~maze.walls] >= 0).any()
+
+    # Reached tiles are one step from a tile one nearer, neighbours at most one apart
+    padded = np.pad(field, 1, mode='constant', constant_values=-1)
+    sides = [padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]]
+    reached = field > 0
+    assert np.logical_or.reduce([side == field - 1 for side in sides])[reached].all()
+    for side in sides:
+        both = (field >= 0) & (side >= 0)
+        assert (np.abs(field - side)[both] <= 1).all()
+
+    i, j = maze.spawn_cell
+    assert maze.distance_at_pixel((i + 0.5) * maze.tw, (j + 0.5) * maze.th) == 0
+    assert maze.distance_at_pixel(-1, -1) == -1
+
+def test_approach_events_add_up_to_tiles_gained():
+    cfg = config.default()
+    mode = config.get_mode(0)
+    sim = Simulation(make_maze(cfg, mode, 2), cfg, compile_mode(mode))
+    field = sim.spawn_field[0]
+    assert sim.spawn_distance[0] == 0
+
+    rng = np.random.RandomState(0)
+    total = 0.0
+    visited = set()
+    for _ in range(300):
+        sim.step_actions(rng.choice(5, size=1, p=[0.5, 0.1, 0.15, 0.1, 0.15]))
+        total += sim.events[0, EVENT_APPROACH]
+        ci, cj = (sim.pos[0] // (sim.tw, sim.th)).astype(int)
+        assert sim.spawn_distance[0] == field[ci, cj]
+        visited.add(sim.spawn_distance[0])
+        # Telescopes to the tiles gained since spawn
+        assert total == -sim.spawn_distance[0]
+    assert len(visited) > 1
@@ -0,0 +1,45 @@
+import random
+
+import numpy as np
+
+from mazeexp.engine import config
+from mazeexp.engine.curriculum import Level
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.maze import build_maze
+from mazeexp.engine.metrics import EpisodeMetrics
+from mazeexp.engine.runner import ThreadPoolMazeRunner
+from mazeexp.engine.simulation import Simulation
+from mazeexp.engine.world_rewards import compile_mode
+
+def test_episodes_flag_truncation():
+    cfg = config.default()
+    mode = config.get_mode(1)
+    maze = build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(1))
+    sim = Simulation(maze, cfg, compile_mode(mode), 4)
+    for t in range(10):
+        sim.step_actions(np.full(4, 2, dtype=np.intp), mask=np.arange(4) < 3)
+    sim.game_over[0] = True
+    sim.goal_reached[1] = True
+
+    metrics = EpisodeMetrics()
+    metrics.record(sim, sim.index, mode)
+    # The last row never stepped
+    assert metrics.episodes == 3
+    stats = metrics.snapshot()[mode['name']]
+    assert stats['truncated']['mean'] == 1 / 3.0
+    assert stats['goal']['mean'] == 1 / 3.0
+
+def test_runner_records_eat_episodes_on_reset():
+    env = ThreadPoolMazeRunner(8, threads=2, mode_id=0, seed=1)
+    env.reset()
+    rng = np.random.RandomState(0)
+    for t in range(300):
+        env.step(rng.randint(5, size=8))
+    assert env.metrics().episodes == 0
+    env.reset()
+
+    stats = env.metrics().snapshot()['MazeExplorerEat']
+    assert env.metrics().episodes == 8
+    assert stats['truncated']['mean'] == 1.0
+    assert stats['length']['mean'] == 300
+    env.close()
@@ -0,0 +1,41 @@
+import numpy as np
+
+from mazeexp.engine.multiagent import MultiAgentMaze
+
+def test_agents_share_one_maze_from_separate_corners():
+    agents = MultiAgentMaze(4, mode_id=0, seed=1)
+    observations = agents.reset()
+    sim = agents.sim
+    assert observations.shape[0] == 4
+    assert sim.slots == 1 and sim.walls.shape[0] == 1
+    assert len(set(map(tuple, sim.pos.tolist()))) == 4
+
+def test_an_item_goes_to_one_agent():
+    agents = MultiAgentMaze(2, mode_id=0, seed=2)
+    agents.reset()
+    sim = agents.sim
+    k = int(np.flatnonzero(sim.alive[0])[0])
+    spot = sim.item_pos[0, k].copy()
+    sim.spawn_at(sim.index, [spot, spot], [0.0, 0.0])
+
+    observations, rewards, terminals = agents.step(np.zeros(2, dtype=np.intp))
+    assert not sim.alive[0, k]
+    column = sim.item_columns[sim.item_type[0, k]]
+    assert sim.episode_events[:, column].tolist() == [1, 0]
+
+def test_finished_agents_hold_and_teams_share_rewards():
+    agents = MultiAgentMaze(3, mode_id=1, seed=3, team=True)
+    agents.reset()
+    sim = agents.sim
+    rng = np.random.RandomState(0)
+    held = {}
+    for _ in range(300):
+        observations, rewards, terminals = agents.step(rng.randint(agents.actions_num, size=3))
+        assert (rewards == rewards[0]).all()
+        for i, pos in held.items():
+            assert np.array_equal(sim.pos[i], pos)
+        for i in np.flatnonzero(terminals):
+            held.setdefault(i, sim.pos[i].copy())
+        if agents.done:
+            break
+    assert held
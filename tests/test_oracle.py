@@ -0,0 +1,16 @@
+from mazeexp.engine import config
+from mazeexp.engine.oracle import DemoGenerator
+from mazeexp.engine.replay import Replayer
+from mazeexp.engine.world_rewards import EVENT_GOAL
+
+def test_explore_demos_reach_goal():
+    # The goal of mode 1 needs half the battery spent, drained faster here
+    cfg = config.Config(settings={'player': {'battery_use': {'angular': 0.05, 'linear': 0.05}}})
+    demos = DemoGenerator(1, cfg, batch=2, max_steps=2000)
+    replayer = Replayer(1, cfg)
+    for seed, meta, records in demos.episodes([3, 4]):
+        assert records['terminal'][-1]
+        assert not records['terminal'][:-1].any()
+        assert not replayer.episode(seed, meta, records).diverged
+        assert replayer.sim.episode_events[0, EVENT_GOAL] > 0
+        assert replayer.sim.battery[0] > 0
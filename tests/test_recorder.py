@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from mazeexp.engine.recorder import TrajectoryRecorder, TrajectoryReader
+
+class FullDisk(object):
+    def write(self, data):
+        raise IOError('No space left on device')
+
+    def close(self):
+        pass
+
+def append_steps(recorder, steps):
+    for i in range(steps):
+        recorder.append(i % 3, 1.0, 2.0, 90.0, np.zeros(4), 1.0, False)
+
+def test_round_trip(tmpdir):
+    path = str(tmpdir.join('run.mxtr'))
+    recorder = TrajectoryRecorder(path, (4,), capacity=8, compress=True)
+    recorder.begin(7, {'mode': 0})
+    append_steps(recorder, 20)
+    recorder.close()
+
+    episodes = list(TrajectoryReader(path).episodes())
+    assert len(episodes) == 1
+    seed, meta, records = episodes[0]
+    assert (seed, meta) == (7, {'mode': 0})
+    assert list(records['step']) == list(range(20))
+
+def test_writer_error_is_raised(tmpdir):
+    recorder = TrajectoryRecorder(str(tmpdir.join('run.mxtr')), (4,), capacity=2)
+    recorder.file.close()
+    recorder.file = FullDisk()
+    recorder.begin(1)
+    # More chunks than the queue holds, none may block once the writer failed
+    with pytest.raises(IOError):
+        append_steps(recorder, 100)
+        recorder.writer.join(0.1)
+        append_steps(recorder, 2)
+    with pytest.raises(IOError):
+        recorder.close()
+    assert not recorder.writer.is_alive()
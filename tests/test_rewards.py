@@ -0,0 +1,46 @@
+import numpy as np
+
+from mazeexp.engine import config, game_modes
+from mazeexp.engine.world_rewards import EVENTS, compile_mode
+
+def events_of(compiled, *rows):
+    events = np.zeros((len(rows), compiled.events_num))
+    for i, counts in enumerate(rows):
+        for name, count in counts.items():
+            events[i, compiled.columns[name]] = count
+    return events
+
+def test_terms_follow_their_conditions():
+    compiled = compile_mode(config.get_mode(1))
+    events = events_of(compiled,
+                       {'battery': 1, 'explore': 3},
+                       {'battery': 1, 'explore': 3, 'goal': 1},
+                       {'battery': 1, 'goal': 1},
+                       {'battery': 1},
+                       {'battery': 1, 'wall': 1})
+    battery = np.array([60.0, 40.0, 40.0, 0.0, 60.0])
+    reward, score, terminal, fired = compiled.evaluate(events, {'battery': battery})
+
+    # Explore pays above half battery, the goal below it, an empty battery ends the episode
+    assert reward.tolist() == [3.0, 200.0, 200.0, -100.0, -100.0]
+    assert score.tolist() == [3.0, 200.0, 200.0, 0.0, 0.0]
+    assert terminal.tolist() == [False, True, True, True, True]
+    goal = compiled.term_index['goal']
+    assert fired[:, goal].tolist() == [0, 1, 1, 0, 0]
+
+def test_only_rewarded_events_become_terms():
+    compiled = compile_mode(config.get_mode(0))
+    assert [t.name for t in compiled.terms] == ['wall', 'food', 'poison']
+    assert compiled.columns['food'] == len(EVENTS)
+
+    events = events_of(compiled, {'battery': 1, 'food': 2, 'poison': 1}, {'battery': 1, 'wall': 1})
+    reward, score, terminal, fired = compiled.evaluate(events, {'battery': np.array([50.0, 50.0])})
+    assert reward.tolist() == [2 * 5.0 - 6.0, -10.0]
+    # Items count towards score, walls do not
+    assert score.tolist() == [2 * 5.0 - 6.0, 0.0]
+    assert not terminal.any()
+
+    # `battery` and `wall` apply without a reward, other events need one
+    definition = {'name': 'Quiet', 'battery': {'reward': 0.0}, 'explore': {'reward': 0.0}, 'items': {}}
+    compiled = compile_mode(game_modes.load_mode(definition))
+    assert [t.name for t in compiled.terms] == ['battery']
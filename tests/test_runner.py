@@ -0,0 +1,27 @@
+import numpy as np
+
+from mazeexp.engine.runner import ThreadPoolMazeRunner
+
+def test_one_shard_on_the_calling_thread_by_default():
+    runner = ThreadPoolMazeRunner(6, seed=1)
+    assert len(runner.shards) == 1 and runner.pool is None
+    observations = runner.reset()
+    observations, rewards, terminals = runner.step(np.zeros(6, dtype=np.intp))
+    assert observations.shape[0] == rewards.shape[0] == terminals.shape[0] == 6
+    runner.close()
+
+def test_threads_step_shards_in_environment_order():
+    pooled = ThreadPoolMazeRunner(6, threads=3, seed=1)
+    inline = ThreadPoolMazeRunner(6, threads=3, seed=1)
+    inline.close()
+    inline.pool = None
+    assert pooled.seeds == inline.seeds
+
+    rng = np.random.RandomState(0)
+    assert np.array_equal(pooled.reset(), inline.reset())
+    for step in range(50):
+        actions = rng.randint(pooled.actions_num, size=6)
+        for a, b in zip(pooled.step(actions), inline.step(actions)):
+            assert np.array_equal(a, b)
+    assert pooled.seeds == inline.seeds
+    pooled.close()
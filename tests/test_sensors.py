@@ -0,0 +1,142 @@
+import math
+import random
+
+import numpy as np
+
+from mazeexp.engine import config
+from mazeexp.engine.curriculum import Level
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.maze import build_maze
+from mazeexp.engine.simulation import Simulation, sensor_layout
+from mazeexp.engine.world_rewards import compile_mode
+
+# One ray per degree, so each turn keeps some rays on an axis
+RAYS = {'num': 360, 'fov': 2 * math.pi / 360}
+
+def make_sim(cache, n=8, rays=RAYS):
+    # Without `cache`, the simulation picks by ray count
+    sensors = dict(rays) if cache is None else dict(rays, cache=cache)
+    cfg = config.Config(settings={'player': {'sensors': sensors}})
+    mode = config.get_mode(0)
+    mazes = [build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(seed))
+             for seed in range(n)]
+    return Simulation(mazes, cfg, compile_mode(mode))
+
+def readings(cache, steps=100, rays=RAYS):
+    sim = make_sim(cache, rays=rays)
+    # Some players start facing along each axis
+    for i in range(4):
+        sim.spawn_at([i], sim.spawn[i], 90 * i)
+    sim.sense()
+
+    rng = np.random.RandomState(1)
+    trace = []
+    for t in range(steps):
+        # Mostly turning in place, reusing readings
+        sim.step_actions(rng.choice(5, size=sim.n, p=[0.4, 0.05, 0.1, 0.05, 0.4]))
+        trace.append((sim.proximity.copy(), sim.sensed.copy()))
+    return trace, sim.sense_hit_rate
+
+def test_cached_readings_match_casts():
+    cast, _ = readings(False)
+    cached, hit_rate = readings(True)
+    assert hit_rate > 0
+    for (proximity, sensed), (cached_proximity, cached_sensed) in zip(cast, cached):
+        assert np.allclose(proximity, cached_proximity, rtol=0, atol=1e-6)
+        assert np.array_equal(sensed, cached_sensed)
+
+def test_few_rays_reuse_readings_of_earlier_headings():
+    # Turns are not a whole number of ray gaps, only headings turned back to match
+    rays = {'num': 9, 'fov': 2 * math.pi / 9}
+    assert make_sim(None).cache_sensors
+    assert not make_sim(None, rays=rays).cache_sensors
+    cast, _ = readings(False, rays=rays)
+    cached, hit_rate = readings(True, rays=rays)
+    assert hit_rate > 0.2
+    for (proximity, sensed), (cached_proximity, cached_sensed) in zip(cast, cached):
+        assert np.allclose(proximity, cached_proximity, rtol=0, atol=1e-6)
+        assert np.array_equal(sensed, cached_sensed)
+
+def test_axis_aligned_casts():
+    sim = make_sim(False)
+    axes = np.array([0.0, math.pi / 2, math.pi, 3 * math.pi / 2])
+    rad = np.concatenate([axes, np.nextafter(axes, 10.0), np.nextafter(axes, -10.0)])
+    rad = np.broadcast_to(rad, (sim.n, len(rad)))
+    wall = sim.cast(sim.spawn[:, 0:1], sim.spawn[:, 1:2], rad)
+    wall = wall.reshape(sim.n, 3, len(axes))
+    assert (wall > 0).all()
+    assert np.allclose(wall[:, 0], wall[:, 1], rtol=0, atol=1e-6)
+    assert np.allclose(wall[:, 0], wall[:, 2], rtol=0, atol=1e-6)
+
+def test_lidar_layout_and_ranges():
+    angles, ranges = sensor_layout({'num': 5, 'fov': 0.5, 'max_range': 30})
+    assert np.allclose(angles, [-1.0, -0.5, 0.0, 0.5, 1.0])
+    assert (ranges == 30).all()
+    angles, ranges = sensor_layout({'num': 9, 'fov': 0.5, 'angles': [0.0, math.pi], 'max_range': [5, 500]})
+    assert angles.tolist() == [0.0, math.pi] and ranges.tolist() == [5, 500]
+
+    sim = make_sim(False, rays={'num': 64, 'fov': 2 * math.pi / 64, 'max_range': [20, 400] * 32})
+    sim.sense()
+    observation = sim.observation()
+    assert observation.shape == (sim.n, 64, 3)
+    assert (observation >= 0).all() and (observation <= 1).all()
+    # Short rays saturate where long ones see the wall
+    assert (sim.proximity[:, 0::2] <= 20 - sim.radius).all()
+    assert (sim.proximity[:, 1::2] > 20 - sim.radius).any()
+
+def face(walls, tile, start, step):
+    """
+    Edge of the first wall tile from `start` along `walls`, a row of tiles
+    """
+    i = int(start // tile)
+    while 0 <= i + step < len(walls) and not walls[i + step]:
+        i += step
+    return (i + 1) * tile if step > 0 else i * tile
+
+def test_axis_casts_end_a_pixel_into_the_first_wall():
+    sim = make_sim(False, n=4)
+    rad = np.broadcast_to([0.0, math.pi / 2, math.pi, 3 * math.pi / 2], (sim.n, 4))
+    wall = sim.cast(sim.spawn[:, 0:1], sim.spawn[:, 1:2], rad)
+    for r in range(sim.n):
+        walls = sim.walls[sim.slot[r]]
+        x, y = sim.spawn[r]
+        i, j = int(x // sim.tw), int(y // sim.th)
+        up = min(face(walls[i, :], sim.th, y, 1) + 1, sim.height[r])
+        right = min(face(walls[:, j], sim.tw, x, 1) + 1, sim.width[r])
+        down = face(walls[i, :], sim.th, y, -1) - 1
+        left = face(walls[:, j], sim.tw, x, -1) - 1
+        # Casts give up past `CAST_DEPTH` crossings, beyond sensor range
+        expected = np.array([up - y, right - x, y - down, x - left])
+        assert np.allclose(np.minimum(wall[r], sim.ranges.max()), np.minimum(expected, sim.ranges.max()))
+
+def test_items_ahead_are_sensed_and_walls_hide_them():
+    sensors = {'angles': [0.0], 'max_range': 500}
+    cfg = config.Config(settings={'player': {'sensors': sensors}})
+    mode = config.get_mode(0)
+    sim = Simulation(build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(0)),
+                     cfg, compile_mode(mode))
+    r = sim.item_radius[0, 0]
+    # Centre of a tile below an inner wall, with room for the item between
+    walls = sim.walls[0]
+    room = int(np.ceil((4 * r + 2 * sim.radius) / sim.th))
+    i, j = next((i, j) for i in range(1, walls.shape[0] - 1) for j in range(1, walls.shape[1] - room - 2)
+                if not walls[i, j:j + room + 1].any() and walls[i, j + room + 1])
+    x, y = (i + 0.5) * sim.tw, (j + 0.5) * sim.th
+    top = (j + room + 1) * sim.th
+    # One item left, moved straight ahead of the player facing up
+    sim.spawn_at([0], (x, y), 0)
+    sim.alive[0, 1:] = False
+    s, k = np.array([0]), np.array([0])
+
+    ahead = y + sim.radius + 2 * r
+    sim.item_pos[0, 0] = (x, ahead)
+    sim.rebucket_items(s, k)
+    sim.sense()
+    assert sim.sensed[0, 0] == sim.item_type[0, 0] + 1
+    assert np.isclose(sim.proximity[0, 0], ahead - y - r - sim.radius)
+
+    sim.item_pos[0, 0] = (x, top + r + 2)
+    sim.rebucket_items(s, k)
+    sim.sense()
+    assert sim.sensed[0, 0] == 0
+    assert np.isclose(sim.proximity[0, 0], top + 1 - y - sim.radius)
@@ -0,0 +1,217 @@
+import json
+import os
+import random
+
+import numpy as np
+
+from mazeexp.engine import config, game_modes
+from mazeexp.engine.curriculum import Level
+from mazeexp.engine.generator import Generator
+from mazeexp.engine.maze import build_maze
+from mazeexp.engine.simulation import Simulation, observation_storage, observation_values
+from mazeexp.engine.world_rewards import compile_mode
+
+MODES = os.path.join(os.path.dirname(config.__file__), 'modes')
+
+def bucket_contents(sim):
+    """
+    Items listed in each tile, regardless of their place within it
+    """
+    cells = sim.bucket_cells()
+    return [sorted(cells[t][cells[t] >= 0]) for t in range(len(cells))]
+
+def test_respawned_items_stay_bucketed():
+    with open(os.path.join(MODES, 'mode_0.json')) as f:
+        definition = json.load(f)
+    definition['items']['food']['respawn'] = True
+    mode = game_modes.load_mode(definition)
+    cfg = config.default()
+    level = Level.default(cfg, mode)
+    mazes = [build_maze(Generator(cfg), cfg, mode, level, random.Random(seed)) for seed in range(4)]
+    sim = Simulation(mazes, cfg, compile_mode(mode))
+
+    rng = np.random.RandomState(0)
+    for _ in range(1000):
+        sim.step_actions(rng.randint(5, size=sim.n))
+    assert sim.respawn_next.sum() > 0
+
+    incremental = bucket_contents(sim)
+    sim.bucket_items(np.arange(sim.slots))
+    assert bucket_contents(sim) == incremental
+
+def assert_same_info(info, other):
+    events, other_events = info.pop('events'), other.pop('events')
+    assert info == other
+    for name in events:
+        assert np.array_equal(events[name], other_events[name])
+
+def test_restore_brings_back_episode_info():
+    cfg = config.Config(settings={'world': {'event_log': 8}})
+    mode = config.get_mode(1)
+    maze = build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(2))
+    sim = Simulation(maze, cfg, compile_mode(mode))
+
+    rng = np.random.RandomState(0)
+    for _ in range(5):
+        sim.step_actions(rng.randint(5, size=1))
+    snapshot = sim.snapshot()
+    info = sim.episode_info()
+    for _ in range(50):
+        sim.step_actions(rng.randint(5, size=1))
+    assert sim.episode_info()['steps'] == 55
+
+    sim.restore(snapshot)
+    assert_same_info(sim.episode_info(), info)
+
+def test_masked_rows_step_as_alone():
+    cfg = config.Config(settings={'world': {'event_log': 8}, 'player': {'sensors': {'cache': True}}})
+    mode = config.get_mode(1)
+    mazes = [build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(seed))
+             for seed in range(4)]
+    sim = Simulation(mazes, cfg, compile_mode(mode))
+    alone = [Simulation(maze, cfg, compile_mode(mode)) for maze in mazes]
+
+    rng = np.random.RandomState(0)
+    for _ in range(60):
+        actions = rng.randint(5, size=4)
+        mask = rng.rand(4) < 0.5
+        held = sim.pos[~mask].copy()
+        sim.step_actions(actions, mask=mask)
+        assert np.array_equal(sim.pos[~mask], held)
+        assert not sim.events[~mask].any()
+        for i in np.flatnonzero(mask):
+            alone[i].step_actions(actions[i:i + 1])
+
+    observations = sim.observation(True)
+    for i, one in enumerate(alone):
+        for name in ('pos', 'rotation', 'battery', 'reward', 'score', 'game_over', 'proximity', 'sensed'):
+            assert np.array_equal(getattr(sim, name)[i], getattr(one, name)[0])
+        assert np.array_equal(sim.observation(True, [i])[0], one.observation(True)[0])
+        assert np.array_equal(observations[i], one.observation(True)[0])
+        assert_same_info(sim.episode_info(i), one.episode_info())
+
+def play(sim, actions):
+    trace = []
+    for action in actions:
+        sim.step_actions(np.array([action]))
+        trace.append((sim.pos.copy(), sim.take_reward(), sim.alive.copy(), sim.observation(True)))
+    return trace
+
+def test_restore_replays_the_same_steps():
+    cfg = config.default()
+    mode = config.get_mode(0)
+    maze = build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(3))
+    sim = Simulation(maze, cfg, compile_mode(mode))
+    rng = np.random.RandomState(1)
+    play(sim, rng.randint(5, size=40))
+    snapshot = sim.snapshot()
+    assert len(snapshot) < 400
+
+    actions = rng.randint(5, size=60)
+    trace = play(sim, actions)
+    sim.restore(snapshot)
+    # Also into a simulation on another maze, which takes the snapshot's
+    other = Simulation(build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(4)),
+                       cfg, compile_mode(mode))
+    other.restore(snapshot)
+    for replayed in (play(sim, actions), play(other, actions)):
+        for step, again in zip(trace, replayed):
+            for a, b in zip(step, again):
+                assert np.array_equal(a, b)
+
+def test_rollout_matches_sequences_played_one_by_one():
+    cfg = config.default()
+    mode = config.get_mode(1)
+    maze = build_maze(Generator(cfg), cfg, mode, Level.default(cfg, mode), random.Random(5))
+    sim = Simulation(maze, cfg, compile_mode(mode))
+    rng = np.random.RandomState(2)
+    play(sim, rng.randint(5, size=10))
+    snapshot = sim.snapshot()
+
+    # Wall hits end episodes of mode 1, so some sequences stop early
+    sequences = rng.randint(5, size=(16, 30))
+    batch = Simulation(maze, cfg, compile_mode(mode), n=16)
+    rewards, terminals, observations = batch.rollout(snapshot, sequences, battery=True)
+    assert terminals.any() and not terminals.all()
+
+    for i, actions in enumerate(sequences):
+        sim.restore(snapshot)
+        sim.take_reward()
+        total = 0.0
+        for action in actions:
+            sim.step_actions(np.array([action]))
+            total += sim.take_reward()[0]
+            if sim.game_over[0]:
+                break
+        assert rewards[i] == total
+        assert terminals[i] == sim.game_over[0]
+        assert np.array_equal(observations[i], sim.observation(True)[0])
+
+def test_drifting_items_bounce_off_walls_and_go_home():
+    with open(os.path.join(MODES, 'mode_0.json')) as f:
+        definition = json.load(f)
+    for rule in definition['items'].values():
+        rule['speed'] = 40.0
+    mode = game_modes.load_mode(definition)
+    cfg = config.default()
+    level = Level.default(cfg, mode)
+    mazes = [build_maze(Generator(cfg), cfg, mode, level, random.Random(seed)) for seed in range(4)]
+    sim = Simulation(mazes, cfg, compile_mode(mode))
+    speed = np.hypot(sim.item_vel[..., 0], sim.item_vel[..., 1])
+    assert np.allclose(speed[sim.item_radius > 0], 40.0)
+    start = sim.item_vel.copy()
+
+    rng = np.random.RandomState(0)
+    for step in range(200):
+        sim.step_actions(rng.randint(5, size=sim.n))
+        if step == 100:
+            snapshot, at = sim.snapshot(1), sim.item_pos[1].copy()
+        # Bounds of alive items clear of walls, a tile across at most so corners cover them
+        s, k = np.nonzero(sim.alive)
+        pos, r = sim.item_pos[s, k], sim.item_radius[s, k]
+        low = np.floor_divide(pos - r[:, None], (sim.tw, sim.th)).astype(np.intp)
+        high = np.floor_divide(pos + r[:, None], (sim.tw, sim.th)).astype(np.intp)
+        for corner in ((low[:, 0], low[:, 1]), (low[:, 0], high[:, 1]), (high[:, 0], low[:, 1]), (high[:, 0], high[:, 1])):
+            assert not sim.wall_at(corner[0], corner[1], s).any()
+    assert np.allclose(np.hypot(sim.item_vel[..., 0], sim.item_vel[..., 1]), speed)
+    assert (np.sign(sim.item_vel) != np.sign(start)).any()
+
+    incremental = bucket_contents(sim)
+    sim.bucket_items(np.arange(sim.slots))
+    assert bucket_contents(sim) == incremental
+
+    sim.restore(snapshot, [1])
+    assert np.array_equal(sim.item_pos[1], at)
+    sim.reset()
+    for i, maze in enumerate(mazes):
+        assert np.array_equal(sim.item_pos[i, :maze.items_num], maze.item_positions)
+        assert np.array_equal(sim.item_vel[i, :maze.items_num], maze.item_velocities)
+
+def test_quantised_observations_track_float64():
+    mode = config.get_mode(0)
+    maze = build_maze(Generator(config.default()), config.default(), mode,
+                      Level.default(config.default(), mode), random.Random(6))
+    sims = {}
+    for dtype in ('float64', 'float32', 'float16', 'uint8'):
+        cfg = config.Config(settings={'player': {'observation_dtype': dtype}})
+        sims[dtype] = Simulation(maze, cfg, compile_mode(mode), n=4)
+
+    # Error of each format against float64 readings
+    error = {'float32': 1e-6, 'float16': 1e-3, 'uint8': 0.5 / 255 + 1e-6}
+    rng = np.random.RandomState(3)
+    for _ in range(50):
+        actions = rng.randint(5, size=4)
+        observations = {}
+        for dtype, sim in sims.items():
+            sim.step_actions(actions)
+            observations[dtype] = sim.observation(True)
+            assert observations[dtype].dtype == np.dtype(dtype)
+        exact = observations['float64']
+        for dtype, tolerance in error.items():
+            values = observation_values(observations[dtype])
+            assert values.dtype == np.float32
+            assert (values >= 0).all() and (values <= 1).all()
+            assert np.allclose(values, exact, rtol=0, atol=tolerance)
+
+    assert [observation_storage(dtype) for dtype in ('float64', 'float32', 'float16', 'uint8')] == \
+        [np.float32, np.float32, np.float16, np.uint8]